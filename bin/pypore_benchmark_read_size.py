@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Benchmarks the event finder's throughput for different read sizes, see
+:py:attr:`pypore.event_finder.Parameters.read_size`.
+
+For each file and read size, prints the rate of just reading the file, and of reading it and finding its events.
+If no files are passed, sample Pypore HDF5, Chimera, CNP2 and Heka files are generated in a temporary directory, so
+every reader but the prefetch reader, which wraps the others, is covered.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from pypore.i_o import get_reader_from_filename
+from pypore.event_finder import iter_events, Parameters, READ_SIZE_AUTO, _get_blocks_per_read
+import pypore.filetypes.data_file as df
+import pypore.sampledata.testing_files as tf
+
+DEFAULT_READ_SIZES = [1000, 5000, 20000, 100000, 250000, 1000000, READ_SIZE_AUTO]
+
+
+def _repeat_sample(sample_filename, filename, header_bytes, n_copies):
+    """
+    Writes the header_bytes first bytes of the sample file to filename, followed by n_copies copies of the rest of
+    it.
+    """
+    with open(sample_filename, 'rb') as sample_file:
+        header = sample_file.read(header_bytes)
+        body = sample_file.read()
+    with open(filename, 'wb') as out_file:
+        out_file.write(header)
+        for _ in xrange(n_copies):
+            out_file.write(body)
+
+
+def _get_copies(sample_filename, n_points):
+    """
+    :returns: Number of copies of the data of the sample file needed for at least n_points points.
+    """
+    reader = get_reader_from_filename(sample_filename)
+    n_copies = int(n_points / reader.get_points_per_channel_total()) + 1
+    reader.close()
+    return n_copies
+
+
+def _create_sample_files(directory, seconds):
+    """
+    Creates sample files of the given length for each of the readers that can be generated. The CNP2 file holds as
+    many points as the HDF5 file, a fortieth of the length at its 40 MHz sample rate, to keep it small.
+
+    :returns: List of the file names.
+    """
+    # 1 MHz noisy baseline, with 200 events per second of 200 points each.
+    h5_filename = os.path.join(directory, 'random.h5')
+    sample_rate = 1.e6
+    n_points = int(seconds * sample_rate)
+    random_state = np.random.RandomState(0)
+    data = 10. + random_state.normal(scale=.3, size=n_points)
+    for event_start in random_state.randint(0, n_points - 200, int(200 * seconds)):
+        data[event_start:event_start + 200] -= 3.
+    h5file = df.open_file(h5_filename, mode='w', n_points=n_points, sample_rate=sample_rate)
+    h5file.root.data[:] = data
+    h5file.close()
+
+    # Repeat the sample files of the other readers until they are long enough.
+    chimera_sample = tf.get_abs_path('spheres_20140114_154938_beginning.log')
+    chimera_filename = os.path.join(directory, 'spheres.log')
+    sample_rate = get_reader_from_filename(chimera_sample).get_sample_rate()
+    _repeat_sample(chimera_sample, chimera_filename, 0, _get_copies(chimera_sample, seconds * sample_rate))
+    shutil.copy(chimera_sample[:-len('log')] + 'mat', chimera_filename[:-len('log')] + 'mat')
+
+    cnp_sample = tf.get_abs_path('cnp_test.hex')
+    cnp_filename = os.path.join(directory, 'cnp.hex')
+    _repeat_sample(cnp_sample, cnp_filename, 0, _get_copies(cnp_sample, n_points))
+    shutil.copy(cnp_sample[:-len('hex')] + 'cfg', cnp_filename[:-len('hex')] + 'cfg')
+
+    # The blocks of the Heka file follow its header.
+    heka_sample = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+    heka_filename = os.path.join(directory, 'heka.hkd')
+    reader = get_reader_from_filename(heka_sample)
+    n_blocks = reader.get_points_per_channel_total() / reader.get_block_size()
+    header_bytes = os.path.getsize(heka_sample) - n_blocks * reader.get_block_dtype().itemsize
+    sample_rate = reader.get_sample_rate()
+    reader.close()
+    _repeat_sample(heka_sample, heka_filename, header_bytes, _get_copies(heka_sample, seconds * sample_rate))
+    return [h5_filename, chimera_filename, cnp_filename, heka_filename]
+
+
+def _time_read(filename, parameters):
+    """
+    :returns: Seconds to read the whole file, and the number of points per channel read.
+    """
+    reader = get_reader_from_filename(filename)
+    n_blocks = _get_blocks_per_read(reader, parameters)
+    n_points = 0
+    start = time.time()
+    while True:
+        blocks = reader.get_next_blocks(n_blocks)
+        if blocks[0].size < 1:
+            break
+        n_points += blocks[0].size
+    elapsed = time.time() - start
+    reader.close()
+    return elapsed, n_points
+
+
+def _time_find(filename, parameters):
+    """
+    :returns: Seconds to find the events in the file, and the number of events.
+    """
+    start = time.time()
+    n_events = sum(1 for _ in iter_events(filename, parameters))
+    return time.time() - start, n_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the event finder for different read sizes.")
+    parser.add_argument('files', type=str, nargs='*',
+                        help="data files to benchmark. Default is generated Pypore HDF5, Chimera, CNP2 and Heka files.")
+    parser.add_argument('-s', '--read-sizes', type=int, nargs='+', default=DEFAULT_READ_SIZES,
+                        help="read sizes, in points per channel. 0 is auto. Default is %s." % DEFAULT_READ_SIZES)
+    parser.add_argument('-t', '--seconds', type=float, default=10.,
+                        help="length of the generated files, in seconds. Default is 10.")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="number of times to run each benchmark, keeping the fastest. Default is 3.")
+    args = parser.parse_args()
+
+    directory = None
+    files = args.files
+    if len(files) == 0:
+        directory = tempfile.mkdtemp()
+        files = _create_sample_files(directory, args.seconds)
+
+    try:
+        for filename in files:
+            reader = get_reader_from_filename(filename)
+            print "{0}: {1}, {2} points per block".format(os.path.basename(filename), type(reader).__name__,
+                                                        reader.get_block_size())
+            reader.close()
+            print "{0:>10} {1:>8} {2:>14} {3:>14} {4:>8}".format('read size', 'blocks', 'read pt/s', 'find pt/s',
+                                                                   'events')
+            for read_size in args.read_sizes:
+                parameters = Parameters(read_size=read_size)
+                reader = get_reader_from_filename(filename)
+                n_blocks = _get_blocks_per_read(reader, parameters)
+                reader.close()
+                read_time, n_points = min(_time_read(filename, parameters) for _ in xrange(args.repeat))
+                find_time, n_events = min(_time_find(filename, parameters) for _ in xrange(args.repeat))
+                print "{0:>10} {1:>8} {2:>14.3e} {3:>14.3e} {4:>8}".format(read_size if read_size else 'auto',
+                                                                           n_blocks, n_points / read_time,
+                                                                           n_points / find_time, n_events)
+            print
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Benchmarks the throughput of :py:class:`pypore.strategies.running_median_baseline_strategy.RunningMedianBaselineStrategy`
+for different window lengths.
+
+For each window length, prints the rate of computing the baseline of a steady noisy baseline, once the window is full,
+and of a baseline that steps and drifts, which is slower.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pypore.strategies.running_median_baseline_strategy import RunningMedianBaselineStrategy
+
+DEFAULT_WINDOW_LENGTHS = [1000, 10000, 100000]
+
+
+def _create_samples(n_points, window_length):
+    """
+    :returns: Dict of sample name to the points to warm up the strategy with, and the points to time.
+    """
+    random_state = np.random.RandomState(0)
+    warm_up = random_state.normal(size=5 * window_length)
+    steady = random_state.normal(size=n_points)
+    # Steps of 10 standard deviations every 5 windows, and a drift of 10 standard deviations per window.
+    moving = random_state.normal(size=n_points)
+    moving += 10. * (np.arange(n_points) // (5 * window_length) % 2)
+    moving += np.arange(n_points) * (10. / window_length)
+    return {'steady': (warm_up, steady), 'moving': (warm_up, moving)}
+
+
+def _time_baseline(window_length, warm_up, data):
+    """
+    :returns: Seconds to compute the baseline of data, after warm_up.
+    """
+    strategy = RunningMedianBaselineStrategy(window_length=window_length)
+    out_baseline = np.zeros(max(warm_up.size, data.size))
+    out_variance = np.zeros(out_baseline.size)
+    strategy.compute_baseline_block(warm_up, out_baseline[:warm_up.size], out_variance[:warm_up.size])
+    start = time.time()
+    strategy.compute_baseline_block(data, out_baseline[:data.size], out_variance[:data.size])
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the running median baseline for different windows.")
+    parser.add_argument('-w', '--window-lengths', type=int, nargs='+', default=DEFAULT_WINDOW_LENGTHS,
+                        help="window lengths, in points. Default is %s." % DEFAULT_WINDOW_LENGTHS)
+    parser.add_argument('-n', '--points', type=int, default=2000000,
+                        help="number of points to time. Default is 2000000.")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="number of times to run each benchmark, keeping the fastest. Default is 3.")
+    args = parser.parse_args()
+
+    print "{0:>10} {1:>14} {2:>14}".format('window', 'steady pt/s', 'moving pt/s')
+    for window_length in args.window_lengths:
+        samples = _create_samples(args.points, window_length)
+        rates = [args.points / min(_time_baseline(window_length, *samples[name]) for _ in xrange(args.repeat))
+                 for name in ['steady', 'moving']]
+        print "{0:>10} {1:>14.3e} {2:>14.3e}".format(window_length, *rates)
+
+
+if __name__ == '__main__':
+    main()
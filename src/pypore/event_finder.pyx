@@ -9,10 +9,22 @@ Created on Aug 19, 2013
 import os
 import time
 import datetime
+import copy
+import cPickle as pickle
+import shutil
+import tempfile
+import Queue
+from collections import deque
+from collections import namedtuple
+from multiprocessing import Pool
+from multiprocessing import Process
+from multiprocessing import Queue as ProcessQueue
+from multiprocessing import RawArray
 
 import numpy as np
 
 cimport numpy as np
+cimport cython
 
 import filetypes.event_database as ed
 import sys
@@ -32,490 +44,1784 @@ from pypore.strategies.adaptive_baseline_strategy import AdaptiveBaselineStrateg
 from pypore.strategies.threshold_strategy cimport ThresholdStrategy
 from pypore.strategies.noise_based_threshold_strategy import NoiseBasedThresholdStrategy
 
+from pypore.sinks.hdf5_event_sink import HDF5EventSink
+
 DTYPE = np.float
 ctypedef np.float_t DTYPE_t
 
 DTYPE_UINT32 = np.uint32
 ctypedef np.uint32_t DTYPE_UINT32_t
 
-cdef np.ndarray[DTYPE_t] _get_data_range(data_cache, long i, long n):
-    """
-    returns [i,n)
-    """
-    cdef np.ndarray[DTYPE_t,
-                    negative_indices = False,
-                    mode = 'c'] res = np.zeros(n - i, dtype=DTYPE)
-    cdef long res_spot = 0, l, nn
-    # do we need to include points from the old data
-    # (eg. for raw event points)
-    if i < 0:
-        l = data_cache[0].size
-        # Is the range totally within the old data
-        if n <= 0:
-            res = data_cache[0][l + i:l + n]
-            return res
-        res[0:-i] = data_cache[0][l + i:l]
-        res_spot -= i
-        i = 0
-    cdef long spot = 0
-    cdef np.ndarray[DTYPE_t] cache
-    cdef int q = 0
-    for q in xrange(len(data_cache) - 1):
-        cache = data_cache[q + 1]
-        nn = cache.size
-        # if all the rest of the data is in this cache
-        # add it to the end of the result and return
-        if i >= spot and n <= spot + nn:
-            res[res_spot:] = cache[i - spot:n - spot]
+# Types of data the search can run on, see Parameters.dtype.
+SAMPLE_DTYPES = (np.dtype(np.float64), np.dtype(np.float32))
+ctypedef fused sample_t:
+    np.float64_t
+    np.float32_t
+
+# After the pre-scan stops at a candidate, walk this many points one at a time before pre-scanning again.
+PRESCAN_RESUME_POINTS = 100
+# Number of points the pre-scan looks ahead at a time. It starts with PRESCAN_FIRST_WINDOW points, which is
+# cheap if there is a candidate close by, and doubles up to PRESCAN_WINDOW while the baseline stays quiet.
+PRESCAN_FIRST_WINDOW = 4096
+PRESCAN_WINDOW = 32768
+
+# Number of extra points saved on each side of an event's raw data.
+RAW_POINTS_PER_SIDE = 50
+
+# Record of an event found in one channel. raw_data holds the event with raw_points_per_side extra points on each
+# side, and levels and level_lengths hold the n_levels levels found in the event.
+Event = namedtuple('Event', ['channel', 'event_start', 'event_length', 'n_levels', 'baseline', 'current_blockage',
+                             'area', 'raw_data', 'levels', 'level_lengths'])
+# namedtuple takes the module from the calling frame, which is wrong from Cython, and needed to pickle events.
+Event.__module__ = __name__
+
+# Default number of points in each segment when splitting one file across worker processes.
+DEFAULT_SEGMENT_LENGTH = 10000000
+# Default number of points before each segment used to warm up the baseline.
+DEFAULT_SEGMENT_OVERLAP = 100000
+
+# Number of seconds between checkpoints of a search run with find_events(resume=True) and no checkpoint_interval.
+DEFAULT_CHECKPOINT_INTERVAL = 60.
+# Most blocks to read at a time when skipping to a checkpoint.
+SKIP_POINTS_PER_READ = 1 << 20
+
+# Default number of seconds between progress updates, see find_events(progress_callback=...).
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+# Edges of the bins of the histogram of the time taken to find the levels of each event, in seconds, with 4 bins
+# per decade. See find_events(profile_event_sample=...).
+PROFILE_EVENT_TIME_BIN_EDGES = np.logspace(-7, 1, 33)
+
+# Parameters.read_size that picks the read size from the sample rate and the available memory.
+READ_SIZE_AUTO = 0
+# Auto-tuned reads hold about this many seconds of data,
+AUTO_READ_SECONDS = 0.05
+# within these many points per channel. Larger reads no longer fit in the CPU caches, see
+# bin/pypore_benchmark_read_size.py.
+AUTO_READ_SIZE_MIN = 20000
+AUTO_READ_SIZE_MAX = 1 << 17
+# and use at most this fraction of the available memory.
+AUTO_READ_MEMORY_FRACTION = 0.01
+
+def _get_default_save_file_name(filename):
+    """
+    Get the name of the database file we want to save. If we have input.hkd, then save database to
+    input_Events_YYmmdd_HHMMSS.h5
+    """
+    save_file_name = list(filename)
+    # Remove the .mat off the end
+    for _ in xrange(0, 4):
+        save_file_name.pop()
+    # Get a string with the current year/month/day/hour/minute to label the file
+    day_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_file_name.append('_Events_' + day_time + '.h5')
+    return "".join(save_file_name)
+
+def _find_checkpointed_save_file_name(filename):
+    """
+    :returns: The default save file name, see :py:func:`_get_default_save_file_name`, of the latest search of\
+        filename that left a checkpoint, or None if there is none.
+    """
+    default_name = _get_default_save_file_name(filename)
+    prefix = default_name[:-len('YYYYmmdd_HHMMSS.h5')]
+    directory = os.path.dirname(prefix)
+    base = os.path.basename(prefix)
+    suffix = '.h5.checkpoint'
+    names = [name for name in os.listdir(directory or os.curdir)
+             if name.startswith(base) and name.endswith(suffix) and
+             len(name) == len(base) + len('YYYYmmdd_HHMMSS') + len(suffix)]
+    if len(names) < 1:
+        return None
+    # The timestamps sort in time order.
+    return os.path.join(directory, max(names)[:-len('.checkpoint')])
+
+def _get_available_memory():
+    """
+    :returns: The number of bytes of physical memory available, or 0 if unknown on this platform.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+def _get_auto_read_size(double sample_rate):
+    """
+    :returns: The number of points per channel to read at a time for data sampled at sample_rate. Large reads\
+        amortize the cost of each read call, up to a point where the blocks no longer fit in the CPU caches.
+    """
+    cdef double read_size = sample_rate * AUTO_READ_SECONDS
+    cdef long available_memory = _get_available_memory()
+    if available_memory > 0:
+        read_size = min(read_size, available_memory * AUTO_READ_MEMORY_FRACTION / np.dtype(DTYPE).itemsize)
+    return int(min(max(read_size, AUTO_READ_SIZE_MIN), AUTO_READ_SIZE_MAX))
+
+def _get_blocks_per_read(AbstractReader reader, Parameters parameters):
+    """
+    :returns: The number of the reader's blocks to read at a time, to read about parameters.read_size points.
+    """
+    cdef long read_size = parameters.read_size
+    cdef long block_size = reader.get_block_size_c()
+    if read_size == READ_SIZE_AUTO:
+        read_size = _get_auto_read_size(reader.get_sample_rate_c())
+    return max(1, (read_size + block_size - 1) // block_size)
+
+def _get_checkpoint_file_name(sink):
+    """
+    :returns: The name of the file to save the checkpoints of a search saving to sink, or None if the sink has no\
+        file name.
+    """
+    save_file_name = getattr(sink, 'save_file_name', None)
+    if save_file_name is None:
+        return None
+    return save_file_name + '.checkpoint'
+
+def _save_checkpoint(checkpoint_file_name, checkpoint):
+    """
+    Pickles checkpoint to checkpoint_file_name. The old checkpoint is only replaced once the new one is on disk, so
+    there is always a whole checkpoint to resume from.
+    """
+    temp_file_name = checkpoint_file_name + '.tmp'
+    with open(temp_file_name, 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.name == 'nt' and os.path.exists(checkpoint_file_name):
+        # Windows can't rename over an existing file.
+        os.remove(checkpoint_file_name)
+    os.rename(temp_file_name, checkpoint_file_name)
+
+def _load_checkpoint(checkpoint_file_name, AbstractReader reader, debug):
+    """
+    :returns: The checkpoint saved by :py:func:`_save_checkpoint`.
+    :raises: :py:exc:`ValueError` if the checkpoint is of a search of a different file, or with a different debug\
+        setting.
+    """
+    with open(checkpoint_file_name, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint['points_per_channel_total'] != reader.get_points_per_channel_total_c() or \
+            os.path.basename(checkpoint['data_filename']) != os.path.basename(reader.get_filename_c()):
+        raise ValueError('Checkpoint {0} is of a search of {1}, not {2}.'.format(
+            checkpoint_file_name, checkpoint['data_filename'], reader.get_filename_c()))
+    if checkpoint['debug'] != bool(debug):
+        raise ValueError('Checkpoint {0} is of a search with debug={1}.'.format(checkpoint_file_name,
+                                                                               checkpoint['debug']))
+    return checkpoint
+
+def _skip_points(AbstractReader reader, long n_points):
+    """
+    Moves the reader past the first n_points points of each channel. n_points must be a whole number of the\
+    reader's blocks, or the end of the file. Readers that can't seek read and drop the points.
+    """
+    cdef long block_size = reader.get_block_size_c()
+    cdef long skipped = 0
+    if n_points > reader.get_points_per_channel_total_c():
+        raise ValueError('Could not skip to point {0} of {1}.'.format(n_points, reader.get_filename_c()))
+    try:
+        reader.seek(n_points)
+        return
+    except NotImplementedError:
+        pass
+    while skipped < n_points:
+        blocks = reader.get_next_blocks_c(max(1, min(n_points - skipped, SKIP_POINTS_PER_READ) // block_size))
+        if blocks[0].size < 1:
+            break
+        skipped += blocks[0].size
+    if skipped != n_points:
+        raise ValueError('Could not skip to point {0} of {1}.'.format(n_points, reader.get_filename_c()))
+
+def _get_batch_size(long max_points):
+    """
+    :returns: The number of events of up to max_points raw data points it takes to fill a batch of about 10MB\
+        (1048576 bytes = 1MB), which is the number of events passed to a sink at a time.
+    """
+    return max(1, int(10 * 1048576 / (max_points * (np.dtype(DTYPE).itemsize))))
+
+cdef class _RingBuffer:
+    """
+    Fixed-capacity history of the most recent points of a channel, indexed by the points' index in the channel.
+
+    Each point is stored twice, at index % capacity and at index % capacity + capacity, so any window of up to
+    capacity points is one contiguous slice of the storage, and :py:func:`window` never copies. The capacity only
+    grows if a block does not fit next to the history being kept.
+    """
+    cdef:
+        np.ndarray storage
+        long capacity
+        # Index of the oldest point held, and one past the newest point.
+        public long start
+        public long end
+        readonly object dtype
+
+    def __init__(self, long capacity, long start=0, dtype=DTYPE):
+        self.capacity = max(1, capacity)
+        self.dtype = np.dtype(dtype)
+        self.storage = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self.start = start
+        self.end = start
+
+    cpdef discard_before(self, long index):
+        """
+        Frees the points before index.
+        """
+        self.start = max(self.start, min(index, self.end))
+
+    cpdef append(self, np.ndarray block):
+        """
+        Adds block after the newest point, growing the storage if the points held and the block do not fit.
+        """
+        cdef long n = block.size
+        cdef long size = self.end - self.start
+        cdef long capacity, p, wrap
+        if size + n > self.capacity:
+            capacity = max(size + n, 2 * self.capacity)
+            storage = np.zeros(2 * capacity, dtype=self.dtype)
+            p = self.start % capacity
+            storage[p:p + size] = self.window(self.start, self.end)
+            wrap = max(0, p + size - capacity)
+            storage[p + capacity:p + capacity + size - wrap] = storage[p:p + size - wrap]
+            storage[:wrap] = storage[capacity:capacity + wrap]
+            self.storage = storage
+            self.capacity = capacity
+
+        p = self.end % self.capacity
+        self.storage[p:p + n] = block
+        # Mirror the points written to the other half of the storage.
+        wrap = max(0, p + n - self.capacity)
+        self.storage[p + self.capacity:p + self.capacity + n - wrap] = block[:n - wrap]
+        self.storage[:wrap] = block[n - wrap:]
+        self.end += n
+
+    cpdef np.ndarray window(self, long a, long b):
+        """
+        :returns: A view of the points [a, b) of the channel, which must be held in the buffer.
+        """
+        cdef long p = a % self.capacity
+        return self.storage[p:p + b - a]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef unsigned int _fit_levels(np.ndarray[sample_t] data, long event_start, long event_end, double baseline,
+                              double variance, bint was_event_positive, double cusum_delta, double cusum_threshold,
+                              np.ndarray[DTYPE_t] m_levels, np.ndarray[DTYPE_UINT32_t] m_levels_length,
+                              double *current_blockage):
+    """
+    Fits the levels of the event data[event_start:event_end] with CUSUM. Used both by the search, see
+    :py:func:`_ChannelDetector._search_event`, and to re-fit the levels of saved events, see
+    :py:func:`refit_levels`.
+
+    :param double variance: Variance of the baseline at the start of the event.
+    :returns: The number of levels, which are saved in m_levels and m_levels_length. The current blockage is\
+        saved in current_blockage.
+    """
+    cdef long event_i = event_start
+    cdef long ko = event_start
+    cdef long min_index = 0
+    cdef long min_index_p = event_start
+    cdef long min_index_n = event_start
+    cdef long prev_level_start = event_start
+    cdef double data_point = data[event_start]
+    cdef double mean_estimate = data_point
+    cdef double var_estimate = variance
+    cdef double new_mean = 0
+    cdef double delta = fabs(data_point - baseline) * cusum_delta
+    cdef double sp = 0, sn = 0, Sp = 0, Sn = 0, Gp = 0, Gn = 0
+    cdef double h = 0
+    cdef double level_sum = data_point
+    cdef double level_sum_minp = data_point
+    cdef double level_sum_minn = data_point
+    cdef unsigned int n_levels = 0
+    cdef double float_inf = np.finfo('d').max
+    cdef double blockage = 0
+    cdef unsigned int qq = 0
+
+    while event_i + 1 < event_end:
+        event_i += 1
+        data_point = data[event_i]
+        new_mean = mean_estimate + (data_point - mean_estimate) / (1 + event_i - ko)
+        var_estimate = ((event_i - ko) * var_estimate + (data_point - mean_estimate) * (
+            data_point - new_mean)) / (1 + event_i - ko)
+        mean_estimate = new_mean
+        if var_estimate > 0:
+            sp = (delta / var_estimate) * (data_point - mean_estimate - delta / 2.)
+            sn = -(delta / var_estimate) * (data_point - mean_estimate + delta / 2.)
+        elif delta == 0:
+            sp = sn = 0
+        else:
+            sp = sn = float_inf
+        Sp = Sp + sp
+        Sn = Sn + sn
+        Gp = fmax(0.0, Gp + sp)
+        Gn = fmax(0.0, Gn + sn)
+        level_sum += data_point
+        if Sp <= 0:
+            Sp = 0
+            min_index_p = event_i
+            level_sum_minp = level_sum
+        if Sn <= 0:
+            Sn = 0
+            min_index_n = event_i
+            level_sum_minn = level_sum
+        if var_estimate > 0:
+            h = cusum_threshold * delta / sqrt(var_estimate)
+        else:
+            h = float_inf
+        if Gp > h or Gn > h:
+            if Gp > h:
+                min_index = min_index_p
+                level_sum = level_sum_minp
+            else:
+                min_index = min_index_n
+                level_sum = level_sum_minn
+            m_levels_length[n_levels] = min_index + 1 - ko
+            m_levels[n_levels] = level_sum / m_levels_length[n_levels]
+            n_levels += 1
+            sn = sp = Sn = Sp = Gn = Gp = 0
+            ko = event_i = min_index + 1
+            min_index_p = min_index_n = event_i
+            prev_level_start = event_i
+            mean_estimate = data[event_i]
+            level_sum = level_sum_minp = level_sum_minn = mean_estimate
+
+    if event_end > prev_level_start:
+        m_levels_length[n_levels] = event_end - prev_level_start
+        m_levels[n_levels] = level_sum / (event_end - prev_level_start)
+        n_levels += 1
+    if event_end - event_start < 10:
+        # Too short for the CUSUM, use the maximum change as the only level.
+        n_levels = 1
+        if was_event_positive:
+            blockage = np.max(data[event_start:event_end])
+        else:
+            blockage = np.min(data[event_start:event_end])
+        m_levels[0] = blockage
+        m_levels_length[0] = event_end - event_start
+        current_blockage[0] = blockage - baseline
+    else:
+        for qq in xrange(n_levels):
+            blockage += m_levels[qq] * m_levels_length[qq]
+        current_blockage[0] = blockage / (event_end - event_start) - baseline
+    return n_levels
+
+cdef class _ChannelDetector:
+    """
+    Searches one channel of data for events.
+
+    The data is passed in block by block with :py:func:`add_block`, and the search picks up where it stopped at the
+    end of the previous block, even part way through an event. Found events are appended to :py:attr:`events` as
+    :py:class:`Event` records, once the raw data points after them have been read. Only the points still needed
+    for the event being searched, and for the raw data of the events found, are kept in a :py:class:`_RingBuffer`.
+
+    Search for events. Keep track of baseline_filter_parameter filtered local (adapting!) mean and variance,
+    and use them to decide baseline_filter_parameter threshold_start for events.  See
+    http://pubs.rsc.org/en/content/articlehtml/2012/nr/c2nr30951c for more details.
+    """
+    cdef:
+        public int channel
+        BaselineStrategy baseline_type
+        ThresholdStrategy threshold_type
+        bint direction_positive
+        bint direction_negative
+        bint prescan
+        double prescan_margin
+        long prescan_resume
+        unsigned int min_event_steps
+        unsigned int max_event_steps
+        long raw_points_per_side
+        double cusum_delta
+        double cusum_threshold
+
+        # Debug data of the points [debug_start, history.end) of the channel, not yet taken by pop_debug, held in
+        # debug_matrices[k][debug_offset:debug_offset + history.end - debug_start]. The matrices are reused, and
+        # only reallocated, geometrically larger, when the points no longer fit.
+        object debug_matrices
+        long debug_offset
+        readonly long debug_start
+        bint finished
+
+        # The points of the channel still needed.
+        _RingBuffer history
+
+        # Index of the next point to search, and the baseline and thresholds there.
+        long i
+        double baseline
+        double variance
+        double threshold_start
+        double data_point
+
+        # State of the event being searched, if in_event.
+        bint in_event
+        bint was_event_positive
+        double threshold_end
+        long event_start
+        long event_end
+        # Index of the last point of the event checked against threshold_end.
+        long event_i
+        # Variance of the baseline at the start of the event.
+        double event_variance
+        double event_area
+        np.ndarray m_levels
+        np.ndarray m_levels_length
+
+        # Events that have been found, but are still waiting for the raw data points after them.
+        object waiting
+
+        public object events
+
+        # Seconds spent fitting the levels of events.
+        readonly double cusum_time
+        # Seconds spent fitting the levels of the event being searched.
+        double event_cusum_time
+
+        # Scratch arrays of the pre-scan, one longer than its window.
+        np.ndarray prescan_baselines
+        np.ndarray prescan_variances
+        np.ndarray prescan_thresholds
+        np.ndarray prescan_scratch
+        # The baseline strategy as it was at prescan_run_start, where the current run of pre-scan windows started.
+        BaselineStrategy prescan_snapshot
+        long prescan_run_start
+
+        # Profile of the search, if profiling, see start_profile.
+        bint profile
+        readonly long profile_event_sample
+        readonly double search_time
+        readonly double prescan_time
+        readonly long searched_points
+        readonly long prescan_points
+        readonly long n_events
+        readonly long cusum_points
+        readonly object event_time_counts
+
+    def __init__(self, int channel, first_block, Parameters parameters, double sample_rate, bint debug=False,
+                 bint profile=False, long profile_event_sample=0):
+        """
+        :param int channel: Index of the channel being searched.
+        :param first_block: Numpy array of the first block of data in the channel. Used to initialize the baseline.
+        :param Parameters parameters: :py:class:`Parameters` for event finding. The channel gets its own copy of\
+            the baseline and threshold strategies.
+        :param double sample_rate: Sample rate of the data.
+        :param bint debug: If True, record the data, baseline, positive threshold and negative threshold at every\
+            point, to be taken with :py:func:`pop_debug`.
+        :param bint profile: If True, count the points and time spent in each stage of the search, see\
+            :py:func:`start_profile`.
+        :param long profile_event_sample: See :py:func:`start_profile`.
+        """
+        cdef double time_step = 1. / sample_rate
+        self.channel = channel
+        self.baseline_type = copy.deepcopy(parameters.baseline_strategy)
+        self.threshold_type = copy.deepcopy(parameters.threshold_strategy)
+        self.direction_positive = parameters.detect_positive_events
+        self.direction_negative = parameters.detect_negative_events
+        self.prescan = parameters.prescan
+        self.prescan_margin = parameters.prescan_margin
+        self.prescan_resume = 0
+        # Min and Max number of points in an event
+        self.min_event_steps = np.ceil(parameters.min_event_length * 1e-6 / time_step)
+        self.max_event_steps = np.ceil(parameters.max_event_length * 1e-6 / time_step)
+        self.raw_points_per_side = RAW_POINTS_PER_SIDE
+        self.cusum_delta = parameters.cusum_delta
+        self.cusum_threshold = parameters.cusum_threshold
+        self.debug_matrices = [np.zeros(0, dtype=DTYPE) for _ in xrange(4)] if debug else None
+        self.debug_offset = 0
+        self.debug_start = 0
+        self.finished = False
+
+        first_block = np.asarray(first_block, dtype=parameters.dtype)
+        cdef double first_point = first_block[0]
+        self.baseline_type.baseline = first_point
+        self.baseline_type.initialize_c(np.asarray(first_block[0:100], dtype=DTYPE))
+        self.baseline = self.baseline_type.get_baseline_c()
+        self.variance = self.baseline_type.get_variance_c()
+        self.threshold_start = self.threshold_type.compute_starting_threshold_c(self.baseline, self.variance)
+        self.data_point = first_point
+
+        self.in_event = False
+        cdef unsigned long max_points = self.max_event_steps + 2 * self.raw_points_per_side
+
+        # The history holds at most an event and its raw points on each side, plus a new block.
+        self.history = _RingBuffer(max_points + 2 * first_block.size, -self.raw_points_per_side, first_block.dtype)
+        # The points before the start of the data are taken to be the first point.
+        self.history.append(np.zeros(self.raw_points_per_side, dtype=first_block.dtype) + first_point)
+        self.i = 0
+
+        self.m_levels = np.zeros(max_points, dtype=DTYPE)
+        self.m_levels_length = np.zeros(max_points, dtype=DTYPE_UINT32)
+        self.prescan_baselines = np.empty(PRESCAN_WINDOW + 1, dtype=DTYPE)
+        self.prescan_variances = np.empty(PRESCAN_WINDOW + 1, dtype=DTYPE)
+        self.prescan_thresholds = np.empty(PRESCAN_WINDOW + 1, dtype=DTYPE)
+        self.prescan_scratch = np.empty(PRESCAN_WINDOW, dtype=DTYPE)
+        self.prescan_snapshot = None
+        self.prescan_run_start = 0
+
+        self.waiting = deque()
+        self.events = []
+        self.cusum_time = 0
+        self.event_cusum_time = 0
+        self.start_profile(profile, profile_event_sample)
+
+        self.add_block(first_block)
+
+    def start_profile(self, bint profile, long profile_event_sample=0):
+        """
+        Resets the profile of the search.
+
+        :param bint profile: If True, count the points searched, pre-scanned and in events, and time the search\
+            and the pre-scan, from now on.
+        :param long profile_event_sample: If more than 0, add the time taken to find the levels of every\
+            profile_event_sample-th event to :py:attr:`event_time_counts`, a histogram with the bins\
+            :py:data:`PROFILE_EVENT_TIME_BIN_EDGES`. event_time_counts[k] counts the events that took between\
+            edges[k - 1] and edges[k] seconds, with the first and last bins open ended.
+        """
+        self.profile = profile
+        self.profile_event_sample = profile_event_sample if profile else 0
+        self.search_time = 0
+        self.prescan_time = 0
+        self.searched_points = 0
+        self.prescan_points = 0
+        self.n_events = 0
+        self.cusum_points = 0
+        self.event_time_counts = np.zeros(PROFILE_EVENT_TIME_BIN_EDGES.size + 1, dtype=np.int64)
+
+    def add_block(self, block):
+        """
+        Searches the next block of data in the channel.
+
+        :param block: Numpy array of the next points in the channel.
+        """
+        # Only keep the old data still needed for the event being searched or the raw data of the waiting events.
+        cdef long keep_from = self.i
+        if self.in_event:
+            keep_from = min(keep_from, self.event_start)
+        if len(self.waiting) > 0:
+            keep_from = min(keep_from, self.waiting[0][0])
+        self.history.discard_before(keep_from - self.raw_points_per_side)
+        cdef long n_recorded = self.history.end - self.debug_start
+        self.history.append(np.asarray(block, dtype=self.history.dtype))
+        if self.debug_matrices is not None:
+            self._reserve_debug(n_recorded, self.history.end - self.debug_start)
+
+        self._search()
+        self._collect_events(False)
+
+    def finish(self):
+        """
+        Call once there is no more data. Any event still going on at the end of the data is dropped, and the
+        waiting events are collected with their raw data cut short.
+        """
+        self.in_event = False
+        self.finished = True
+        self._collect_events(True)
+
+    def debug_end(self):
+        """
+        :returns: The index up to which the debug data is final. The search never goes back before the current\
+            point, or the start of the event being searched.
+        """
+        if self.finished:
+            return self.history.end
+        if self.in_event:
+            return self.event_start
+        return self.i
+
+    def pop_debug(self, long end):
+        """
+        Takes the debug data of the points [debug_start, end), which must be final, see :py:func:`debug_end`.
+
+        :returns: List of the data, baseline, positive threshold and negative threshold arrays of the points. The\
+            arrays are views of the detector's matrices, only valid until the next :py:func:`add_block`.
+        """
+        cdef long k = end - self.debug_start
+        popped = [matrix[self.debug_offset:self.debug_offset + k] for matrix in self.debug_matrices]
+        self.debug_offset += k
+        self.debug_start = end
+        return popped
+
+    cdef void _reserve_debug(self, long n_recorded, long n_points) except *:
+        """
+        Makes room in the debug matrices for the points [debug_start, debug_start + n_points), keeping the n_recorded
+        points already recorded. The points are moved to the front of the matrices if they fit, otherwise the
+        matrices are reallocated with twice the room needed.
+        """
+        cdef long offset = self.debug_offset
+        if offset + n_points <= self.debug_matrices[0].size:
+            return
+        if n_points <= self.debug_matrices[0].size:
+            for matrix in self.debug_matrices:
+                matrix[:n_recorded] = matrix[offset:offset + n_recorded]
+        else:
+            grown = [np.zeros(2 * n_points, dtype=DTYPE) for _ in xrange(4)]
+            for matrix, old in zip(grown, self.debug_matrices):
+                matrix[:n_recorded] = old[offset:offset + n_recorded]
+            self.debug_matrices = grown
+        self.debug_offset = 0
+
+    cdef void _search(self) except *:
+        """
+        Searches all of the data read so far, stopping when more data is needed.
+        """
+        cdef np.ndarray[np.float32_t] data_float32
+        cdef np.ndarray[np.float64_t] data_float64
+        if self.history.dtype == np.float32:
+            data_float32 = self.history.window(self.history.start, self.history.end)
+            self._search_data(data_float32)
+        else:
+            data_float64 = self.history.window(self.history.start, self.history.end)
+            self._search_data(data_float64)
+
+    cdef void _search_data(self, np.ndarray[sample_t] data) except *:
+        """
+        Does the search of :py:func:`_search`, with the loop compiled for the type of the data.
+
+        :param data: The points held by the history, data[k] is the point at index history.start + k of the channel.
+        """
+        cdef long offset = self.history.start
+        cdef long n = self.history.end
+        cdef long i = self.i
+        cdef long window_end = 0
+        cdef long window = 0
+        cdef double baseline = self.baseline
+        cdef double variance = self.variance
+        cdef double threshold_start = self.threshold_start
+        cdef double data_point = self.data_point
+        cdef long prescan_resume = self.prescan_resume
+        cdef bint prescan = self.prescan
+        cdef bint direction_positive = self.direction_positive
+        cdef bint direction_negative = self.direction_negative
+        cdef bint is_event = False
+        cdef bint was_event_positive = False
+        cdef BaselineStrategy baseline_type = self.baseline_type
+        cdef ThresholdStrategy threshold_type = self.threshold_type
+
+        cdef bint record_debug = self.debug_matrices is not None
+        cdef np.ndarray[DTYPE_t] debug_data_matrix = self.debug_matrices[0] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_baseline_matrix = self.debug_matrices[1] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_threshold_pos_matrix = self.debug_matrices[2] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_threshold_neg_matrix = self.debug_matrices[3] if record_debug else None
+        # Index of the point recorded at the start of the debug matrices.
+        cdef long debug_origin = self.debug_start - self.debug_offset
+        cdef double event_time = 0
+        cdef bint event_done = False
+        cdef bint profile = self.profile
+        cdef double search_start = time.time() if profile else 0
+        cdef double prescan_start = 0
+        cdef long search_from = i
+        cdef long prescan_from = 0
+
+        while True:
+            if self.in_event:
+                event_time = time.time()
+                event_done = self._search_event(data, offset, n)
+                event_time = time.time() - event_time
+                self.cusum_time += event_time
+                self.event_cusum_time += event_time
+                if not event_done:
+                    # We need new data to finish the event.
+                    break
+                if profile:
+                    self._profile_event()
+                self.event_cusum_time = 0
+                # Update the baseline with the last point looked at in the event.
+                data_point = self.data_point
+                i = self.event_end
+                baseline = baseline_type.compute_baseline_c(data_point)
+                variance = baseline_type.compute_variance_c(data_point)
+                i += 1
+                continue
+
+            if prescan and i >= prescan_resume:
+                if profile:
+                    prescan_start = time.time()
+                    prescan_from = i
+                # Skip the quiet baseline in bulk, a window at a time, so that each candidate only costs a scan of
+                # its window instead of the rest of a long read.
+                window = PRESCAN_FIRST_WINDOW
+                self.prescan_snapshot = None
+                while i < n:
+                    window_end = min(n, i + window)
+                    i = offset + self._prescan_quiet_points(data, i - offset, window_end - offset, &baseline,
+                                                            &variance, &threshold_start, offset - debug_origin)
+                    if i < window_end:
+                        break
+                    window = min(2 * window, PRESCAN_WINDOW)
+                self.prescan_snapshot = None
+                # The pre-scan can replace the baseline strategy.
+                baseline_type = self.baseline_type
+                prescan_resume = i + PRESCAN_RESUME_POINTS
+                if profile:
+                    self.prescan_time += time.time() - prescan_start
+                    self.prescan_points += i - prescan_from
+            if i >= n:
+                break
+
+            data_point = data[i - offset]
+
+            # Detecting a negative event
+            if direction_negative and data_point < baseline - threshold_start:
+                is_event = True
+                was_event_positive = False
+            # Detecting a positive event
+            elif direction_positive and data_point > baseline + threshold_start:
+                is_event = True
+                was_event_positive = True
+            if record_debug:
+                debug_data_matrix[i - debug_origin] = data_point
+                debug_baseline_matrix[i - debug_origin] = baseline
+                if direction_positive:
+                    debug_threshold_pos_matrix[i - debug_origin] = baseline + threshold_start
+                if direction_negative:
+                    debug_threshold_neg_matrix[i - debug_origin] = baseline - threshold_start
+            threshold_start = threshold_type.compute_starting_threshold_c(baseline, variance)
+            if is_event:
+                is_event = False
+                self._start_event(i, data_point, baseline, variance, was_event_positive)
+                continue
+
+            baseline = baseline_type.compute_baseline_c(data_point)
+            variance = baseline_type.compute_variance_c(data_point)
+            i += 1
+
+        self.i = i
+        self.baseline = baseline
+        self.variance = variance
+        self.threshold_start = threshold_start
+        self.data_point = data_point
+        self.prescan_resume = prescan_resume
+        if profile:
+            self.search_time += time.time() - search_start
+            self.searched_points += i - search_from
+
+    cdef void _profile_event(self) except *:
+        """
+        Adds the event that just ended to the profile.
+        """
+        self.n_events += 1
+        self.cusum_points += self.event_end + 1 - self.event_start
+        if self.profile_event_sample > 0 and self.n_events % self.profile_event_sample == 0:
+            self.event_time_counts[np.searchsorted(PROFILE_EVENT_TIME_BIN_EDGES, self.event_cusum_time,
+                                                   side='right')] += 1
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef long _prescan_quiet_points(self, np.ndarray[sample_t] data, long i, long n, double *baseline,
+                                    double *variance, double *threshold_start, long debug_offset) except -1:
+        """
+        Skips through the quiet stretch of data[i:n] without walking every point through the main event loop.
+
+        First a vectorized pass over the block looks for candidate points further than margin * threshold_start
+        away from the current baseline. The points before the first candidate are then pushed through the
+        strategies' block methods, see :py:func:`BaselineStrategy.compute_baseline_block` and
+        :py:func:`ThresholdStrategy.compute_starting_threshold_block`, and each point is checked against its exact
+        starting threshold, so the result is identical to the point-by-point loop.
+
+        The points before the first candidate are run straight through :py:attr:`baseline_type`. If one of them
+        turns out to be outside its exact threshold, the strategy has been given points past it, so it is replaced
+        by a copy taken at the start of the run of windows, see prescan_snapshot, which is given the run's quiet
+        points again.
+
+        :returns: The index of the first point that the main loop has to handle. baseline, variance and
+            threshold_start are updated to the values the main loop would hold when reaching that point.
+        """
+        cdef np.ndarray[sample_t] segment = data[i:n]
+        cdef long stop = n - i
+        cdef double band = self.prescan_margin * threshold_start[0]
+        cdef bint direction_positive = self.direction_positive
+        cdef bint direction_negative = self.direction_negative
+        candidates = None
+        if direction_negative:
+            candidates = segment < baseline[0] - band
+        if direction_positive:
+            if candidates is None:
+                candidates = segment > baseline[0] + band
+            else:
+                candidates |= segment > baseline[0] + band
+        if candidates is not None and candidates.any():
+            stop = np.argmax(candidates)
+        if stop == 0:
+            return i
+
+        # prev_baselines[j] and prev_variances[j] hold the baseline and variance the main loop would have when
+        # reaching point j, so before the baseline strategy is given point j.
+        cdef np.ndarray[DTYPE_t] prev_baselines = self.prescan_baselines
+        cdef np.ndarray[DTYPE_t] prev_variances = self.prescan_variances
+        prev_baselines[0] = baseline[0]
+        prev_variances[0] = variance[0]
+        # The strategies work in double precision.
+        cdef np.ndarray[DTYPE_t] quiet = np.asarray(segment[:stop], dtype=DTYPE)
+        if self.prescan_snapshot is None:
+            self.prescan_snapshot = copy.copy(self.baseline_type)
+            self.prescan_run_start = i
+        self.baseline_type.compute_baseline_block_c(quiet, prev_baselines[1:], prev_variances[1:])
+
+        # The main loop checks point j against the threshold computed from the baseline and variance before
+        # point j - 1, so thresholds[j] is the threshold at point j, and thresholds[stop] the one after the last.
+        cdef np.ndarray[DTYPE_t] thresholds = self.prescan_thresholds
+        thresholds[0] = threshold_start[0]
+        self.threshold_type.compute_starting_threshold_block_c(prev_baselines[:stop], prev_variances[:stop],
+                                                               thresholds[1:])
+
+        cdef long j = 0
+        cdef double data_point
+        while j < stop:
+            data_point = segment[j]
+            if (direction_negative and data_point < prev_baselines[j] - thresholds[j]) or (
+                        direction_positive and data_point > prev_baselines[j] + thresholds[j]):
+                break
+            j += 1
+
+        cdef long k
+        cdef long replay_stop
+        if j < stop:
+            # Leave the strategy at point j.
+            k = self.prescan_run_start
+            while k < i + j:
+                replay_stop = min(i + j, k + PRESCAN_WINDOW)
+                self.prescan_snapshot.compute_baseline_block_c(np.asarray(data[k:replay_stop], dtype=DTYPE),
+                                                               self.prescan_scratch, self.prescan_scratch)
+                k = replay_stop
+            self.baseline_type = self.prescan_snapshot
+            self.prescan_snapshot = None
+
+        if self.debug_matrices is not None and j > 0:
+            self.debug_matrices[0][debug_offset + i:debug_offset + i + j] = segment[:j]
+            self.debug_matrices[1][debug_offset + i:debug_offset + i + j] = prev_baselines[:j]
+            if direction_positive:
+                self.debug_matrices[2][debug_offset + i:debug_offset + i + j] = prev_baselines[:j] + thresholds[:j]
+            if direction_negative:
+                self.debug_matrices[3][debug_offset + i:debug_offset + i + j] = prev_baselines[:j] - thresholds[:j]
+
+        baseline[0] = prev_baselines[j]
+        variance[0] = prev_variances[j]
+        threshold_start[0] = thresholds[j]
+        return i + j
+
+    cdef void _start_event(self, long i, double data_point, double baseline, double variance,
+                           bint was_event_positive):
+        self.in_event = True
+        self.was_event_positive = was_event_positive
+        self.baseline = baseline
+        # Set ending threshold_end
+        self.threshold_end = self.threshold_type.compute_ending_threshold_c(baseline, variance)
+        self.event_start = i
+        self.event_end = i + 1
+        self.event_i = i
+        self.event_variance = variance
+        self.event_area = data_point  # integrate the area
+
+    cdef bint _search_event(self, np.ndarray[sample_t] data, long offset, long n) except *:
+        """
+        Searches the event that has been started with :py:func:`_start_event`, until it ends. The levels of the
+        event are then fit with :py:func:`_fit_levels`.
+
+        :returns: True if the event is over, False if more data is needed.
+        """
+        cdef long event_start = self.event_start
+        cdef long event_end = self.event_end
+        cdef long event_i = self.event_i
+        cdef double baseline = self.baseline
+        cdef double threshold_end = self.threshold_end
+        cdef bint was_event_positive = self.was_event_positive
+        cdef double data_point = self.data_point
+        cdef unsigned int n_levels = 0
+        cdef double current_blockage = 0
+        cdef bint done = False
+        cdef bint direction_positive = self.direction_positive
+        cdef bint direction_negative = self.direction_negative
+
+        cdef bint record_debug = self.debug_matrices is not None
+        cdef np.ndarray[DTYPE_t] debug_data_matrix = self.debug_matrices[0] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_baseline_matrix = self.debug_matrices[1] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_threshold_pos_matrix = self.debug_matrices[2] if record_debug else None
+        cdef np.ndarray[DTYPE_t] debug_threshold_neg_matrix = self.debug_matrices[3] if record_debug else None
+        # Index of the point recorded at the start of the debug matrices.
+        cdef long debug_origin = self.debug_start - self.debug_offset
+
+        # loop until event ends
+        while event_i - event_start < self.max_event_steps:
+            if event_i + 1 >= n:
+                # We need new data, save where we are in the event.
+                self.event_i = event_i
+                self.data_point = data_point
+                return False
+            event_i += 1
+            data_point = data[event_i - offset]
+            if record_debug:
+                debug_data_matrix[event_i - debug_origin] = data_point
+                debug_baseline_matrix[event_i - debug_origin] = baseline
+                if direction_positive:
+                    debug_threshold_pos_matrix[event_i - debug_origin] = baseline + threshold_end
+                if direction_negative:
+                    debug_threshold_neg_matrix[event_i - debug_origin] = baseline - threshold_end
+            if (not was_event_positive and data_point >= baseline - threshold_end) or (
+                        was_event_positive and data_point <= baseline + threshold_end):
+                event_end = event_i
+                done = True
+                break
+
+        self.in_event = False
+        self.event_end = event_end
+        self.data_point = data_point
+        # is the event long enough?
+        if done and event_end - event_start > self.min_event_steps:
+            n_levels = _fit_levels(data, event_start - offset, event_end - offset, baseline, self.event_variance,
+                                   was_event_positive, self.cusum_delta, self.cusum_threshold, self.m_levels,
+                                   self.m_levels_length, &current_blockage)
+            self.waiting.append((event_start, event_end, n_levels, baseline, current_blockage,
+                                 self.event_area - baseline, self.m_levels[:n_levels].copy(),
+                                 self.m_levels_length[:n_levels].copy()))
+        return True
+
+    cdef void _collect_events(self, bint final) except *:
+        """
+        Moves the waiting events whose raw data after the event has been read to :py:attr:`events`.
+
+        :param final: If True, there is no more data, and all of the waiting events are moved.
+        """
+        cdef long event_start, event_end, raw_start, raw_end
+        while len(self.waiting) > 0:
+            event_start, event_end = self.waiting[0][0], self.waiting[0][1]
+            raw_start = event_start - self.raw_points_per_side
+            raw_end = event_end + self.raw_points_per_side
+            if raw_end > self.history.end and not final:
+                return
+            n_levels, baseline, current_blockage, area, levels, level_lengths = self.waiting.popleft()[2:]
+            raw_data = np.zeros(raw_end - raw_start, dtype=self.history.dtype)
+            raw_data[:min(raw_end, self.history.end) - raw_start] = \
+                self.history.window(raw_start, min(raw_end, self.history.end))
+            self.events.append(Event(self.channel, event_start, event_end - event_start, n_levels, baseline,
+                                     current_blockage, area, raw_data, levels, level_lengths))
+
+def _write_debug(detectors, debug_writer):
+    """
+    Passes the debug data that is final in every channel to debug_writer.
+    """
+    cdef long start = detectors[0].debug_start
+    cdef long end = min(detector.debug_end() for detector in detectors)
+    if end <= start:
+        return
+    popped = [detector.pop_debug(end) for detector in detectors]
+    debug_writer([np.vstack([channel[k] for channel in popped]) for k in xrange(4)], start)
+
+def _create_detectors(AbstractReader reader, first_blocks, Parameters parameters, bint debug=False,
+                      bint profile=False, long profile_event_sample=0):
+    """
+    :param first_blocks: List of the first block of each channel, already read from the reader.
+    :returns: List of a :py:class:`_ChannelDetector` for each channel, which has searched its first block. Each\
+        channel is searched with its own baseline and thresholds.
+    """
+    cdef double sample_rate = reader.get_sample_rate_c()
+    return [_ChannelDetector(c, first_blocks[c], parameters, sample_rate, debug, profile, profile_event_sample)
+            for c in xrange(len(first_blocks))]
+
+def _iter_block_events(AbstractReader reader, detectors, long points_read, long blocks_per_read,
+                       debug_writer=None, progress=None):
+    """
+    Searches every channel of the reader, one block at a time.
+
+    Yields (points_read, events) after each block, where points_read is the number of points read from each
+    channel so far, and events is the list of :py:class:`Event` finished in that block. While suspended at a
+    yield, the detectors hold the whole state of the search, and can be saved to resume it later.
+
+    :param detectors: List of the :py:class:`_ChannelDetector` of each channel, see :py:func:`_create_detectors`.
+    :param long points_read: Number of points of each channel the detectors have already searched.
+    :param long blocks_per_read: Number of the reader's blocks to read at a time.
+    :param debug_writer: (Optional) Function debug_writer(debug_matrices, start) to pass the debug data to as it\
+        is recorded. debug_matrices is a list of 2D numpy arrays of the data, baseline, positive threshold and\
+        negative threshold, one row per channel, of the points [start, start + n). The whole data is passed, in\
+        order, with memory use bounded by the size of an event and a block. The detectors must have been created\
+        with debug=True.
+    :param progress: (Optional) :py:class:`Progress` to add the time spent reading, scanning, fitting levels and\
+        writing the debug data to.
+    """
+    cdef unsigned int c = 0
+    cdef _ChannelDetector detector
+    cdef bint timed = progress is not None
+    cdef double time1 = 0, time2 = 0, time3 = 0
+    cdef double cusum_time = 0, prev_cusum_time = sum(detector.cusum_time for detector in detectors)
+
+    while True:
+        if debug_writer is not None:
+            if timed:
+                time1 = time.time()
+            _write_debug(detectors, debug_writer)
+            if timed:
+                progress.write_time += time.time() - time1
+        events = []
+        for detector in detectors:
+            events.extend(detector.events)
+            detector.events = []
+        yield points_read, events
+
+        # Get new data
+        if timed:
+            time1 = time.time()
+        blocks = reader.get_next_blocks_c(blocks_per_read)
+        if timed:
+            time2 = time.time()
+            progress.read_time += time2 - time1
+        if blocks[0].size < 1:
             break
-        # else we must need to visit more caches
-        elif i < spot + nn:
-            res[res_spot:res_spot + nn - (i - spot)] = cache[i - spot:]
-            res_spot += nn - (i - spot)
-            i = spot + nn
-        spot += nn
-    return res
+        for c in xrange(len(detectors)):
+            detector = detectors[c]
+            detector.add_block(blocks[c])
+        points_read += blocks[0].size
+        del blocks
+        if timed:
+            time3 = time.time()
+            cusum_time = sum(detector.cusum_time for detector in detectors)
+            progress.cusum_time += cusum_time - prev_cusum_time
+            progress.scan_time += time3 - time2 - (cusum_time - prev_cusum_time)
+            prev_cusum_time = cusum_time
+
+    # Collect the events still waiting for data after them
+    events = []
+    for detector in detectors:
+        detector.finish()
+        events.extend(detector.events)
+        detector.events = []
+    if debug_writer is not None:
+        _write_debug(detectors, debug_writer)
+    yield points_read, events
+
+def _min_max_decimate(matrix, long decimation):
+    """
+    :returns: The minimum and maximum of each group of decimation points in the rows of matrix, interleaved. The\
+        last group can be shorter.
+    """
+    cdef long n = matrix.shape[1]
+    cdef long full = n - n % decimation
+    cdef long n_groups = (n + decimation - 1) // decimation
+    decimated = np.empty((matrix.shape[0], 2 * n_groups), dtype=matrix.dtype)
+    if full > 0:
+        groups = matrix[:, :full].reshape(matrix.shape[0], -1, decimation)
+        decimated[:, 0:2 * (full // decimation):2] = groups.min(axis=2)
+        decimated[:, 1:2 * (full // decimation):2] = groups.max(axis=2)
+    if full < n:
+        decimated[:, -2] = matrix[:, full:].min(axis=1)
+        decimated[:, -1] = matrix[:, full:].max(axis=1)
+    return decimated
+
+class _DebugDecimator(object):
+    """
+    Passes the debug data to a sink, keeping only the minimum and maximum of each group of decimation points.
+    The groups start at the first point of the data, and the data must be written in order, without gaps.
+    """
+
+    def __init__(self, sink, decimation):
+        self.sink = sink
+        self.decimation = decimation
+        self.remainder = None
+        self.remainder_start = 0
+
+    def write(self, debug_matrices, start):
+        if self.decimation <= 1:
+            self.sink.write_debug(debug_matrices, start)
+            return
+        if self.remainder is not None:
+            debug_matrices = [np.hstack((old, new)) for old, new in zip(self.remainder, debug_matrices)]
+            start = self.remainder_start
+        cdef long n = debug_matrices[0].shape[1]
+        cdef long full = n - n % self.decimation
+        if full > 0:
+            self.sink.write_debug([_min_max_decimate(matrix[:, :full], self.decimation)
+                                   for matrix in debug_matrices], 2 * (start // self.decimation))
+        self.remainder = [matrix[:, full:] for matrix in debug_matrices]
+        self.remainder_start = start + full
+
+    def flush(self):
+        """
+        Writes the last, shorter group of points.
+        """
+        if self.remainder is not None and self.remainder[0].shape[1] > 0:
+            self.sink.write_debug([_min_max_decimate(matrix, self.decimation) for matrix in self.remainder],
+                                  2 * (self.remainder_start // self.decimation))
+        self.remainder = None
+
+class Progress(object):
+    """
+    Progress of the search of one file, passed to the progress_callback and sent through the pipe of
+    :py:func:`find_events` as the search runs. Has the following fields:
+
+    * filename -- Name of the file being searched.
+    * points_read -- Number of points of each channel searched so far.
+    * points_per_channel_total -- Number of points in each channel of the file.
+    * event_count -- Number of events found so far.
+    * elapsed_time -- Seconds since the search started.
+    * read_time -- Seconds spent reading the data.
+    * scan_time -- Seconds spent following the baseline and looking for the start of events.
+    * cusum_time -- Seconds spent finding the levels of events with CUSUM.
+    * write_time -- Seconds spent writing the events and debug data to the sink.
+    * rate -- Points per channel searched per second, since the previous update.
+    * mean_rate -- Points per channel searched per second, since the search started.
+    * time_left -- Estimated number of seconds until the search is done, from the mean rate.
+    * done -- Whether the search is done.
+
+    When a file is searched in segments, with segment_workers > 1, the time of the workers is not split up, and
+    only write_time, the time spent merging the segments, is kept.
+
+    str() gives a one line status text.
+    """
+
+    def __init__(self, filename='', long points_per_channel_total=0, long points_read=0, long event_count=0):
+        self.filename = filename
+        self.points_read = points_read
+        self.points_per_channel_total = points_per_channel_total
+        self.event_count = event_count
+        self.elapsed_time = 0.
+        self.read_time = 0.
+        self.scan_time = 0.
+        self.cusum_time = 0.
+        self.write_time = 0.
+        self.rate = 0.
+        self.mean_rate = 0.
+        self.time_left = 0.
+        self.done = False
+        # A resumed search starts part way through the file.
+        self._start_points = points_read
+        self._start_time = time.time()
+        self._prev_points = points_read
+        self._prev_time = self._start_time
+
+    @property
+    def percent_done(self):
+        if self.points_per_channel_total <= 0:
+            return 0.
+        return 100. * self.points_read / self.points_per_channel_total
+
+    def _update(self, long points_read, long event_count):
+        """
+        Updates the counts, and the rates since the previous update.
+        """
+        cdef double now = time.time()
+        self.points_read = points_read
+        self.event_count = event_count
+        self.elapsed_time = now - self._start_time
+        if now > self._prev_time:
+            self.rate = (points_read - self._prev_points) / (now - self._prev_time)
+        if self.elapsed_time > 0:
+            self.mean_rate = (points_read - self._start_points) / self.elapsed_time
+        if self.mean_rate > 0:
+            self.time_left = max(0, self.points_per_channel_total - points_read) / self.mean_rate
+        self._prev_points = points_read
+        self._prev_time = now
+
+    def __str__(self):
+        return "Event Count: %d Percent Done: %.2f Rate: %.2e pt/s Total Rate: %.2e pt/s Time Left: %s" % (
+            self.event_count, self.percent_done, self.rate, self.mean_rate,
+            datetime.timedelta(seconds=int(self.time_left)))
+
+class Profile(object):
+    """
+    Counters and timers of the stages of the search of one file, from find_events(profile=True). Saved by the sink,
+    see :py:func:`pypore.sinks.event_sink.EventSink.write_profile`. Has the following fields, summed over the
+    channels:
+
+    * n_reads -- Number of reads from the file.
+    * read_points -- Number of points of each channel read.
+    * read_time -- Seconds spent reading, in the reader's get_next_blocks.
+    * prescan_points -- Number of points skipped by the pre-scan, see :py:class:`Parameters`.
+    * prescan_time -- Seconds spent in the pre-scan.
+    * scan_points -- Number of points searched one at a time, each with a call to the baseline strategy's\
+      compute_baseline and compute_variance, and the threshold strategy's compute_starting_threshold.
+    * scan_time -- Seconds spent searching points one at a time, mostly in the strategies.
+    * n_events -- Number of events whose levels were searched for, including the ones dropped for being too\
+      short or too long.
+    * cusum_points -- Number of points in those events.
+    * cusum_time -- Seconds spent finding the levels of the events with CUSUM.
+    * n_writes -- Number of batches of events written to the sink.
+    * write_time -- Seconds spent writing the events and debug data to the sink.
+    * total_time -- Seconds the whole search took.
+    * event_sample -- Only every event_sample-th event is added to event_time_counts. 0 if not sampled.
+    * event_time_counts -- Histogram of the seconds taken to find the levels of the sampled events.\
+      event_time_counts[k] counts the events that took between event_time_bin_edges[k - 1] and\
+      event_time_bin_edges[k] seconds, with the first and last bins open ended.
+    * event_time_bin_edges -- :py:data:`PROFILE_EVENT_TIME_BIN_EDGES`.
+    """
+
+    FIELDS = ['n_reads', 'read_points', 'read_time', 'prescan_points', 'prescan_time', 'scan_points', 'scan_time',
+              'n_events', 'cusum_points', 'cusum_time', 'n_writes', 'write_time', 'total_time', 'event_sample',
+              'event_time_counts', 'event_time_bin_edges']
+
+    def __init__(self, detectors, progress, long n_reads, long n_writes):
+        """
+        :param detectors: The :py:class:`_ChannelDetector` of each channel, which were searched with profile=True.
+        :param progress: The :py:class:`Progress` of the search, with its time split.
+        """
+        self.n_reads = n_reads
+        self.read_points = progress.points_read
+        self.read_time = progress.read_time
+        self.prescan_points = sum(detector.prescan_points for detector in detectors)
+        self.prescan_time = sum(detector.prescan_time for detector in detectors)
+        self.n_events = sum(detector.n_events for detector in detectors)
+        self.cusum_points = sum(detector.cusum_points for detector in detectors)
+        self.cusum_time = progress.cusum_time
+        self.scan_points = sum(detector.searched_points for detector in detectors) - self.prescan_points - \
+                           self.cusum_points
+        self.scan_time = max(0., progress.scan_time - self.prescan_time)
+        self.n_writes = n_writes
+        self.write_time = progress.write_time
+        self.total_time = progress.elapsed_time
+        self.event_sample = detectors[0].profile_event_sample
+        self.event_time_counts = np.sum([detector.event_time_counts for detector in detectors], axis=0)
+        self.event_time_bin_edges = PROFILE_EVENT_TIME_BIN_EDGES
+
+    def as_dict(self):
+        """
+        :returns: Dict of the fields.
+        """
+        return dict((name, getattr(self, name)) for name in self.FIELDS)
 
-cpdef np.ndarray[DTYPE_t] _get_data_range_test_wrapper(data_cache, long i, long n):
+def _send_progress(progress, pipe, progress_callback, bint verbose):
     """
-    Just a wrapper so the python unittests can call :py:func:`_get_data_range`.
+    Passes a copy of the progress to progress_callback, and sends it through the pipe, or prints it to standard
+    output if there is no pipe and verbose.
     """
-    return _get_data_range(data_cache, i, n)
+    progress = copy.copy(progress)
+    if progress_callback is not None:
+        progress_callback(progress)
+    if pipe is not None:
+        pipe.send({'status_text': str(progress), 'progress': progress})
+    elif verbose:
+        sys.stdout.write("\r" + str(progress))
+        sys.stdout.flush()
 
 cdef _lazy_load_find_events(AbstractReader reader, Parameters parameters, object pipe=None, h5file=None,
-                            save_file_name=None, debug=False):
+                            save_file_name=None, debug=False, bint verbose=True, sink=None, bint resume=False,
+                            checkpoint_interval=None, progress_callback=None,
+                            double progress_interval=DEFAULT_PROGRESS_INTERVAL, bint profile=False,
+                            long profile_event_sample=0):
     cdef unsigned int event_count = 0
 
-    cdef unsigned int get_blocks = 1
-
-    cdef unsigned int raw_points_per_side = 50
+    cdef unsigned int raw_points_per_side = RAW_POINTS_PER_SIDE
 
     cdef double sample_rate = reader.get_sample_rate_c()
     cdef double time_step = 1. / sample_rate
-    # Min and Max number of points in an event
-    cdef unsigned int min_event_steps = np.ceil(parameters.min_event_length * 1e-6 / time_step)
     cdef unsigned int max_event_steps = np.ceil(parameters.max_event_length * 1e-6 / time_step)
     cdef long points_per_channel_total = reader.get_points_per_channel_total_c()
+    cdef long blocks_per_read = _get_blocks_per_read(reader, parameters)
+    cdef unsigned long max_points = max_event_steps + 2 * raw_points_per_side
+    cdef unsigned int n_channels = 0
+    cdef long points_read = 0
+
+    if sink is None:
+        if save_file_name is None and h5file is None:
+            if resume:
+                # Resume the latest search of the file, which saved to a name with an earlier timestamp.
+                save_file_name = _find_checkpointed_save_file_name(reader.get_filename_c())
+            if save_file_name is None:
+                save_file_name = _get_default_save_file_name(reader.get_filename_c())
+        sink = HDF5EventSink(save_file_name, h5file)
+
+    if checkpoint_interval is None:
+        # Only checkpoint searches that are meant to be resumed.
+        checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL if resume else 0
+    checkpoint_file_name = _get_checkpoint_file_name(sink)
+    checkpoint = None
+    if resume and checkpoint_file_name is not None and os.path.exists(checkpoint_file_name):
+        checkpoint = _load_checkpoint(checkpoint_file_name, reader, debug)
+
+    if checkpoint is not None:
+        # Pick up the search where the checkpoint left it.
+        detectors = checkpoint['detectors']
+        n_channels = len(detectors)
+        points_read = checkpoint['points_read']
+        event_count = checkpoint['event_count']
+        _skip_points(reader, points_read)
+        sink.resume(reader, parameters, n_channels, max_points, raw_points_per_side, debug, checkpoint['sink'])
+        for detector in detectors:
+            # Only profile the rest of the search.
+            detector.start_profile(profile, profile_event_sample)
+    else:
+        # allocate memory for data
+        data_x = reader.get_next_blocks_c(blocks_per_read)
+        n_channels = len(data_x)
+        points_read = data_x[0].size
 
-    cdef BaselineStrategy baseline_type = parameters.baseline_strategy
+        if points_read < 100:
+            print 'Not enough data points in file.'
+            if pipe is not None:
+                pipe.close()
+            return 'Not enough data points in file.'
 
-    # Threshold direction.  -1 for negative, 0 for both, +1 for positive
-    direction_positive = False
-    direction_negative = False
-    if parameters.detect_positive_events:
-        direction_positive = True
-    if parameters.detect_negative_events:
-        direction_negative = True
+        sink.open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        detectors = _create_detectors(reader, data_x, parameters, debug, profile, profile_event_sample)
+        del data_x
 
-    # allocate memory for data
-    data_x = reader.get_next_blocks_c(get_blocks)
-    cdef unsigned int n_channels = len(data_x)
-    cdef np.ndarray[DTYPE_t] data = data_x[0]  # only get channel 1
-    del data_x
+    # Figure out how many events it takes to fill a batch of 10MB (1048576 bytes = 1MB)
+    cdef long batch_size = _get_batch_size(max_points)
+    batch = []
 
-    cdef unsigned long n = data.size
+    cdef:
+        unsigned long place_in_data = points_read
+        double last_progress = time.time()
+        double last_checkpoint = last_progress
+        double write_start = 0
+        # block_events yields once per read, including the first read and the one that finds the end of the file.
+        long n_reads = 0
+        long n_writes = 0
+
+    progress = Progress(reader.get_filename_c(), points_per_channel_total, points_read, event_count)
+    if checkpoint is not None:
+        # There was no first read.
+        n_reads = -1
+
+    # The debug data is streamed to the sink as it is recorded, [data, baseline, threshold positive, threshold negative]
+    debug_decimator = None
+    if debug:
+        debug_decimator = _DebugDecimator(sink, parameters.debug_decimation)
+        if checkpoint is not None:
+            debug_decimator.remainder, debug_decimator.remainder_start = checkpoint['debug_remainder']
+
+    block_events = _iter_block_events(reader, detectors, points_read, blocks_per_read,
+                                      debug_decimator.write if debug_decimator is not None else None, progress)
+
+    for place_in_data, events in block_events:
+        n_reads += 1
+        batch.extend(events)
+        event_count += len(events)
+        if len(batch) >= batch_size:
+            write_start = time.time()
+            sink.write_events(batch)
+            progress.write_time += time.time() - write_start
+            n_writes += 1
+            batch = []
+
+        if checkpoint_file_name is not None and checkpoint_interval > 0 and \
+                time.time() - last_checkpoint >= checkpoint_interval:
+            write_start = time.time()
+            sink.write_events(batch)
+            progress.write_time += time.time() - write_start
+            n_writes += 1
+            batch = []
+            sink_state = sink.checkpoint()
+            if sink_state is not None:
+                _save_checkpoint(checkpoint_file_name, {
+                    'data_filename': reader.get_filename_c(), 'points_per_channel_total': points_per_channel_total,
+                    'debug': bool(debug), 'points_read': place_in_data, 'event_count': event_count,
+                    'detectors': detectors, 'sink': sink_state,
+                    'debug_remainder': (debug_decimator.remainder, debug_decimator.remainder_start)
+                    if debug else None})
+            last_checkpoint = time.time()
+
+        if time.time() - last_progress >= progress_interval:
+            progress._update(place_in_data, event_count)
+            _send_progress(progress, pipe, progress_callback, verbose)
+            last_progress = time.time()
+
+    # make sure everything is saved
+    write_start = time.time()
+    if len(batch) > 0:
+        sink.write_events(batch)
+        n_writes += 1
+        batch = []
+    if debug:
+        debug_decimator.flush()
+    progress.write_time += time.time() - write_start
+
+    # Update the progress one last time
+    progress._update(place_in_data, event_count)
+    progress.done = True
+    _send_progress(progress, pipe, progress_callback, verbose)
+
+    if profile:
+        sink.write_profile(Profile(detectors, progress, n_reads, n_writes))
+
+    result = sink.close()
+    # The search is done, so there is nothing to resume.
+    if checkpoint_file_name is not None and os.path.exists(checkpoint_file_name):
+        os.remove(checkpoint_file_name)
+    return result
+
+cdef class _SegmentReader(AbstractReader):
+    """
+    Reader for one segment of a file's data that has already been read into memory. Used to run
+    :py:func:`_lazy_load_find_events` on part of a file in a worker process.
+    """
+    cdef np.ndarray data
+    cdef long next_to_send
 
-    if n < 100:
-        print 'Not enough data points in file.'
-        if pipe is not None:
-            pipe.close()
-        return 'Not enough data points in file.'
+    def __init__(self, data, double sample_rate, filename, long block_size=5000):
+        """
+        :param data: 2D numpy array of the segment's data, one row per channel.
+        """
+        self.block_size = block_size
+        self.filename = filename
+        self.data = data
+        self.dtype = data.dtype
+        self.sample_rate = sample_rate
+        self.points_per_channel_total = data.shape[1]
+        self.next_to_send = 0
 
-    if save_file_name is None:
-        # Get the name of the database file we want to save
-        # if we have input.hkd, then save database to
-        # input_Events_YYmmdd_HHMMSS.h5
-        save_file_name = list(reader.get_filename_c())
-        # Remove the .mat off the end
-        for _ in xrange(0, 4):
-            save_file_name.pop()
-        # Get a string with the current year/month/day/hour/minute to label the file
-        day_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        save_file_name.append('_Events_' + day_time + '.h5')
-        save_file_name = "".join(save_file_name)
+    cpdef _prepare_file(self, filename):
+        pass
 
-    cdef unsigned long max_points = max_event_steps + 2 * raw_points_per_side
+    cdef object get_next_blocks_c(self, long n_blocks=1):
+        cdef long start = self.next_to_send
+        self.next_to_send = min(start + n_blocks * self.block_size, self.points_per_channel_total)
+        return [channel[start:self.next_to_send] for channel in self.data]
 
-    # Open the event database
-    if h5file is None:
-        h5file = ed.open_file(save_file_name, maxEventLength=max_points, mode='w', debug=debug, n_points=points_per_channel_total,
-                              n_channels=n_channels, threshold_positive=parameters.detect_positive_events,
-                                threshold_negative=parameters.detect_negative_events)
-    raw_data = h5file.root.events.raw_data
-    levels_matrix = h5file.root.events.levels
-    lengths_matrix = h5file.root.events.level_lengths
+    cdef object seek_c(self, long point):
+        self.next_to_send = point
 
-    cdef double data_point = data[0]
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        return [self.data[c, start:stop] for c in self._get_channel_list(channels, self.data.shape[0])]
 
-    baseline_type.baseline = data_point
+    cdef object get_all_data_c(self, bool decimate=False):
+        return list(self.data)
 
-    cdef ThresholdStrategy threshold_type = parameters.threshold_strategy
+    cdef void close_c(self):
+        pass
 
-    cdef double threshold_start = 0.0
-    cdef double threshold_end = 0.0
+def _find_events_in_segment(data, long data_start, long segment_start, long data_end, sample_rate, block_size,
+                            filename, parameters, save_file_name, debug):
+    """
+    Worker process target. Finds the events in one segment of data and saves them to save_file_name.
 
-    initialization_index = 100
+    :param data: 2D numpy array of the points [data_start, data_end) of each channel, or None to read them from the\
+        file filename, opened with :py:func:`get_reader_from_filename`.
+    :returns: (save_file_name, data_start), where save_file_name is None if no database was saved, and data_start is\
+        the index in the file of the first point searched, see :py:func:`_get_warm_up_start`.
+    """
+    if data is None:
+        file_reader = get_reader_from_filename(filename, dtype=parameters.dtype)
+        try:
+            data = np.vstack(file_reader.read_range(data_start, data_end))
+        finally:
+            file_reader.close()
+    cdef long warm_up_start = _get_warm_up_start(data, data_start, segment_start)
+    reader = _SegmentReader(data[:, warm_up_start - data_start:], sample_rate, filename, block_size)
+    del data
+    if debug and parameters.debug_decimation > 1:
+        # The segment's debug data is decimated when the segments are merged.
+        parameters = copy.copy(parameters)
+        parameters.debug_decimation = 1
+    # Segments are short, and searched again from the start if the search is stopped, so are not checkpointed.
+    result = _lazy_load_find_events(reader, parameters, None, None, save_file_name, debug, False, None, False, 0)
+    if result != save_file_name:
+        return None, warm_up_start
+    return result, warm_up_start
+
+def _find_quiet_start(np.ndarray data, long search_length, long run_length=100):
+    """
+    Finds the start of the first run of run_length points that all look like baseline, ie. are within 4 standard
+    deviations of the median of data. The noise is estimated from the differences between neighbouring points,
+    so steps in the data do not inflate it.
 
-    baseline_type.initialize_c(data[0:initialization_index])
+    :param search_length: Only look for runs starting in data[:search_length].
+    :returns: Index of the start of the run, or 0 if there is none.
+    """
+    if data.size < 2 * run_length or search_length < 1:
+        return 0
+    cdef double median = np.median(data)
+    cdef double std_dev = np.median(np.abs(np.diff(data))) / (0.6745 * np.sqrt(2.))
+    noisy = np.abs(data - median) > 4 * std_dev
+    n_noisy = np.concatenate(([0], np.cumsum(noisy)))
+    quiet_runs = n_noisy[run_length:search_length + run_length] == n_noisy[:search_length]
+    if quiet_runs.any():
+        return np.argmax(quiet_runs)
+    return 0
+
+def _get_segments(long points_per_channel_total, long segment_length, long overlap, long tail):
+    """
+    Splits the points of a file into segments.
 
-    data_cache = [np.zeros(n, dtype=DTYPE) + data_point, data]
+    Yields (data_start, segment_start, segment_end, data_end) for each segment, where the segment owns the points
+    [segment_start, segment_end), and is searched in the points [data_start, data_end) of the file. data_start is
+    overlap points before segment_start, and data_end is tail points after segment_end. The last segment takes the
+    points left over at the end of the file.
+    """
+    cdef long n_segments = max(1, points_per_channel_total / segment_length)
+    cdef long segment_start, segment_end
+    cdef long k
+    for k in xrange(n_segments):
+        segment_start = k * segment_length
+        segment_end = points_per_channel_total if k == n_segments - 1 else segment_start + segment_length
+        yield (max(0, segment_start - overlap), segment_start, segment_end,
+               min(points_per_channel_total, segment_end + tail))
+
+def _get_warm_up_start(np.ndarray data, long data_start, long segment_start):
+    """
+    Start warming up on a quiet stretch of baseline, not part way through an event. Leave at least half of the
+    overlap for the warm up. The channels share the start, so take the latest of their quiet starts.
 
-    is_event = False
-    was_event_positive = False  # Was the event an up spike?
+    :param data: 2D numpy array of the points of each channel from data_start.
+    :returns: Index in the file of the point to start searching the segment from.
+    """
+    if data_start == 0:
+        return 0
+    return data_start + max([_find_quiet_start(channel[:segment_start - data_start],
+                                               (segment_start - data_start) / 2) for channel in data])
 
-    # Figure out how many rows will it take to have a cache of 10MB (1048576 bytes = 1MB)
-    cdef num_rows_in_event_cache = int(10 * 1048576 / (max_points * (np.dtype(DTYPE).itemsize)))
-    # Make an array to hold events in memory before writing to disk.
-    cdef np.ndarray[DTYPE_t, ndim = 2] event_cache = np.zeros((num_rows_in_event_cache, max_points), dtype=DTYPE)
-    cdef np.ndarray[DTYPE_t, ndim = 2] levels_cache = np.zeros((num_rows_in_event_cache, max_points), dtype=DTYPE)
-    cdef np.ndarray[DTYPE_UINT32_t, ndim = 2] level_length_cache = np.zeros((num_rows_in_event_cache, max_points),
-                                                                            dtype=DTYPE_UINT32)
+class _SegmentMerger(object):
+    """
+    Merges the EventDatabases found for each segment of a file, and writes the events to a sink.
 
-    cdef event_cache_index = 0
+    Each segment keeps the events that start inside it. Events that start before the end of the previous event
+    in the same channel are found twice at a segment boundary, and are dropped.
+    """
 
-    cdef:
+    def __init__(self, sink, long max_points, bint debug, long debug_decimation=1):
+        self.sink = sink
+        self.debug = debug
+        self.debug_decimator = _DebugDecimator(sink, debug_decimation)
+        self.event_count = 0
+        # End of the last event kept in each channel
+        self.prev_event_end = {}
+        self.batch_size = _get_batch_size(max_points)
 
-        unsigned long i = 0
-        unsigned long event_i = 0
-        unsigned long min_index = 0
-        unsigned long prev_i = 0
-        double time1 = time.time()
-        double time2 = time1
-        double time_temp = 0
-        unsigned long event_start = 0
-        unsigned long event_end = 0
-        unsigned long start_index = 0
-        unsigned long end_index = 0
-        unsigned long place_in_data = 0
-
-        double mean_estimate = 0.0
-        double sn = 0
-        double sp = 0
-        double Sn = 0
-        double Sp = 0
-        double Gn = 0
-        double Gp = 0
-        double new_mean = 0
-        double var_estimate = 0
-        unsigned int n_levels = 0
-        double delta = 0
-        unsigned long min_index_p = 0
-        unsigned long min_index_n = 0
-        double float_inf = np.finfo('d').max
-        double min_Sp = float_inf
-        double min_Sn = float_inf
-        long ko = i
-        double event_area = data_point - baseline_type.get_baseline_c()  # integrate the area
-        double current_blockage = 0
-        int cache_index = 0
-        unsigned int size = 0
-        double h = 0
-        double percent_done = 0
-        double rate = 0
-        double total_rate = 0
-        int time_left = 0
-        int qq = 0
-        int cache_size = 0
-        long cache_refreshes = 0  # number of times we get new data at the
-        # end of the loop
-        double temp = 0
-        long temp_long = 0
-        double baseline = baseline_type.get_baseline_c()
-        double variance = baseline_type.get_variance_c()
-
-        #         np.ndarray[DTYPE_t] level_values
-        np.ndarray[DTYPE_t] curr_data = data_cache[1]  # data in dataCache[1]
-
-        np.ndarray[DTYPE_t] m_levels = np.zeros(max_points, dtype=DTYPE)
-        np.ndarray[DTYPE_UINT32_t] m_levels_length = np.zeros(max_points, dtype=DTYPE_UINT32)
-
-        double level_sum = 0
-        long prev_level_start = 0
-
-        int last_event_sent = 0
-
-        np.ndarray[DTYPE_t] debug_data_matrix = np.zeros(points_per_channel_total if debug else 0, dtype=DTYPE)
-        np.ndarray[DTYPE_t] debug_baseline_matrix = np.zeros(points_per_channel_total if debug else 0, dtype=DTYPE)
-        np.ndarray[DTYPE_t] debug_threshold_pos_matrix = np.zeros(points_per_channel_total if debug else 0, dtype=DTYPE)
-        np.ndarray[DTYPE_t] debug_threshold_neg_matrix = np.zeros(points_per_channel_total if debug else 0, dtype=DTYPE)
-
-    threshold_start = threshold_type.compute_starting_threshold_c(baseline, variance)
-    # search for events.  Keep track of baseline_filter_parameter filtered local (adapting!) mean and variance,
-    # and use them to decide baseline_filter_parameter threshold_start for events.  See
-    # http://pubs.rsc.org/en/content/articlehtml/2012/nr/c2nr30951c for more details.
-    while i < n:
-        data_point = curr_data[i]
-
-        # Detecting a negative event
-        if direction_negative and data_point < baseline - threshold_start:
-            is_event = True
-            was_event_positive = False
-        # Detecting a positive event
-        elif direction_positive and data_point > baseline + threshold_start:
-            is_event = True
-            was_event_positive = True
-        if debug:
-            debug_data_matrix[place_in_data + i] = data_point
-            debug_baseline_matrix[i + place_in_data] = baseline
-            if direction_positive:
-                debug_threshold_pos_matrix[i + place_in_data] = baseline + threshold_start
-            if direction_negative:
-                debug_threshold_neg_matrix[i + place_in_data] = baseline - threshold_start
-        threshold_start = threshold_type.compute_starting_threshold_c(baseline, variance)
-        if is_event:
-            is_event = False
-            # Set ending threshold_end
-            threshold_end = threshold_type.compute_ending_threshold_c(baseline, variance)
-            event_start = i
-            event_end = i + 1
-            done = False
-            event_i = i
-            # CUSUM stuff
-            mean_estimate = data_point
-            n_levels = 0
-            sn = sp = Sn = Sp = Gn = Gp = 0
-            var_estimate = variance
-            #             n_levels = 1  # We're already starting with one level
-            delta = fabs(mean_estimate - baseline) / 2.
-            min_index_p = min_index_n = i
-            min_Sp = min_Sn = float_inf
-            ko = i
-            event_area = data_point  # integrate the area
-            cache_index = 1  # which index in the cache is event_i
-            # trying to grab data from?
-
-            level_sum = data_point
-            level_sum_minp = data_point
-            level_sum_minn = data_point
-            prev_level_start = event_i
-            cache_size = n
-
-            # loop until event ends
-            while not done and event_i - event_start < max_event_steps:
-                event_i += 1
-                if event_i >= cache_size:  # We may need new data
-                    # we need new data if we've run out
-                    cache_index += 1
-                    datas = reader.get_next_blocks_c(get_blocks)
-                    datas = datas[0]
-                    n = datas.size
-                    cache_size += n
-                    if n < 1:
-                        i = n
-                        print "Done"
-                        break
-                    data_cache.append(datas)
-                if cache_index == 1:
-                    data_point = curr_data[event_i]
-                else:
-                    data_point = data_cache[cache_index][event_i % n]
-                if debug:
-                    debug_data_matrix[event_i + place_in_data] = data_point
-                    debug_baseline_matrix[event_i + place_in_data] = baseline
-                    if direction_positive:
-                        debug_threshold_pos_matrix[event_i + place_in_data] = baseline + threshold_end
-                    if direction_negative:
-                        debug_threshold_neg_matrix[event_i + place_in_data] = baseline - threshold_end
-                if (not was_event_positive and data_point >= baseline - threshold_end) or (
-                            was_event_positive and data_point <= baseline + threshold_end):
-                    event_end = event_i
-                    done = True
-                    break
-                # new mean = old_mean + (new_sample - old_mean)/(N)
-                new_mean = mean_estimate + (data_point - mean_estimate) / (1 + event_i - ko)
-                # New variance recursion relation 
-                var_estimate = ((event_i - ko) * var_estimate + (data_point - mean_estimate) * (
-                    data_point - new_mean)) / (1 + event_i - ko)
-                mean_estimate = new_mean
-                if var_estimate > 0:
-                    sp = (delta / var_estimate) * (data_point - mean_estimate - delta / 2.)
-                    sn = -(delta / var_estimate) * (data_point - mean_estimate + delta / 2.)
-                elif delta == 0:
-                    sp = sn = 0
-                else:
-                    sp = sn = float_inf
-                Sp = Sp + sp
-                Sn = Sn + sn
-                Gp = fmax(0.0, Gp + sp)
-                Gn = fmax(0.0, Gn + sn)
-                level_sum += data_point
-                if Sp <= 0:
-                    Sp = 0
-                    min_Sp = Sp
-                    min_index_p = event_i
-                    level_sum_minp = level_sum
-                if Sn <= 0:
-                    Sn = 0
-                    min_Sn = Sn
-                    min_index_n = event_i
-                    level_sum_minn = level_sum
-                h = delta / sqrt(var_estimate)
-                # Did we detect a change?
-                if Gp > h or Gn > h:
-                    if Gp > h:
-                        min_index = min_index_p
-                        level_sum = level_sum_minp
-                    else:
-                        min_index = min_index_n
-                        level_sum = level_sum_minn
-                    m_levels_length[n_levels] = min_index + 1 - ko
-                    m_levels[n_levels] = level_sum / m_levels_length[n_levels]  ##
-                    n_levels += 1
-                    # reset stuff
-                    sn = sp = Sn = Sp = Gn = Gp = 0
-                    min_Sp = min_Sn = float_inf
-                    # Go back to 1 after the level change found
-                    ko = event_i = min_index + 1
-                    min_index_p = min_index_n = event_i
-                    prev_level_start = event_i
-                    if cache_index == 1:
-                        mean_estimate = curr_data[event_i]
-                    else:
-                        mean_estimate = data_cache[cache_index][event_i % n]
-                    level_sum = level_sum_minp = level_sum_minn = mean_estimate
-
-            i = event_end
-            if event_end > prev_level_start:
-                m_levels_length[n_levels] = event_end - prev_level_start
-                m_levels[n_levels] = level_sum / (event_end - prev_level_start)
-                n_levels += 1
-            # is the event long enough?
-            if done and event_end - event_start > min_event_steps:
-                # CUSUM stuff
-                # otherwise just say 1 level and use the maximum change as the value
-                if event_end - event_start < 10:
-                    n_levels = 1
-                    if was_event_positive:
-                        current_blockage = np.max(_get_data_range(data_cache, event_start, event_end))
-                        m_levels[0] = current_blockage
-                        current_blockage -= baseline
-                    else:
-                        current_blockage = np.min(_get_data_range(data_cache, event_start, event_end))
-                        m_levels[0] = current_blockage
-                        current_blockage -= baseline
-                    m_levels_length[0] = event_end - event_start
-                else:
-                    current_blockage = 0
-                    # calculate the weighted average of the levels
-                    for qq in xrange(n_levels):
-                        current_blockage += m_levels[qq] * m_levels_length[qq]
-                    current_blockage = current_blockage / (event_end - event_start) - baseline
-
-                # end CUSUM, save events to file/cache
-                h5file.append_event(event_count, event_start + place_in_data, event_end - event_start, \
-                                    n_levels, raw_points_per_side, baseline, current_blockage, \
-                                    event_area - baseline)
-
-                event_cache[event_cache_index][:event_end - event_start + 2 * raw_points_per_side] = _get_data_range(
-                    data_cache, event_start - raw_points_per_side, event_end + raw_points_per_side)
-                levels_cache[event_cache_index][:n_levels] = m_levels[:n_levels]
-                level_length_cache[event_cache_index][:n_levels] = m_levels_length[:n_levels]
-
-                event_count += 1
-                event_cache_index += 1
-
-                if event_cache_index >= num_rows_in_event_cache:
-                    raw_data.append(event_cache)
-                    lengths_matrix.append(level_length_cache)
-                    levels_matrix.append(levels_cache)
-                    h5file.root.events.eventTable.flush()
-                    event_cache_index = 0
-
-                if event_count % 1000 == 0:
-                    h5file.root.events.eventTable.flush()
-                    h5file.flush()
-
-        baseline = baseline_type.compute_baseline_c(data_point)
-        variance = baseline_type.compute_variance_c(data_point)
-        i += 1
-        # remove any arrays in the cache that we don't need anymore
-        while 0 < n <= i:
-            del data_cache[0]
-            i -= n
-            place_in_data += n
-            # If we're just left with dataCache[0], which is reserved
-            # for old data, then we need new data.
-            if len(data_cache) < 2:
-                cache_refreshes += 1
-                data_next = reader.get_next_blocks_c(get_blocks)
-                data_cache.append(data_next[0])
-            if len(data_cache) > 1:
-                curr_data = data_cache[1]
-                n = curr_data.size
-            if cache_refreshes % 100 == 0 and len(data_cache) == 2:
-                time_temp = time.time()
-                recent_time = time_temp - time2
-                if recent_time > 0:
-                    total_time = time_temp - time1
-                    percent_done = 100. * (place_in_data + i) / points_per_channel_total
-                    rate = (place_in_data + i - prev_i) / recent_time
-                    total_rate = (place_in_data + i) / total_time
-                    time_left = int((points_per_channel_total - (place_in_data + i)) / rate)
-                    status_text = "Event Count: %d Percent Done: %.2f Rate: %.2e pt/s Total Rate: %.2e pt/s Time Left: %s" % (
-                        event_count, percent_done, rate, total_rate, datetime.timedelta(seconds=time_left))
-                    if pipe is not None:
-                        #                     if event_count > last_event_sent:
-                        #                         pipe.send({'status_text': status_text, 'Events': save_file['Events'][last_event_sent:]})
-                        pipe.send({'status_text': status_text})
-                        #                         last_event_sent = event_count
-                    else:
-                        sys.stdout.write("\r" + status_text)
-                        sys.stdout.flush()
-                    time2 = time_temp
-                    prev_i = place_in_data + i
-
-    # clean up the caches, make sure everything is saved
-    if event_cache_index > 0:
-        h5file.root.events.eventTable.flush()
-        raw_data.append(event_cache[:event_cache_index])
-        lengths_matrix.append(level_length_cache[:event_cache_index])
-        levels_matrix.append(levels_cache[:event_cache_index])
-        event_cache_index = 0
-
-    # Update the status_text one last time
-    cdef double curr_time = time.time()
-    recent_time = curr_time - time2
-    total_time = curr_time - time1
-    percent_done = 100. * (place_in_data + i) / points_per_channel_total
-    rate = (place_in_data + i - prev_i + 1) / recent_time
-    total_rate = (place_in_data + i) / total_time
-    time_left = int((points_per_channel_total - (place_in_data + i)) / rate)
-    status_text = "Event Count: %d Percent Done: %.2f Rate: %.2e pt/s Total Rate: %.2e pt/s Time Left: %s" % (
-        event_count, percent_done, rate, total_rate, datetime.timedelta(seconds=time_left))
-    if pipe is not None:
-        #                     if event_count > last_event_sent:
-        #                         pipe.send({'status_text': status_text, 'Events': save_file['Events'][last_event_sent:]})
-        pipe.send({'status_text': status_text})
-    #                         last_event_sent = event_count
-    else:
-        sys.stdout.write("\r" + status_text)
-        sys.stdout.flush()
+    def add_segment(self, segment_file_name, long data_start, long segment_start, long segment_end):
+        """
+        Adds the events from a segment's EventDatabase.
 
-    if event_count > 0 or debug:
-        # Save the file
-        # add attributes
-        h5file.root.events.eventTable.flush()  # if you don't flush before adding attributes,
-        # PyTables might print a warning
-        h5file.root.events.eventTable.attrs.sample_rate = sample_rate
-        h5file.root.events.eventTable.attrs.eventCount = event_count
-        h5file.root.events.eventTable.attrs.dataFilename = reader.get_filename_c()
-
-        if debug:
-            h5file.root.debug.data[0,:] = debug_data_matrix[:]
-            h5file.root.debug.baseline[0,:] = debug_baseline_matrix[:]
-            h5file.root.debug.threshold_positive[0,:] = debug_threshold_pos_matrix[:]
-            h5file.root.debug.threshold_negative[0,:] = debug_threshold_neg_matrix[:]
+        :param segment_file_name: The segment's EventDatabase, or None if the segment had no events.
+        :param data_start: Index in the file of the first point given to the segment.
+        :param segment_start: Index in the file of the first point owned by the segment.
+        :param segment_end: Index in the file one past the last point owned by the segment.
+        """
+        if segment_file_name is None:
+            return
+
+        segment = ed.open_file(segment_file_name, mode='r')
+        events = segment.get_event_table()[:]
+
+        keep = []
+        cdef long q, k, event_start, array_row, event_length, n_levels, raw_length
+        for q in xrange(events.size):
+            event_start = events[q]['event_start'] + data_start
+            channel = events[q]['channel']
+            if segment_start <= event_start < segment_end and event_start >= self.prev_event_end.get(channel, 0):
+                keep.append(q)
+                self.prev_event_end[channel] = event_start + events[q]['event_length']
+
+        for q in xrange(0, len(keep), self.batch_size):
+            rows = events[keep[q:q + self.batch_size]]
+            array_rows = rows['array_row'].astype(np.int64)
+            first_row = array_rows[0]
+            last_row = array_rows[-1] + 1
+            # Read the contiguous rows, and pick the kept ones out in memory.
+            raw_data = segment.decode_raw_data(segment.root.events.raw_data[first_row:last_row])
+            levels = segment.root.events.levels[first_row:last_row]
+            level_lengths = segment.root.events.level_lengths[first_row:last_row]
+            batch = []
+            for k in xrange(rows.size):
+                array_row = array_rows[k] - first_row
+                event_length = rows[k]['event_length']
+                n_levels = rows[k]['n_levels']
+                raw_length = event_length + 2 * rows[k]['raw_points_per_side']
+                batch.append(Event(int(rows[k]['channel']), int(rows[k]['event_start']) + data_start, event_length,
+                                   n_levels, rows[k]['baseline'], rows[k]['current_blockage'], rows[k]['area'],
+                                   raw_data[array_row, :raw_length], levels[array_row, :n_levels],
+                                   level_lengths[array_row, :n_levels]))
+            self.sink.write_events(batch)
+            self.event_count += len(batch)
+
+        if self.debug:
+            self.debug_decimator.write([segment.get_node(segment.root.debug, name)[:, segment_start - data_start:
+                                                                                     segment_end - data_start]
+                                        for name in ['data', 'baseline', 'threshold_positive',
+                                                     'threshold_negative']],
+                                       segment_start)
+
+        segment.close()
+        os.remove(segment_file_name)
+
+def _parallel_find_events(AbstractReader reader, Parameters parameters, object pipe=None, h5file=None,
+                          save_file_name=None, debug=False, int n_workers=2,
+                          long segment_length=DEFAULT_SEGMENT_LENGTH, long segment_overlap=DEFAULT_SEGMENT_OVERLAP,
+                          sink=None, progress_callback=None, double progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """
+    Finds the events in one reader, split into segments that are searched in parallel in a pool of
+    n_workers processes.
 
-        h5file.flush()
-        h5file.close()
-        return save_file_name
-    else:
-        # if no events, just delete the file, if we're not debugging.
-        h5file.flush()
-        h5file.close()
-        os.remove(save_file_name)
+    Each segment is given segment_overlap extra points before it, to warm up the baseline, and enough extra
+    points after it to finish any event that starts inside it. The warm up starts on the first quiet stretch of
+    baseline in the overlap. The segments' events are then stitched back together and written to the sink.
 
-    return None
+    If the reader's file can be opened again with :py:func:`get_reader_from_filename`, each worker reads its own
+    segment with :py:func:`pypore.i_o.abstract_reader.AbstractReader.read_range`, so the file is read in parallel
+    and the data is not copied between processes. Otherwise the segments are read here and sent to the workers.
+
+    The events found are the same as searching the whole file in one pass, as long as the baseline has settled
+    by the end of the warm up. If the overlap is mostly taken up by events, events near the start of a segment
+    can differ.
+    """
+    cdef double sample_rate = reader.get_sample_rate_c()
+    cdef double time_step = 1. / sample_rate
+    cdef long points_per_channel_total = reader.get_points_per_channel_total_c()
+    cdef unsigned int max_event_steps = np.ceil(parameters.max_event_length * 1e-6 / time_step)
+    cdef unsigned long max_points = max_event_steps + 2 * RAW_POINTS_PER_SIDE
+
+    first_blocks = reader.get_next_blocks_c(1)
+    cdef unsigned int n_channels = len(first_blocks)
+
+    if first_blocks[0].size < 100:
+        print 'Not enough data points in file.'
+        if pipe is not None:
+            pipe.close()
+        return 'Not enough data points in file.'
+
+    if sink is None:
+        if save_file_name is None and h5file is None:
+            save_file_name = _get_default_save_file_name(reader.get_filename_c())
+        sink = HDF5EventSink(save_file_name, h5file)
+    sink.open(reader, parameters, n_channels, max_points, RAW_POINTS_PER_SIDE, debug)
+
+    merger = _SegmentMerger(sink, max_points, debug, parameters.debug_decimation)
+    segments = _get_segments(points_per_channel_total, segment_length, max(segment_overlap, max_points), max_points)
+    del first_blocks
+    # Workers read their own segments from files that can be opened again, instead of being sent them.
+    filename = reader.get_filename_c()
+    cdef bint workers_read = isinstance(filename, basestring) and os.path.isfile(filename)
+
+    progress = Progress(reader.get_filename_c(), points_per_channel_total)
+    last_progress = [time.time()]
+    temp_directory = tempfile.mkdtemp()
+    pool = Pool(n_workers)
+    pending = deque()
+
+    def merge_next():
+        result, segment_start, segment_end = pending.popleft()
+        segment_file_name, data_start = result.get()
+        merge_start = time.time()
+        merger.add_segment(segment_file_name, data_start, segment_start, segment_end)
+        progress.write_time += time.time() - merge_start
+        if time.time() - last_progress[0] >= progress_interval:
+            progress._update(segment_end, merger.event_count)
+            _send_progress(progress, pipe, progress_callback, True)
+            last_progress[0] = time.time()
+
+    try:
+        for k, (data_start, segment_start, segment_end, data_end) in enumerate(segments):
+            segment_file_name = os.path.join(temp_directory, 'segment_%d.h5' % k)
+            data = None if workers_read else np.vstack(reader.read_range(data_start, data_end))
+            result = pool.apply_async(_find_events_in_segment,
+                                      (data, data_start, segment_start, data_end, sample_rate,
+                                       reader.get_block_size_c(), filename, parameters, segment_file_name, debug))
+            pending.append((result, segment_start, segment_end))
+            del data
+            # Don't read too far ahead of the workers.
+            while len(pending) > 2 * n_workers:
+                merge_next()
+        while len(pending) > 0:
+            merge_next()
+        merger.debug_decimator.flush()
+        pool.close()
+        progress._update(points_per_channel_total, merger.event_count)
+        progress.done = True
+        _send_progress(progress, pipe, progress_callback, True)
+    except:
+        pool.terminate()
+        sink.close()
+        raise
+    finally:
+        pool.join()
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+    return sink.close()
+
+# Queue that the pool workers searching whole files send their status updates to.
+_status_queue = None
+
+def _init_file_worker(status_queue):
+    """
+    Initializer for the pool of workers searching whole files.
+    """
+    global _status_queue
+    _status_queue = status_queue
+
+class _QueuePipe(object):
+    """
+    Stands in for the pipe in a worker process, and forwards the progress updates to the parent through a queue.
+    """
+
+    def __init__(self, queue, index):
+        self.queue = queue
+        self.index = index
+
+    def send(self, obj):
+        if 'progress' in obj:
+            self.queue.put((self.index, obj['progress']))
+
+    def close(self):
+        pass
+
+def _find_events_in_file(index, filename, parameters, save_file_name, debug, sink=None, resume=False,
+                         checkpoint_interval=None, progress_interval=DEFAULT_PROGRESS_INTERVAL,
+                         profile=False, profile_event_sample=0):
+    """
+    Worker process target. Finds the events in one file.
+
+    :returns: The result of the sink, by default the name of the EventDatabase created, or None.
+    """
+    reader = get_reader_from_filename(filename, dtype=parameters.dtype, prefetch=parameters.prefetch_reads)
+    try:
+        return _lazy_load_find_events(reader, parameters, _QueuePipe(_status_queue, index), None, save_file_name,
+                                      debug, True, sink, resume, checkpoint_interval, None, progress_interval,
+                                      profile, profile_event_sample)
+    finally:
+        reader.close()
+
+def _pool_find_events(filenames, parameters, save_file_names, pipe, debug, int n_workers, sinks=None,
+                      resume=False, checkpoint_interval=None, progress_callback=None,
+                      progress_interval=DEFAULT_PROGRESS_INTERVAL, profile=False, profile_event_sample=0):
+    """
+    Finds the events in each file in filenames in its own process, using a pool of n_workers processes.
+    Progress updates from the workers are passed to progress_callback, and forwarded to the pipe, or standard
+    output.
+
+    :param sinks: (Optional) List of sinks, one for each file. Each sink is copied to its worker process, and the\
+        result of the copy is returned.
+    :returns: List of the names of the EventDatabases, or the results of the sinks, in the same order as\
+        filenames. Files without any events give None.
+    """
+    status_queue = ProcessQueue()
+    pool = Pool(n_workers, initializer=_init_file_worker, initargs=(status_queue,))
+    try:
+        results = []
+        for i, filename in enumerate(filenames):
+            save_file_name = None
+            if save_file_names is not None:
+                save_file_name = save_file_names[i]
+            sink = None
+            if sinks is not None:
+                sink = sinks[i]
+            results.append(pool.apply_async(_find_events_in_file, (i, filename, parameters, save_file_name, debug,
+                                                                   sink, resume, checkpoint_interval,
+                                                                   progress_interval, profile,
+                                                                   profile_event_sample)))
+        pool.close()
+
+        n_done = 0
+        while True:
+            try:
+                index, progress = status_queue.get(timeout=0.1)
+            except Queue.Empty:
+                if n_done == len(results):
+                    break
+            else:
+                if progress_callback is not None:
+                    progress_callback(progress)
+                status_text = "Files Done: %d/%d %s: %s" % (n_done, len(results), os.path.basename(filenames[index]),
+                                                            progress)
+                if pipe is not None:
+                    pipe.send({'status_text': status_text, 'progress': progress})
+                else:
+                    sys.stdout.write("\r" + status_text)
+                    sys.stdout.flush()
+            n_done = sum(1 for result in results if result.ready())
+
+        database_filenames = [result.get() for result in results]
+        status_text = "Files Done: %d/%d" % (n_done, len(results))
+        if pipe is not None:
+            pipe.send({'status_text': status_text})
+        else:
+            sys.stdout.write("\r" + status_text + "\n")
+            sys.stdout.flush()
+        return database_filenames
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
 
 cdef class Parameters:
     """
@@ -531,6 +1837,26 @@ cdef class Parameters:
     * threshold_strategy -- Strategy for the thresholds deciding the start and end of \
       an event. See :py:class:`ThresholdStrategy` for a definition of the methods and \
       :py:class:`NoiseBasedThresholdStrategy` for an example implementation.
+    * prescan -- Whether to pre-scan each block with NumPy for event candidates, and skip quiet stretches \
+      of baseline in bulk. The events found are the same as without the pre-scan.
+    * prescan_margin -- Fraction of the starting threshold away from the baseline at which the pre-scan \
+      hands a point back to the point-by-point event loop.
+    * debug_decimation -- With find_events(debug=True), only the minimum and maximum of every debug_decimation \
+      points of the debug data are saved, so the debug data of long files fits on disk.
+    * read_size -- Number of points of each channel to read from the file at a time, rounded up to whole blocks \
+      of the reader. :py:data:`READ_SIZE_AUTO` picks it from the sample rate and the available memory. The \
+      events found do not depend on the read size.
+    * cusum_delta -- Fraction of the depth of an event at its first point taken as the size of the level changes \
+      the CUSUM looks for. Lower finds smaller level changes.
+    * cusum_threshold -- Factor scaling the CUSUM threshold for a level change. Lower is more sensitive. \
+      :py:func:`refit_levels` re-fits the levels of already found events with other values of these two.
+    * dtype -- Floating point type the data is read and searched in, and the raw data and levels are saved in, \
+      np.float64 or np.float32. Single precision halves the memory and bandwidth taken by the data, and the size \
+      of the EventDatabase. The baseline, thresholds and CUSUM sums are always kept in double precision.
+    * prefetch_reads -- Number of reads of each file opened by :py:func:`find_events` to keep ahead of the search, \
+      read and decoded in a background thread by a :py:class:`pypore.i_o.prefetch_reader.PrefetchReader`, so that \
+      reading overlaps with searching. 0 reads in the search's thread. Already opened readers can be wrapped in a \
+      PrefetchReader before being passed in.
 
     Usage:
 
@@ -547,11 +1873,21 @@ cdef class Parameters:
     cdef public ThresholdStrategy threshold_strategy
     cdef public bool detect_positive_events
     cdef public bool detect_negative_events
+    cdef public bool prescan
+    cdef public double prescan_margin
+    cdef public long debug_decimation
+    cdef public long read_size
+    cdef public double cusum_delta
+    cdef public double cusum_threshold
+    cdef public object dtype
+    cdef public long prefetch_reads
 
     def __init__(self, min_event_length=10., max_event_length=1.e4,
                  detect_positive_events=True, detect_negative_events=True,
                  baseline_strategy=AdaptiveBaselineStrategy(),
-                 threshold_strategy=NoiseBasedThresholdStrategy()):
+                 threshold_strategy=NoiseBasedThresholdStrategy(),
+                 prescan=False, prescan_margin=0.8, debug_decimation=1, read_size=READ_SIZE_AUTO, cusum_delta=0.5,
+                 cusum_threshold=1., dtype=DTYPE, prefetch_reads=0):
         """
         Initialize the Parameters object.
 
@@ -566,6 +1902,20 @@ cdef class Parameters:
         :param threshold_strategy: Type of the threshold for beginning and end to an event.\
             Default is :py:class:`NoiseBasedThresholdStrategy`.\
             Note that this must be a subclass of :py:class:`ThresholdStrategy`.
+        :param bool prescan: Pre-scan blocks of data for event candidates and skip the quiet baseline in bulk.\
+            Default is False.
+        :param double prescan_margin: Fraction of the starting threshold at which the pre-scan marks a point as\
+            an event candidate. Lower is more conservative. Default is 0.8.
+        :param int debug_decimation: Number of points of debug data to save as a (minimum, maximum) pair. The\
+            default, 1, saves every point.
+        :param int read_size: Number of points per channel to read at a time. Default is\
+            :py:data:`READ_SIZE_AUTO`, which tunes it to the sample rate and the available memory.
+        :param double cusum_delta: Fraction of the depth of an event at its first point taken as the size of the\
+            level changes to look for. Default is 0.5.
+        :param double cusum_threshold: Factor scaling the CUSUM threshold for a level change. Default is 1.0.
+        :param dtype: np.float64 (default) or np.float32, the floating point type to search the data in.
+        :param int prefetch_reads: Number of reads to keep ahead of the search, read in a background thread.\
+            Default is 0, which reads in the search's thread.
         """
         self.min_event_length = min_event_length
         self.max_event_length = max_event_length
@@ -573,8 +1923,137 @@ cdef class Parameters:
         self.detect_negative_events = detect_negative_events
         self.baseline_strategy = baseline_strategy
         self.threshold_strategy = threshold_strategy
+        self.prescan = prescan
+        self.prescan_margin = prescan_margin
+        self.debug_decimation = debug_decimation
+        self.read_size = read_size
+        self.cusum_delta = cusum_delta
+        self.cusum_threshold = cusum_threshold
+        if np.dtype(dtype) not in SAMPLE_DTYPES:
+            raise ValueError('dtype must be np.float64 or np.float32, not {0}.'.format(dtype))
+        self.dtype = np.dtype(dtype)
+        self.prefetch_reads = prefetch_reads
+
+def iter_events(data, parameters=Parameters()):
+    """
+    Generator of the events in data, yielded as they are found. Nothing is saved to disk, and only the data still
+    needed by the search is kept in memory, so arbitrarily long files can be searched.
+
+    :param data: The data to search. Can be one of the following:
+
+        #. An already opened reader. A subclass of :py:class:`pypore.i_o.abstract_reader.AbstractReader`.
+        #. A string filename to be opened. The appropriate reader will be chosen based on the file extension.
+
+    :param Parameters parameters: :py:class:`Parameters` for event finding.
+    :returns: Generator of :py:class:`Event`, in the order they are found. Events in different channels can be\
+        interleaved.
 
-def find_events(data, parameters=Parameters(), h5file=None, save_file_names=None, pipe=None, debug=False):
+    >>> for event in iter_events('testDataFiles/chimera_1event.log'):
+    >>>     print event.event_start, event.current_blockage
+    """
+    reader = data
+    should_close = False
+    if not isinstance(reader, AbstractReader):
+        # If not already a reader, assume it is a string filename and create a reader.
+        reader = get_reader_from_filename(reader, dtype=parameters.dtype, prefetch=parameters.prefetch_reads)
+        should_close = True
+    try:
+        blocks_per_read = _get_blocks_per_read(reader, parameters)
+        first_blocks = reader.get_next_blocks(blocks_per_read)
+        if first_blocks[0].size < 100:
+            return
+        detectors = _create_detectors(reader, first_blocks, parameters)
+        points_read = first_blocks[0].size
+        del first_blocks
+        for _, events in _iter_block_events(reader, detectors, points_read, blocks_per_read):
+            for event in events:
+                yield event
+    finally:
+        if should_close:
+            # only close readers we opened here
+            reader.close()
+
+class OnlineEventDetector(object):
+    """
+    Push-based event detector for data that arrives as it is acquired. Samples are passed in with :py:func:`feed`
+    as they come, and each call returns the events finished so far. The baseline, thresholds and CUSUM state are
+    kept from one call to the next, so an event can span any number of calls. The search is the same as
+    :py:func:`find_events`, and finds the same events in the same data.
+
+    An event is returned by the first call to :py:func:`feed` that passes the raw_points_per_side points after
+    its end, so the latency is that many samples plus the time between calls. The first 100 samples of each channel
+    are only used to start the baseline, and no events are returned until they have been fed.
+
+    >>> detector = OnlineEventDetector(sample_rate=4.166e6, n_channels=1)
+    >>> while acquiring:
+    >>>     for event in detector.feed(get_samples()):
+    >>>         print event.event_start, event.current_blockage
+    >>> remaining_events = detector.close()
+    """
+
+    def __init__(self, double sample_rate, int n_channels=1, parameters=Parameters()):
+        """
+        :param double sample_rate: Sample rate of the data.
+        :param int n_channels: Number of channels of the data.
+        :param Parameters parameters: :py:class:`Parameters` for event finding. read_size is not used, the data is\
+            searched as it is fed.
+        """
+        self.sample_rate = sample_rate
+        self.n_channels = n_channels
+        self.parameters = parameters
+        self.points_fed = 0
+        self.detectors = None
+        # Samples fed before there were enough to start the baseline.
+        self._pending = []
+
+    def feed(self, samples):
+        """
+        Searches the next samples of each channel.
+
+        :param samples: Numpy array of the next samples. 1D if there is one channel, otherwise 2D with a row per\
+            channel.
+        :returns: List of the :py:class:`Event` finished, in the order they were found. Events in different\
+            channels can be interleaved.
+        """
+        samples = np.asarray(samples, dtype=self.parameters.dtype).reshape(self.n_channels, -1)
+        self.points_fed += samples.shape[1]
+        if self.detectors is None:
+            self._pending.append(samples)
+            if self.points_fed < 100:
+                return []
+            samples = np.hstack(self._pending)
+            self._pending = []
+            self.detectors = [_ChannelDetector(c, samples[c], self.parameters, self.sample_rate)
+                              for c in xrange(self.n_channels)]
+        elif samples.shape[1] > 0:
+            for c in xrange(self.n_channels):
+                self.detectors[c].add_block(samples[c])
+        return self._pop_events()
+
+    def close(self):
+        """
+        Call once there is no more data. Any event still going on is dropped.
+
+        :returns: List of the events still waiting for the points after them, with their raw data cut short.
+        """
+        if self.detectors is None:
+            return []
+        for detector in self.detectors:
+            detector.finish()
+        return self._pop_events()
+
+    def _pop_events(self):
+        events = []
+        for detector in self.detectors:
+            events.extend(detector.events)
+            detector.events = []
+        return events
+
+def find_events(data, parameters=Parameters(), h5file=None, save_file_names=None, pipe=None, debug=False,
+                segment_workers=1, segment_length=DEFAULT_SEGMENT_LENGTH, segment_overlap=DEFAULT_SEGMENT_OVERLAP,
+                n_workers=1, sinks=None, resume=False, checkpoint_interval=None,
+                progress_callback=None, progress_interval=DEFAULT_PROGRESS_INTERVAL, profile=False,
+                profile_event_sample=0):
     """
 
     :param data: List of data to search. Each item in the list can be one of the following:
@@ -583,7 +2062,8 @@ def find_events(data, parameters=Parameters(), h5file=None, save_file_names=None
            For example, a :py:class:`pypore.i_o.chimera_reader.ChimeraReader`.
         #. A string filename to be opened. The appropriate reader will be chosen based on the file extension.
 
-    :param pipe: (Optional) :py:class:`multiprocessing.Pipe` for status updates during the run.\
+    :param pipe: (Optional) :py:class:`multiprocessing.Pipe` for status updates during the run. Each update is a\
+        dict with a one line 'status_text', and the :py:class:`Progress` of the file as 'progress'.\
         If omitted, status updates will just be printed to standard output.
     :param h5file: (Optional) An already opened :py:func:`pypore.filetypes.event_database.EventDatabase`. \
         If left out, a new EventDatabase will be created.
@@ -595,25 +2075,92 @@ def find_events(data, parameters=Parameters(), h5file=None, save_file_names=None
         - The baseline used at every point.
         - The thresholds at every point (positive, negative, or both depending on the Parameters)
 
-    :returns: List of String file names of the created EventDatabases.
+    :param int segment_workers: (Optional) Number of worker processes to search each file with. If more than 1, \
+        each file is split into segments that are searched in parallel, and the events are stitched back \
+        together into one EventDatabase. Default is 1, which searches each file in a single pass.
+    :param int segment_length: (Optional) Number of data points in each segment when segment_workers > 1.
+    :param int segment_overlap: (Optional) Number of data points before each segment used to warm up the \
+        baseline when segment_workers > 1.
+    :param int n_workers: (Optional) Number of worker processes to search the files with. If more than 1, each \
+        file is searched in its own process, and status updates from all of the files are sent to the pipe. \
+        Already opened readers are re-opened by file name in the workers. Cannot be used together with h5file or \
+        segment_workers > 1. Default is 1, which searches the files one after another.
+    :param sinks: (Optional) List of :py:class:`pypore.sinks.event_sink.EventSink`, one for each item in data, to\
+        save the events to instead of EventDatabases. For example, a\
+        :py:class:`pypore.sinks.memory_event_sink.MemoryEventSink` keeps the events in memory. When sinks are\
+        passed, h5file and save_file_names are ignored.
+    :param bool resume: (Optional) If True, files with a checkpoint left by a search that was stopped, eg. by a\
+        crash, are resumed from the checkpoint instead of searched from the start. The other arguments must be the\
+        same as in the stopped search. Without save_file_names or sinks, the latest checkpointed search of the file\
+        that saved to the default name is resumed. Files without a checkpoint are searched from the start, and the\
+        search is checkpointed, see checkpoint_interval. Default is False. Cannot be used together with segment_workers > 1.
+    :param float checkpoint_interval: (Optional) Number of seconds between checkpoints. Checkpoints are saved next\
+        to the output file, as '<save file name>.checkpoint', and deleted once the search is done. Only sinks that\
+        support resuming are checkpointed, which includes the default EventDatabase. 0 disables checkpoints.\
+        Default is None, which checkpoints every :py:data:`DEFAULT_CHECKPOINT_INTERVAL` seconds if resume is\
+        True, and not at all otherwise. Searches with segment_workers > 1 are not checkpointed.
+    :param progress_callback: (Optional) Function progress_callback(progress) to call with the\
+        :py:class:`Progress` of the file being searched, every progress_interval seconds and once the file is\
+        done. With n_workers > 1, it is called in this process with the progress of each of the workers' files.
+    :param float progress_interval: (Optional) Number of seconds between progress updates. Default is\
+        :py:data:`DEFAULT_PROGRESS_INTERVAL`.
+    :param bool profile: (Optional) If True, count the points and time spent reading, pre-scanning, searching\
+        point by point, finding levels and writing, and save them with the events, see :py:class:`Profile`. The\
+        default EventDatabase saves them as attributes of the event table. Adds a little overhead to each read\
+        and event. Cannot be used together with segment_workers > 1. Default is False.
+    :param int profile_event_sample: (Optional) With profile=True, if more than 0, also keep a histogram of the\
+        time taken to find the levels of every profile_event_sample-th event. Default is 0.
+    :returns: List of String file names of the created EventDatabases, in the same order as data. If sinks are\
+        passed, the results of the sinks' :py:func:`close` instead.
 
     >>> file_names = ['testDataFiles/chimera_1event.log']
     >>> output_files = find_events(file_names)
     >>> # .... ....
     >>> output_files2 = find_events(file_names, parameters=Parameters(min_event_length=15.))
+    >>> output_files3 = find_events(file_names, sinks=[NPZEventSink('chimera_1event_events.npz')])
     """
     event_databases = []
+    if resume and segment_workers > 1:
+        raise ValueError('Cannot resume searches with segment_workers.')
+    if profile and segment_workers > 1:
+        raise ValueError('Cannot profile searches with segment_workers.')
+    if n_workers > 1:
+        if h5file is not None:
+            raise ValueError('Cannot save the events of several workers to one h5file.')
+        if segment_workers > 1:
+            raise ValueError('Cannot use both n_workers and segment_workers.')
+        filenames = [reader.get_filename() if isinstance(reader, AbstractReader) else reader for reader in data]
+        for database_filename in _pool_find_events(filenames, parameters, save_file_names, pipe, debug, n_workers,
+                                                   sinks, resume, checkpoint_interval, progress_callback,
+                                                   progress_interval, profile, profile_event_sample):
+            print database_filename
+            if database_filename is not None:
+                event_databases.append(database_filename)
+        return event_databases
+
     save_file_name = None
+    sink = None
     reader = None
     for i, reader in enumerate(data):
         should_close = False
         if save_file_names is not None:
             save_file_name = save_file_names[i]
+        if sinks is not None:
+            sink = sinks[i]
         if not isinstance(reader, AbstractReader):
             # If not already a reader, assume it is a string filename and create a reader.
-            reader = get_reader_from_filename(reader)
+            reader = get_reader_from_filename(reader, dtype=parameters.dtype, prefetch=parameters.prefetch_reads)
             should_close = True
-        database_filename = _lazy_load_find_events(reader, parameters, pipe, h5file, save_file_name, debug=debug)
+        if segment_workers > 1:
+            database_filename = _parallel_find_events(reader, parameters, pipe, h5file, save_file_name, debug=debug,
+                                                      n_workers=segment_workers, segment_length=segment_length,
+                                                      segment_overlap=segment_overlap, sink=sink,
+                                                      progress_callback=progress_callback,
+                                                      progress_interval=progress_interval)
+        else:
+            database_filename = _lazy_load_find_events(reader, parameters, pipe, h5file, save_file_name, debug,
+                                                       True, sink, resume, checkpoint_interval, progress_callback,
+                                                       progress_interval, profile, profile_event_sample)
         if should_close:
             # only close readers we opened here
             reader.close()
@@ -621,3 +2168,477 @@ def find_events(data, parameters=Parameters(), h5file=None, save_file_names=None
         if database_filename is not None:
             event_databases.append(database_filename)
     return event_databases
+
+# Most reads the workers of sweep_find_events can fall behind the reading process by. Also the number of reads in
+# the shared memory ring passing the blocks to the workers.
+SWEEP_QUEUE_READS = 4
+
+# Seconds between checks of whether the other processes of sweep_find_events are still running, while waiting on
+# them.
+_SWEEP_TIMEOUT = 0.1
+
+def _ring_view(ring_buffer, dtype, unsigned int n_channels, long slot_points):
+    """
+    :returns: Array of the shared memory ring_buffer, indexed by [slot, channel, point].
+    """
+    return np.frombuffer(ring_buffer, dtype=dtype).reshape(-1, n_channels, slot_points)
+
+cdef class _QueueReader(AbstractReader):
+    """
+    Reader of the blocks written to a shared memory ring by another process. Used to pass each block read once by
+    :py:func:`sweep_find_events` to the worker processes. The reading process puts (slot, size) on the queue once
+    the blocks are in the slot of the ring, and None at the end of the data. The blocks are copied out of the slot,
+    and the slot is put on release_queue, so the reading process can reuse it once every worker has released it.
+    The blocks are taken as they were put, whatever number of blocks is asked for.
+    """
+    cdef object queue
+    cdef object release_queue
+    cdef object ring
+    cdef unsigned int n_channels
+    cdef int parent_pid
+    cdef bint done
+
+    def __init__(self, queue, release_queue, ring_buffer, double sample_rate, filename, long points_per_channel_total,
+                 long block_size, long slot_points, unsigned int n_channels, dtype=DTYPE):
+        self.queue = queue
+        self.release_queue = release_queue
+        self.ring = _ring_view(ring_buffer, dtype, n_channels, slot_points)
+        self.sample_rate = sample_rate
+        self.filename = filename
+        self.points_per_channel_total = points_per_channel_total
+        self.block_size = block_size
+        self.n_channels = n_channels
+        self.dtype = np.dtype(dtype)
+        self.parent_pid = os.getppid()
+        self.done = False
+
+    cpdef _prepare_file(self, filename):
+        pass
+
+    cdef object _get_message(self):
+        """
+        :returns: The next message of the reading process.
+        :raises: RuntimeError if the reading process exited without ending the data.
+        """
+        while True:
+            try:
+                return self.queue.get(timeout=_SWEEP_TIMEOUT)
+            except Queue.Empty:
+                if os.getppid() != self.parent_pid:
+                    raise RuntimeError('The process reading the blocks exited.')
+
+    cdef object get_next_blocks_c(self, long n_blocks=1):
+        message = None
+        if not self.done:
+            message = self._get_message()
+        if message is None:
+            self.done = True
+            return [np.zeros(0, dtype=self.dtype) for _ in xrange(self.n_channels)]
+        slot, size = message
+        blocks = [np.array(channel[:size]) for channel in self.ring[slot]]
+        self.release_queue.put(slot)
+        return blocks
+
+    cdef void close_c(self):
+        # Release the rest of the slots, so as not to leave the reading process waiting on the ring.
+        while not self.done:
+            try:
+                message = self._get_message()
+            except RuntimeError:
+                return
+            if message is None:
+                self.done = True
+            else:
+                self.release_queue.put(message[0])
+
+class _SweepSearch(object):
+    """
+    Search of the data with one of the Parameters of a sweep, see :py:func:`_sweep_events`.
+    """
+
+    def __init__(self, AbstractReader reader, first_blocks, Parameters parameters, sink):
+        cdef double time_step = 1. / reader.get_sample_rate_c()
+        cdef unsigned int max_event_steps = np.ceil(parameters.max_event_length * 1e-6 / time_step)
+        cdef unsigned long max_points = max_event_steps + 2 * RAW_POINTS_PER_SIDE
+        self.sink = sink
+        self.sink.open(reader, parameters, len(first_blocks), max_points, RAW_POINTS_PER_SIDE, False)
+        self.detectors = _create_detectors(reader, first_blocks, parameters)
+        self.batch_size = _get_batch_size(max_points)
+        self.batch = []
+
+    def add_blocks(self, blocks):
+        for detector, block in zip(self.detectors, blocks):
+            detector.add_block(block)
+        self.write_events()
+
+    def write_events(self, bint final=False):
+        """
+        Moves the events found to the batch, and writes the batch to the sink once it is full, or if final.
+        """
+        for detector in self.detectors:
+            self.batch.extend(detector.events)
+            detector.events = []
+        if len(self.batch) >= self.batch_size or (final and len(self.batch) > 0):
+            self.sink.write_events(self.batch)
+            self.batch = []
+
+    def close(self):
+        for detector in self.detectors:
+            detector.finish()
+        self.write_events(True)
+        return self.sink.close()
+
+def _sweep_events(AbstractReader reader, parameter_sets, sinks):
+    """
+    Finds the events in the reader with each of the parameter_sets, reading the data once.
+
+    :returns: List of the results of the sinks.
+    """
+    cdef long blocks_per_read = _get_blocks_per_read(reader, parameter_sets[0])
+    first_blocks = reader.get_next_blocks_c(blocks_per_read)
+    if first_blocks[0].size < 100:
+        print 'Not enough data points in file.'
+        return ['Not enough data points in file.'] * len(parameter_sets)
+
+    searches = [_SweepSearch(reader, first_blocks, parameters, sink) for parameters, sink in zip(parameter_sets, sinks)]
+    del first_blocks
+    for search in searches:
+        search.write_events()
+    while True:
+        blocks = reader.get_next_blocks_c(blocks_per_read)
+        if blocks[0].size < 1:
+            break
+        for search in searches:
+            search.add_blocks(blocks)
+        del blocks
+    return [search.close() for search in searches]
+
+def _sweep_worker(int index, block_queue, release_queue, result_queue, ring_buffer, double sample_rate, filename,
+                  long points_per_channel_total, long block_size, long slot_points, unsigned int n_channels, dtype,
+                  parameter_sets, sinks):
+    """
+    Worker process target. Finds the events in the blocks passed through block_queue and ring_buffer, see
+    :py:class:`_QueueReader`, with each of the parameter_sets, and puts (index, results) on result_queue, where
+    results is the list of the results of the sinks, or the exception raised.
+    """
+    reader = _QueueReader(block_queue, release_queue, ring_buffer, sample_rate, filename, points_per_channel_total,
+                          block_size, slot_points, n_channels, dtype)
+    try:
+        results = _sweep_events(reader, parameter_sets, sinks)
+    except Exception as e:
+        results = e
+    reader.close()
+    result_queue.put((index, results))
+
+def _get_from_workers(queue, workers, finished):
+    """
+    :returns: The next item put on queue by the workers.
+    :raises: RuntimeError if one of the workers, other than the indexes in finished, exited without putting it.
+    """
+    while True:
+        try:
+            return queue.get(timeout=_SWEEP_TIMEOUT)
+        except Queue.Empty:
+            pass
+        for k, worker in enumerate(workers):
+            if k not in finished and not worker.is_alive():
+                try:
+                    # The worker may have put the item just before exiting.
+                    return queue.get(False)
+                except Queue.Empty:
+                    raise RuntimeError('Sweep worker {0} exited with code {1}.'.format(k, worker.exitcode))
+
+def _parallel_sweep_events(AbstractReader reader, parameter_sets, sinks, int n_workers):
+    """
+    Finds the events in the reader with each of the parameter_sets, split between n_workers processes. The data is
+    read once, here, and each block is written once to a ring of SWEEP_QUEUE_READS slots of shared memory, which
+    every worker reads the block from.
+    """
+    cdef long blocks_per_read = _get_blocks_per_read(reader, parameter_sets[0])
+    cdef long slot_points = blocks_per_read * reader.get_block_size_c()
+    cdef int n_groups = min(n_workers, len(parameter_sets))
+    cdef long start, size
+    cdef int slot
+    groups = [range(k, len(parameter_sets), n_groups) for k in xrange(n_groups)]
+    blocks = reader.get_next_blocks_c(blocks_per_read)
+    dtype = np.dtype(reader.dtype)
+    ring_buffer = RawArray('b', SWEEP_QUEUE_READS * len(blocks) * slot_points * dtype.itemsize)
+    ring = _ring_view(ring_buffer, dtype, len(blocks), slot_points)
+    free_slots = range(SWEEP_QUEUE_READS)
+    # Number of workers done with each slot.
+    releases = [0] * SWEEP_QUEUE_READS
+
+    result_queue = ProcessQueue()
+    release_queue = ProcessQueue()
+    block_queues = [ProcessQueue() for _ in groups]
+    workers = [Process(target=_sweep_worker,
+                       args=(k, block_queues[k], release_queue, result_queue, ring_buffer, reader.get_sample_rate_c(),
+                             reader.get_filename_c(), reader.get_points_per_channel_total_c(),
+                             reader.get_block_size_c(), slot_points, len(blocks), dtype,
+                             [parameter_sets[i] for i in group], [sinks[i] for i in group]))
+               for k, group in enumerate(groups)]
+    for worker in workers:
+        worker.start()
+    try:
+        while blocks[0].size > 0:
+            for start in xrange(0, blocks[0].size, slot_points):
+                while len(free_slots) < 1:
+                    slot = _get_from_workers(release_queue, workers, ())
+                    releases[slot] += 1
+                    if releases[slot] == n_groups:
+                        releases[slot] = 0
+                        free_slots.append(slot)
+                slot = free_slots.pop()
+                size = min(slot_points, blocks[0].size - start)
+                for channel, block in zip(ring[slot], blocks):
+                    channel[:size] = block[start:start + size]
+                for block_queue in block_queues:
+                    block_queue.put((slot, size))
+            blocks = reader.get_next_blocks_c(blocks_per_read)
+        for block_queue in block_queues:
+            block_queue.put(None)
+
+        results = [None] * len(parameter_sets)
+        errors = []
+        finished = set()
+        for _ in groups:
+            k, group_results = _get_from_workers(result_queue, workers, finished)
+            finished.add(k)
+            if isinstance(group_results, Exception):
+                errors.append(group_results)
+                continue
+            for i, result in zip(groups[k], group_results):
+                results[i] = result
+        if len(errors) > 0:
+            raise errors[0]
+        return results
+    except:
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+def sweep_find_events(data, parameter_sets, save_file_names=None, sinks=None, int n_workers=1):
+    """
+    Finds the events in one file with each of a list of :py:class:`Parameters`, reading and decoding the file only
+    once. Each block read is searched with every one of the parameter_sets, so a sweep of many settings costs far
+    less than calling :py:func:`find_events` once per setting. The events found with each of the parameter_sets
+    are the same as from :py:func:`find_events`.
+
+    The data is read in blocks of the read_size, and ahead of the search by the prefetch_reads, of the first of the
+    parameter_sets. All of the parameter_sets must have the same dtype.
+
+    :param data: The data to search. Can be one of the following:
+
+        #. An already opened reader. A subclass of :py:class:`pypore.i_o.abstract_reader.AbstractReader`.
+        #. A string filename to be opened. The appropriate reader will be chosen based on the file extension.
+
+    :param parameter_sets: List of :py:class:`Parameters` to find the events with.
+    :param [string] save_file_names: (Optional) List of names of the EventDatabases, one for each of the\
+        parameter_sets. If omitted, appropriate save file names will be generated.
+    :param sinks: (Optional) List of :py:class:`pypore.sinks.event_sink.EventSink`, one for each of the\
+        parameter_sets, to save the events to instead of EventDatabases. For example, a\
+        :py:class:`pypore.sinks.memory_event_sink.MemoryEventSink` to only keep a summary of the events. When sinks\
+        are passed, save_file_names is ignored.
+    :param int n_workers: (Optional) Number of worker processes to split the parameter_sets between. The file is\
+        still read once, and each block is written once to shared memory that every worker reads it from. With\
+        n_workers > 1, each sink is copied to its worker process, and the result of the copy is returned. Default is 1, which searches with all of the\
+        parameter_sets in this process.
+    :returns: List of the String file names of the created EventDatabases, or the results of the sinks'\
+        :py:func:`close`, in the same order as parameter_sets.
+    :raises: ValueError if the parameter_sets do not all have the same dtype. RuntimeError if a worker process\
+        exits without returning its results.
+
+    >>> parameter_sets = [Parameters(threshold_strategy=NoiseBasedThresholdStrategy(start_std_dev=std_dev))
+    >>>                   for std_dev in np.linspace(3., 8., 20)]
+    >>> event_databases = sweep_find_events('testDataFiles/chimera_1event.log', parameter_sets, n_workers=4)
+    """
+    dtype = parameter_sets[0].dtype
+    for parameters in parameter_sets:
+        if parameters.dtype != dtype:
+            raise ValueError('All of the parameter_sets must have the same dtype, found {0} and {1}.'.format(
+                dtype, parameters.dtype))
+    reader = data
+    should_close = False
+    if not isinstance(reader, AbstractReader):
+        # If not already a reader, assume it is a string filename and create a reader.
+        reader = get_reader_from_filename(reader, dtype=dtype, prefetch=parameter_sets[0].prefetch_reads)
+        should_close = True
+    try:
+        if sinks is None:
+            if save_file_names is None:
+                default_name = _get_default_save_file_name(reader.get_filename_c())
+                save_file_names = [default_name[:-len('.h5')] + '_%d.h5' % k for k in xrange(len(parameter_sets))]
+            sinks = [HDF5EventSink(save_file_name) for save_file_name in save_file_names]
+        if n_workers > 1:
+            return _parallel_sweep_events(reader, parameter_sets, sinks, n_workers)
+        return _sweep_events(reader, parameter_sets, sinks)
+    finally:
+        if should_close:
+            # only close readers we opened here
+            reader.close()
+
+# Default number of events each worker re-fits at a time in refit_levels.
+DEFAULT_REFIT_CHUNK_SIZE = 1000
+
+def _refit_events(event_database_file_name, long start, long stop, double cusum_delta, double cusum_threshold):
+    """
+    Worker process target. Re-fits the levels of events [start, stop) of the event table.
+
+    The variance of the baseline at the start of each event is taken from the raw data points saved before it.
+
+    :returns: Tuple of arrays of the events' number of levels and current blockages, and their levels and level\
+        lengths one after the other.
+    """
+    h5file = ed.open_file(event_database_file_name, mode='r')
+    try:
+        rows = h5file.get_event_table()[start:stop]
+        ragged = h5file.is_ragged()
+        raw_lengths = (rows['event_length'] + 2 * rows['raw_points_per_side']).astype(np.int64)
+        # Read the events' raw data in one go, and pick each event out in memory.
+        if ragged:
+            raw_starts = rows['raw_data_offset'].astype(np.int64)
+            first = raw_starts[0]
+            raw_data = h5file.root.events.raw_data[first:(raw_starts + raw_lengths).max()]
+        else:
+            raw_starts = rows['array_row'].astype(np.int64)
+            first = raw_starts[0]
+            raw_data = h5file.root.events.raw_data[first:raw_starts.max() + 1]
+        # The levels are fit in double precision, whatever type the raw data was saved in.
+        raw_data = np.asarray(h5file.decode_raw_data(raw_data), dtype=DTYPE)
+    finally:
+        h5file.close()
+
+    cdef long n_events = rows.size
+    cdef long k, raw_points_per_side, event_length, n_total = 0
+    cdef unsigned int n_levels
+    cdef double current_blockage = 0
+    cdef double variance
+    cdef np.ndarray[np.float64_t] event_data
+    cdef np.ndarray[DTYPE_t] m_levels = np.zeros(max(1, raw_lengths.max()), dtype=DTYPE)
+    cdef np.ndarray[DTYPE_UINT32_t] m_levels_length = np.zeros(max(1, raw_lengths.max()), dtype=DTYPE_UINT32)
+    n_levels_out = np.zeros(n_events, dtype=np.uint32)
+    current_blockage_out = np.zeros(n_events, dtype=DTYPE)
+    levels_out = []
+    level_lengths_out = []
+    for k in xrange(n_events):
+        raw_points_per_side = rows[k]['raw_points_per_side']
+        event_length = rows[k]['event_length']
+        if ragged:
+            event_data = raw_data[raw_starts[k] - first:raw_starts[k] - first + raw_lengths[k]]
+        else:
+            event_data = raw_data[raw_starts[k] - first, :raw_lengths[k]]
+        variance = np.var(event_data[:raw_points_per_side]) if raw_points_per_side > 1 else 0.
+        n_levels = _fit_levels[np.float64_t](event_data, raw_points_per_side, raw_points_per_side + event_length,
+                               rows[k]['baseline'], variance, rows[k]['current_blockage'] > 0, cusum_delta, cusum_threshold, m_levels,
+                               m_levels_length, &current_blockage)
+        n_levels_out[k] = n_levels
+        current_blockage_out[k] = current_blockage
+        levels_out.append(m_levels[:n_levels].copy())
+        level_lengths_out.append(m_levels_length[:n_levels].copy())
+    return n_levels_out, current_blockage_out, levels_out, level_lengths_out
+
+def _get_default_refit_file_name(event_database_file_name):
+    """
+    Get the name of the database to save re-fit levels to. If we have events.h5, then save to
+    events_Refit_YYmmdd_HHMMSS.h5
+    """
+    day_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.splitext(event_database_file_name)[0] + '_Refit_' + day_time + '.h5'
+
+def refit_levels(event_database_file_name, parameters=Parameters(), save_file_name=None, int n_workers=1,
+                 long chunk_size=DEFAULT_REFIT_CHUNK_SIZE):
+    """
+    Re-fits the CUSUM levels of the events in an EventDatabase from their saved raw data, without searching the
+    data file again. Only parameters.cusum_delta and parameters.cusum_threshold are used, so the levels can be
+    tried with other settings in seconds.
+
+    The database is copied to save_file_name, with new levels, level_lengths, n_levels and current_blockage.
+    The original is not changed. The variance of the baseline at the start of each event is not saved in the
+    database, so it is estimated from the raw data points saved before the event, and the levels can differ
+    slightly from those found by :py:func:`find_events` with the same parameters.
+
+    :param event_database_file_name: File name of the :py:class:`pypore.filetypes.event_database.EventDatabase`.
+    :param Parameters parameters: :py:class:`Parameters` with the cusum_delta and cusum_threshold to use.
+    :param save_file_name: (Optional) File name of the new EventDatabase. If omitted, an appropriate file name\
+        will be generated.
+    :param int n_workers: (Optional) Number of worker processes to re-fit the events with. Default is 1.
+    :param long chunk_size: (Optional) Number of events to read and re-fit at a time.
+    :returns: The file name of the new EventDatabase.
+
+    >>> refit_file_name = refit_levels('chimera_1event_Events.h5', Parameters(cusum_threshold=2.))
+    """
+    if save_file_name is None:
+        save_file_name = _get_default_refit_file_name(event_database_file_name)
+    shutil.copyfile(event_database_file_name, save_file_name)
+
+    h5file = ed.open_file(save_file_name, mode='a')
+    pool = Pool(n_workers) if n_workers > 1 else None
+    try:
+        table = h5file.get_event_table()
+        n_events = table.nrows
+        ragged = h5file.is_ragged()
+        if ragged:
+            # The number of levels changes, so the flat arrays are written again from the start, in the same type.
+            levels_dtype = h5file.root.events.levels.dtype
+            h5file.root.events.levels._f_remove()
+            h5file.root.events.level_lengths._f_remove()
+            h5file.initialize_database(dtype=levels_dtype)
+        pending = deque()
+
+        def write_next():
+            start, stop, result = pending.popleft()
+            n_levels, current_blockage, levels, level_lengths = result.get() if pool is not None else result
+            table.modify_column(start, stop, column=n_levels, colname='n_levels')
+            table.modify_column(start, stop, column=current_blockage, colname='current_blockage')
+            if ragged:
+                level_offsets = np.cumsum(np.concatenate(([h5file.root.events.levels.nrows], n_levels[:-1]))
+                                          .astype(np.uint64))
+                table.modify_column(start, stop, column=level_offsets, colname='level_offset')
+                h5file.append_levels(np.concatenate(levels).astype(h5file.root.events.levels.dtype))
+                h5file.append_level_lengths(np.concatenate(level_lengths).astype(np.int32))
+                return
+            array_rows = table.read(start, stop, field='array_row').astype(np.int64)
+            first_row = array_rows[0]
+            last_row = array_rows.max() + 1
+            # Rewrite the contiguous rows, with the new levels of the events filled in.
+            levels_matrix = h5file.root.events.levels[first_row:last_row]
+            level_lengths_matrix = h5file.root.events.level_lengths[first_row:last_row]
+            for k in xrange(stop - start):
+                levels_matrix[array_rows[k] - first_row] = 0
+                levels_matrix[array_rows[k] - first_row, :n_levels[k]] = levels[k]
+                level_lengths_matrix[array_rows[k] - first_row] = 0
+                level_lengths_matrix[array_rows[k] - first_row, :n_levels[k]] = level_lengths[k]
+            h5file.root.events.levels[first_row:last_row] = levels_matrix
+            h5file.root.events.level_lengths[first_row:last_row] = level_lengths_matrix
+
+        for start in xrange(0, n_events, chunk_size):
+            stop = min(start + chunk_size, n_events)
+            args = (event_database_file_name, start, stop, parameters.cusum_delta, parameters.cusum_threshold)
+            if pool is not None:
+                pending.append((start, stop, pool.apply_async(_refit_events, args)))
+            else:
+                pending.append((start, stop, _refit_events(*args)))
+            # Don't re-fit too far ahead of writing.
+            while len(pending) > 2 * n_workers:
+                write_next()
+        while len(pending) > 0:
+            write_next()
+        if pool is not None:
+            pool.close()
+
+        table.attrs.cusum_delta = parameters.cusum_delta
+        table.attrs.cusum_threshold = parameters.cusum_threshold
+        table.flush()
+        h5file.flush()
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+        h5file.close()
+    return save_file_name
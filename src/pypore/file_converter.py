@@ -12,11 +12,15 @@ import pypore.filetypes.data_file as df
 from pypore.i_o.abstract_reader import AbstractReader
 
 
-def convert_file(filename, output_filename=None):
+def convert_file(filename, output_filename=None, prefetch=0):
     """
     Convert a file to the pypore .h5 file format. Returns the new file's name.
+
+    :param int prefetch: (Optional) Number of reads of the file to keep ahead of the writing, read in a background\
+        thread, see :py:class:`pypore.i_o.prefetch_reader.PrefetchReader`. Default is 0, which reads and writes in\
+        turn.
     """
-    reader = get_reader_from_filename(filename)
+    reader = get_reader_from_filename(filename, prefetch=prefetch)
 
     sample_rate = reader.get_sample_rate()
     n_points = reader.get_points_per_channel_total()
@@ -4,6 +4,7 @@ Created on Sep 13, 2013
 @author: `@parkin`_
 """
 
+import numpy as np
 import tables as tb
 import csv
 
@@ -22,6 +23,16 @@ class _Event(tb.IsDescription):
     baseline = tb.FloatCol(pos=5)
     current_blockage = tb.FloatCol(pos=6)
     area = tb.FloatCol(pos=7)
+    channel = tb.UIntCol(pos=8)  # channel of the data the event was found in
+
+
+class _RaggedEvent(_Event):
+    """
+    Description of the table /events/eventTable of a ragged EventDatabase, where raw_data, levels and level_lengths
+    are flat arrays of the events' values one after the other.
+    """
+    raw_data_offset = tb.UInt64Col(pos=9)  # index of the event's first raw data point in /events/raw_data
+    level_offset = tb.UInt64Col(pos=10)  # index of the event's first level in /events/levels and level_lengths
 
 
 class EventDatabase(tb.file.File):
@@ -41,7 +52,15 @@ class EventDatabase(tb.file.File):
     /events/eventTable
     and matrices
     /events/raw_data, /event/levels, and /event/levelLength
-    
+
+    By default, each event takes a row of max_event_length columns in the matrices, padded with zeros. If opened
+    with ragged=True, the matrices are instead flat arrays holding the events' values one after the other, and
+    the eventTable has extra columns raw_data_offset and level_offset, giving where each event's values start.
+    The getters, eg. :py:func:`get_raw_data_at`, work the same for both layouts.
+
+    If opened with raw_scaling=(scale, offset), raw_data holds the events' signed 16 bit ADC codes instead of
+    floating point values, and the getters decode them, see :py:func:`get_raw_scaling`.
+
     Must be instantiated by calling eventDatabase's
     
     >>> import pypore.eventDatabase as ed
@@ -55,10 +74,14 @@ class EventDatabase(tb.file.File):
     event_row = None
 
     def append_event(self, array_row, event_start, event_length, n_levels, raw_points_per_side, baseline, current_blockage, area,
-                    raw_data=None, levels=None, level_lengths=None):
+                    raw_data=None, levels=None, level_lengths=None, channel=0, raw_data_offset=None,
+                    level_offset=None):
         """
         Appends an event with the specified values to the eventsTable.  If raw_data, levels, or level_lengths
         are included, they are added to the corresponding matrices.
+
+        In a ragged database, raw_data_offset and level_offset default to the current ends of the flat arrays,
+        so the event's raw_data, levels and level_lengths should be passed in too, or appended straight after.
         
         :param Int array_row: The row in the raw_data, levels, and level_lengths array that corresponds
                              to this event.
@@ -72,6 +95,10 @@ class EventDatabase(tb.file.File):
         :param raw_data: Numpy array of the raw data.
         :param levels: Numpy array of the levels.
         :param level_lengths: Numpy array of the level lengths.
+        :param channel: The channel of the data the event was found in. Default is 0.
+        :param raw_data_offset: (Ragged databases only) Index of the event's first point in /events/raw_data.
+        :param level_offset: (Ragged databases only) Index of the event's first level in /events/levels and\
+            /events/level_lengths.
         """
         row = self.get_event_table_row()
         row['array_row'] = array_row
@@ -82,6 +109,14 @@ class EventDatabase(tb.file.File):
         row['baseline'] = baseline
         row['current_blockage'] = current_blockage
         row['area'] = area
+        row['channel'] = channel
+        if self.is_ragged():
+            if raw_data_offset is None:
+                raw_data_offset = self.root.events.raw_data.nrows
+            if level_offset is None:
+                level_offset = self.root.events.levels.nrows
+            row['raw_data_offset'] = raw_data_offset
+            row['level_offset'] = level_offset
         row.append()
 
         if raw_data is not None:
@@ -107,11 +142,46 @@ class EventDatabase(tb.file.File):
 
     def append_raw_data(self, raw_data):
         """
-        Appends a numpy matrix raw_data to root.events.raw_data
+        Appends a numpy matrix raw_data to root.events.raw_data. If the database stores ADC codes, floating point\
+        raw_data is encoded first, see :py:func:`encode_raw_data`.
         """
         if raw_data is not None:
+            if np.issubdtype(np.asarray(raw_data).dtype, np.floating):
+                raw_data = self.encode_raw_data(raw_data)
             self.root.events.raw_data.append(raw_data)
 
+    def get_raw_scaling(self):
+        """
+        :returns: (scale, offset) if raw_data stores integer ADC codes, where the raw data is scale * code + offset,\
+            or None if raw_data stores the values themselves.
+        """
+        attrs = self.root.events.raw_data.attrs
+        if 'scale' not in attrs:
+            return None
+        return attrs.scale, attrs.offset
+
+    def encode_raw_data(self, raw_data):
+        """
+        :returns: raw_data as it is stored in root.events.raw_data. If the database stores ADC codes, the nearest\
+            codes, clipped to the range of the codes.
+        """
+        scaling = self.get_raw_scaling()
+        if scaling is None:
+            return np.asarray(raw_data, dtype=self.root.events.raw_data.dtype)
+        codes = np.rint((np.asarray(raw_data, dtype=np.float64) - scaling[1]) / scaling[0])
+        code_range = np.iinfo(self.root.events.raw_data.dtype)
+        return np.clip(codes, code_range.min, code_range.max).astype(self.root.events.raw_data.dtype)
+
+    def decode_raw_data(self, raw_data):
+        """
+        :returns: raw_data read from root.events.raw_data as values, decoded from ADC codes if the database\
+            stores them.
+        """
+        scaling = self.get_raw_scaling()
+        if scaling is None:
+            return raw_data
+        return scaling[0] * raw_data + scaling[1]
+
     def clean_database(self):
         """
         Removes /events and then re-initializes the /events group. Note
@@ -123,10 +193,12 @@ class EventDatabase(tb.file.File):
         >>> h5.clean_database() // table is now refers to deleted table
         >>> table = h5.get_event_table() // table now refers to live table
         """
+        ragged = self.is_ragged()
+        raw_scaling = self.get_raw_scaling()
         # remove the events group
         self.root.events._f_remove(recursive=True)
 
-        self.initialize_database()
+        self.initialize_database(ragged=ragged, raw_scaling=raw_scaling)
 
     @classmethod
     def _convert_to_event_database(cls, tables_object):
@@ -150,10 +222,14 @@ class EventDatabase(tb.file.File):
         raw buffer points kept on each side of an event.
         """
         row = self.get_event_row(i)
-        array_row = row['array_row']
         event_length = row['event_length']
         raw_points_per_side = row['raw_points_per_side']
-        return self.root.events.raw_data[array_row][raw_points_per_side:event_length + raw_points_per_side]
+        if self.is_ragged():
+            offset = row['raw_data_offset'] + raw_points_per_side
+            return self.decode_raw_data(self.root.events.raw_data[offset:offset + event_length])
+        array_row = row['array_row']
+        return self.decode_raw_data(
+            self.root.events.raw_data[array_row][raw_points_per_side:event_length + raw_points_per_side])
 
     def get_event_row(self, i):
         """
@@ -193,8 +269,11 @@ class EventDatabase(tb.file.File):
         in row 'i' of eventTable.
         """
         row = self.get_event_row(i)
-        array_row = row['array_row']
         n_levels = row['n_levels']
+        if self.is_ragged():
+            offset = row['level_offset']
+            return self.root.events.level_lengths[offset:offset + n_levels]
+        array_row = row['array_row']
         return self.root.events.level_lengths[array_row][:n_levels]
 
     def get_levels_at(self, i):
@@ -203,8 +282,11 @@ class EventDatabase(tb.file.File):
         in row 'i' of eventTable.
         """
         row = self.get_event_row(i)
-        array_row = row['array_row']
         n_levels = row['n_levels']
+        if self.is_ragged():
+            offset = row['level_offset']
+            return self.root.events.levels[offset:offset + n_levels]
+        array_row = row['array_row']
         return self.root.events.levels[array_row][:n_levels]
 
     def get_raw_data_at(self, i):
@@ -212,10 +294,14 @@ class EventDatabase(tb.file.File):
         Returns the raw_data numpy matrix associated with event 'i'.
         """
         row = self.get_event_row(i)
-        array_row = row['array_row']
         event_length = row['event_length']
         raw_points_per_side = row['raw_points_per_side']
-        return self.root.events.raw_data[array_row][:event_length + 2 * raw_points_per_side]
+        if self.is_ragged():
+            offset = row['raw_data_offset']
+            return self.decode_raw_data(
+                self.root.events.raw_data[offset:offset + event_length + 2 * raw_points_per_side])
+        array_row = row['array_row']
+        return self.decode_raw_data(self.root.events.raw_data[array_row][:event_length + 2 * raw_points_per_side])
 
     def get_sample_rate(self):
         """
@@ -230,6 +316,12 @@ class EventDatabase(tb.file.File):
 
         :param kargs: Dictionary - includes:
                         -maxEventLength: Maximum number of datapoints for an event to be added.
+                        -ragged: If True, create the compact layout, where raw_data, levels and level_lengths\
+                            are flat arrays. Ignored if the events group already exists.
+                        -dtype: Floating point type of raw_data, levels and the debug data, np.float64 or\
+                            np.float32. Defaults to the type of an existing raw_data, otherwise np.float64.
+                        -raw_scaling: (scale, offset) -- If passed, a new raw_data stores the signed 16 bit\
+                            ADC codes the raw data was decoded from, see :py:func:`get_raw_scaling`.
         """
         if 'maxEventLength' in kargs:
             if kargs['maxEventLength'] > self.max_event_length:
@@ -237,20 +329,27 @@ class EventDatabase(tb.file.File):
         if 'events' not in self.root:
             self.create_group(self.root, 'events', 'Events')
 
+        ragged = kargs.get('ragged', False)
         if not 'eventTable' in self.root.events:
-            self.create_table(self.root.events, 'eventTable', _Event, 'Event parameters')
+            self.create_table(self.root.events, 'eventTable', _RaggedEvent if ragged else _Event, 'Event parameters')
             self.event_row = None
+        ragged = self.is_ragged()
 
         filters = tb.Filters(complib='zlib', complevel=3)
-        shape = (0, self.max_event_length)
-        a = tb.FloatAtom()
+        shape = (0,) if ragged else (0, self.max_event_length)
+        default_dtype = self.root.events.levels.dtype if 'levels' in self.root.events else np.float64
+        a = tb.FloatAtom(itemsize=np.dtype(kargs.get('dtype', default_dtype)).itemsize)
         b = tb.IntAtom()
 
+        raw_scaling = kargs.get('raw_scaling')
         if not 'raw_data' in self.root.events:
             self.create_earray(self.root.events, 'raw_data',
-                              a, shape=shape,
+                              a if raw_scaling is None else tb.Int16Atom(), shape=shape,
                               title="Raw data points",
                               filters=filters)
+            if raw_scaling is not None:
+                self.root.events.raw_data.attrs.scale = float(raw_scaling[0])
+                self.root.events.raw_data.attrs.offset = float(raw_scaling[1])
 
         if not 'levels' in self.root.events:
             self.create_earray(self.root.events, 'levels',
@@ -299,6 +398,20 @@ class EventDatabase(tb.file.File):
         """
         return 'debug' in self.root
 
+    def get_debug_decimation(self):
+        """
+        :returns: The number of points of data in each (minimum, maximum) pair of the debug data, or 1 if every\
+            point was saved.
+        """
+        return getattr(self.root.debug._v_attrs, 'debug_decimation', 1)
+
+    def is_ragged(self):
+        """
+        :returns: True if raw_data, levels and level_lengths are stored as flat arrays, ie. the database was created\
+            with the ragged keyword.
+        """
+        return 'raw_data_offset' in self.root.events.eventTable.colnames
+
     def remove_event(self, i):
         """
         Deletes event i from /events/eventTable. Does nothing if
@@ -361,6 +474,14 @@ def open_file(*args, **kargs):
     :param kargs: Pass in the following named parameters.
 
         - maxEventLength: Maximum length of an event for the table. Default is 100.
+        - ragged: boolean -- If True, a new database stores raw_data, levels and level_lengths as flat arrays of\
+            the events' values one after the other, instead of rows of maxEventLength padded with zeros.
+        - dtype: np.float64 (default) or np.float32 -- Floating point type of the raw data and levels of a new\
+            database. Single precision halves the size of the database.
+        - raw_scaling: (scale, offset) -- If passed, a new database stores the raw data as the signed 16 bit ADC\
+            codes it was decoded from, with raw data = scale * code + offset. The codes take a quarter of the\
+            space of double precision values and compress much better. The getters, eg.\
+            :py:func:`EventDatabase.get_raw_data_at`, decode them.
         - debug: boolean -- If debug, an extra root.debug group will be created. If passing debug=True, then\
             you need to also pass the following parameters. This mode is used by\
             :py:func:`pypore.event_finder.find_events`, and only does anything if you are opening a new databse.
@@ -60,7 +60,7 @@ class TestEventDatabase(unittest.TestCase):
 
         # Check the eventTable columns are correct and in correct order
         column_names = ['array_row', 'event_start', 'event_length', 'n_levels', 'raw_points_per_side', 'baseline',
-                        'current_blockage', 'area']
+                        'current_blockage', 'area', 'channel']
         self.assertEqual(events_group.eventTable.colnames, column_names)
 
     def test_clean_database(self):
@@ -554,6 +554,107 @@ class TestEventDatabase(unittest.TestCase):
         os.remove(output_filename)
 
 
+class TestRaggedEventDatabase(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'testRaggedEventDatabase_2098347120934.h5'
+        self.database = eD.open_file(self.filename, mode='w', maxEventLength=100, ragged=True)
+
+    def tearDown(self):
+        self.database.close()
+        os.remove(self.filename)
+
+    def _append_events(self):
+        # Events of different lengths, with raw_points_per_side = 2
+        self.raw_data = [np.arange(7.), np.arange(10., 20.)]
+        self.levels = [np.array([1.]), np.array([2., 3., 4.])]
+        self.level_lengths = [np.array([3]), np.array([1, 2, 3])]
+        for i in xrange(2):
+            self.database.append_event(i, 10 * i, self.raw_data[i].size - 4, self.levels[i].size, 2, 1., 0.5, 3.,
+                                       self.raw_data[i], self.levels[i], self.level_lengths[i])
+        self.database.flush()
+
+    def test_initialize(self):
+        self.assertTrue(self.database.is_ragged())
+        events = self.database.root.events
+        self.assertEqual(events.raw_data.shape, (0,))
+        self.assertEqual(events.levels.shape, (0,))
+        self.assertEqual(events.level_lengths.shape, (0,))
+        self.assertEqual(events.eventTable.colnames[-2:], ['raw_data_offset', 'level_offset'])
+
+    def test_append_event_offsets(self):
+        self._append_events()
+        table = self.database.get_event_table()
+        self.assertEqual(list(table.col('raw_data_offset')), [0, 7])
+        self.assertEqual(list(table.col('level_offset')), [0, 1])
+        self.assertEqual(self.database.root.events.raw_data.nrows, 17)
+
+    def test_getters(self):
+        self._append_events()
+        for i in xrange(2):
+            npt.assert_array_equal(self.database.get_raw_data_at(i), self.raw_data[i])
+            npt.assert_array_equal(self.database.get_event_data_at(i), self.raw_data[i][2:-2])
+            npt.assert_array_equal(self.database.get_levels_at(i), self.levels[i])
+            npt.assert_array_equal(self.database.get_level_lengths_at(i), self.level_lengths[i])
+
+    def test_clean_database_keeps_layout(self):
+        self._append_events()
+        self.database.clean_database()
+
+        self.assertTrue(self.database.is_ragged())
+        self.assertEqual(self.database.get_event_count(), 0)
+        self.assertEqual(self.database.root.events.raw_data.shape, (0,))
+
+    def test_open_existing(self):
+        self._append_events()
+        self.database.close()
+
+        self.database = eD.open_file(self.filename, mode='r')
+        self.assertTrue(self.database.is_ragged())
+        npt.assert_array_equal(self.database.get_levels_at(1), self.levels[1])
+
+
+class TestRawCodesEventDatabase(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'testRawCodesEventDatabase_5203948712.h5'
+        self.scaling = (0.25, 3.)
+        self.database = eD.open_file(self.filename, mode='w', maxEventLength=100, raw_scaling=self.scaling)
+
+    def tearDown(self):
+        self.database.close()
+        os.remove(self.filename)
+
+    def test_initialize(self):
+        self.assertEqual(self.database.root.events.raw_data.dtype, np.int16)
+        self.assertEqual(self.database.get_raw_scaling(), self.scaling)
+
+    def test_encode_decode(self):
+        codes = np.array([-32768, -5, 0, 7, 32767], dtype=np.int16)
+        raw_data = self.database.decode_raw_data(codes)
+        npt.assert_array_equal(raw_data, 0.25 * codes + 3.)
+        npt.assert_array_equal(self.database.encode_raw_data(raw_data), codes)
+        # Values off the ends of the codes are clipped.
+        npt.assert_array_equal(self.database.encode_raw_data([-1.e6, 1.e6]), [-32768, 32767])
+
+    def test_getters(self):
+        raw_data = 0.25 * np.arange(-50, 50) + 3.
+        self.database.append_event(0, 10, 96, 1, 2, 1., 0.5, 3., raw_data.reshape(1, -1), np.zeros((1, 100)),
+                                   np.zeros((1, 100)))
+        self.database.flush()
+        npt.assert_array_equal(self.database.get_raw_data_at(0), raw_data)
+        npt.assert_array_equal(self.database.get_event_data_at(0), raw_data[2:-2])
+
+    def test_clean_database_keeps_scaling(self):
+        self.database.clean_database()
+        self.assertEqual(self.database.get_raw_scaling(), self.scaling)
+
+    def test_values_not_coded(self):
+        database = eD.open_file('testRawCodesEventDatabase_values.h5', mode='w')
+        self.assertIsNone(database.get_raw_scaling())
+        npt.assert_array_equal(database.decode_raw_data(np.array([1.5])), [1.5])
+        database.close()
+        os.remove('testRawCodesEventDatabase_values.h5')
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
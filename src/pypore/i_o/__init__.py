@@ -1,10 +1,17 @@
+import numpy as np
+
+
 # TODO implement tests for this!
-def get_reader_from_filename(filename):
+def get_reader_from_filename(filename, dtype=np.float64, prefetch=0):
     """
     Returns an instance of an implementation of :py:class:`pypore.i_o.abstract_reader.AbstractReader` based on the
     extension of filename.
 
     :param string filename: Filename to get the reader for.
+    :param dtype: Floating point type of the data the reader returns, np.float64 (default) or np.float32.
+    :param int prefetch: If more than 0, the reader is wrapped in a\
+        :py:class:`pypore.i_o.prefetch_reader.PrefetchReader`, which keeps up to prefetch reads of the file ahead of\
+        the caller, read in a background thread. Default is 0, which reads in the caller's thread.
     :returns: An open reader of an implementation of :py:class:`pypore.i_o.abstract_reader.AbstractReader` based on the\
              extension of filename, for the following extensions.
 
@@ -33,7 +40,10 @@ def get_reader_from_filename(filename):
         raise ValueError(
             "No default match for the extension of {0}. Default extensions include '.h5', '.log', '.hkd', '.hex'.".format(filename))
 
-    reader = ReaderClass(filename)
+    reader = ReaderClass(filename, dtype=dtype)
+    if prefetch > 0:
+        from prefetch_reader import PrefetchReader
+        reader = PrefetchReader(reader, n_reads=prefetch)
     return reader
 
     # elif '.hkd' in filename:
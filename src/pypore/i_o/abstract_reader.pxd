@@ -14,6 +14,7 @@ cdef class AbstractReader:
     cdef public double sample_rate
     cdef public long points_per_channel_total
     cdef object filename
+    cdef public object dtype
 
     cpdef _prepare_file(self, filename)
 
@@ -26,6 +27,13 @@ cdef class AbstractReader:
     cpdef object get_next_blocks(self, long n_blocks=?)
     cdef object get_next_blocks_c(self, long n_blocks=?)
 
+    cpdef object seek(self, long point)
+    cdef object seek_c(self, long point)
+
+    cpdef object read_range(self, long start, long stop, channels=?)
+    cdef object read_range_c(self, long start, long stop, channels=?)
+    cdef object _get_channel_list(self, channels, long n_channels)
+
     cpdef double get_sample_rate(self)
     cdef double get_sample_rate_c(self)
 
@@ -37,3 +45,6 @@ cdef class AbstractReader:
 
     cpdef long get_block_size(self)
     cdef long get_block_size_c(self)
+
+    cpdef object get_code_scaling(self)
+    cdef object get_code_scaling_c(self)
@@ -1,5 +1,7 @@
 from cpython cimport bool
 
+import numpy as np
+
 cdef class AbstractReader:
     """
     This is an abstract class showing the methods that subclasses must override.
@@ -10,16 +12,19 @@ cdef class AbstractReader:
 
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, dtype=np.float64):
         """
         Opens a data file, reads relevant parameters, and returns then open file and parameters.
 
         :param StringType filename: Filename to open and read parameters.
+        :param dtype: Floating point type of the data returned, np.float64 (default) or np.float32. Single\
+            precision halves the memory and bandwidth taken by the data.
 
         If there was an error opening the files, params will have 'error' key with string description.
         """
         self.block_size = 5000
         self.filename = filename
+        self.dtype = np.dtype(dtype)
         self._prepare_file(filename)
 
     cpdef _prepare_file(self, filename):
@@ -86,6 +91,65 @@ cdef class AbstractReader:
     cdef object get_next_blocks_c(self, long n_blocks=1):
         raise NotImplementedError
 
+    cpdef object seek(self, long point):
+        """seek(long point)
+
+        (Note this is a cpdef wrapper around the cdef method :py:func:`seek_c`.
+        If using Cython, you can call the cdef version directly.)
+
+        Moves :py:func:`get_next_blocks` to the point of each channel, without reading the points before it.
+
+        :param long point: Index of the next point to return. Clipped to the points in the file. Some readers can\
+            only seek to the start of a block, or to the end of the file.
+        :raises: NotImplementedError if the reader can't seek.
+        """
+        point = max(0, min(point, self.get_points_per_channel_total_c()))
+        return self.seek_c(point)
+
+    cdef object seek_c(self, long point):
+        """
+        See docs for :py:func:`seek`. point is within the points in the file.
+        """
+        raise NotImplementedError
+
+    cpdef object read_range(self, long start, long stop, channels=None):
+        """read_range(long start, long stop, channels=None)
+
+        (Note this is a cpdef wrapper around the cdef method :py:func:`read_range_c`.
+        If using Cython, you can call the cdef version directly.)
+
+        Reads the points [start, stop) of each channel, without reading the file from the start. Does not change
+        the position of :py:func:`get_next_blocks`.
+
+        :param long start: Index of the first point to read. Clipped to the points in the file.
+        :param long stop: One past the index of the last point to read. Clipped to the points in the file.
+        :param channels: (Optional) List of the indices of the channels to read. Default is all of them.
+        :returns: List of numpy arrays, one for each channel read.
+        """
+        start = max(0, min(start, self.get_points_per_channel_total_c()))
+        stop = max(start, min(stop, self.get_points_per_channel_total_c()))
+        return self.read_range_c(start, stop, channels)
+
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        """
+        See docs for :py:func:`read_range`. start and stop are within the points in the file.
+        """
+        raise NotImplementedError
+
+    cdef object _get_channel_list(self, channels, long n_channels):
+        """
+        :returns: The list of channel indices in channels, or of all n_channels channels if channels is None.
+        :raises: IndexError if a channel is not in the file.
+        """
+        if channels is None:
+            return range(n_channels)
+        channels = list(channels)
+        for channel in channels:
+            if not 0 <= channel < n_channels:
+                raise IndexError('Channel {0} is not in the file, which has {1} channels.'.format(channel,
+                                                                                               n_channels))
+        return channels
+
     cpdef double get_sample_rate(self):
         """get_sample_rate()
 
@@ -132,3 +196,18 @@ cdef class AbstractReader:
 
     cdef long get_block_size_c(self):
         return self.block_size
+
+    cpdef object get_code_scaling(self):
+        """get_code_scaling()
+
+        (Note this is a cpdef wrapper around the cdef method :py:func:`get_code_scaling_c`.
+        If using Cython, you can call the cdef version directly.)
+
+        :returns: (scale, offset) such that the data returned is scale * code + offset, where code are the signed\
+            16 bit integer ADC codes the data was decoded from, or None if the data is not an affine function of\
+            such codes. Subclasses reading integer ADC data should override :py:func:`get_code_scaling_c`.
+        """
+        return self.get_code_scaling_c()
+
+    cdef object get_code_scaling_c(self):
+        return None
@@ -1,3 +1,5 @@
+cimport numpy as np
+
 from abstract_reader cimport AbstractReader
 
 cdef class ChimeraReader(AbstractReader):
@@ -5,6 +7,7 @@ cdef class ChimeraReader(AbstractReader):
     # Note that these need to be public in order for the calling of
     # _prepare_file from AbstractReader to work.
 
+    # Memory-mapped raw values of the file.
     cdef public object datafile
     cdef public object specs_file
 
@@ -16,3 +19,9 @@ cdef class ChimeraReader(AbstractReader):
     cdef public double pre_adc_gain
     cdef public long bit_mask
     cdef public double decimate_sample_rate
+
+    # Index of the next point to return from get_next_blocks.
+    cdef public long next_to_send
+    cdef public bint lazy
+
+    cdef np.ndarray _decode(self, np.ndarray raw_values)
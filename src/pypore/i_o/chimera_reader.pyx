@@ -11,9 +11,91 @@ ctypedef np.float_t DTYPE_t
 
 CHIMERA_DATA_TYPE = np.dtype('<u2')
 
+# Most blocks to decode at a time when decimating the whole file.
+DECIMATE_BLOCKS_PER_READ = 1000
+
+
+class ChimeraData(object):
+    """
+    Read only, array-like view of the data of a Chimera file. The raw values stay memory-mapped from the file, and
+    only the points sliced are decoded, so the data of files much larger than the memory can be used. Returned by
+    :py:func:`ChimeraReader.get_all_data` if the reader was opened with lazy=True.
+
+    >>> data = ChimeraReader('test.log', lazy=True).get_all_data()[0]
+    >>> part = data[1000000:2000000]  # numpy array of the decoded points
+    """
+
+    def __init__(self, reader, raw_values):
+        """
+        :param ChimeraReader reader: The reader, used to decode the raw values.
+        :param raw_values: Memory-mapped array of the raw values of the file.
+        """
+        self.reader = reader
+        self.raw_values = raw_values
+
+    @property
+    def shape(self):
+        return self.raw_values.shape
+
+    @property
+    def size(self):
+        return self.raw_values.size
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return self.reader.dtype
+
+    def __len__(self):
+        return self.raw_values.size
+
+    def __getitem__(self, key):
+        cdef ChimeraReader reader = self.reader
+        raw_values = self.raw_values[key]
+        if np.ndim(raw_values) == 0:
+            return reader._decode(np.array([raw_values], dtype=CHIMERA_DATA_TYPE))[0]
+        return reader._decode(raw_values)
+
+    def __array__(self, dtype=None):
+        data = self[:]
+        if dtype is not None:
+            return data.astype(dtype, copy=False)
+        return data
+
+
 cdef class ChimeraReader(AbstractReader):
-    # Note that these need to be public in order for the calling of
-    # _prepare_file from AbstractReader to work.
+    """
+    Reader for Chimera ".log" files, with the run's parameters in a ".mat" file of the same name.
+
+    The raw values are memory-mapped from the file, so reads do not copy them, and processes reading the same file
+    share the page cache.
+    """
+
+    def __init__(self, filename, dtype=np.float64, lazy=False):
+        """
+        :param filename: Name of the ".log" file.
+        :param dtype: See :py:class:`pypore.i_o.abstract_reader.AbstractReader`.
+        :param bool lazy: If True, :py:func:`get_all_data` returns :py:class:`ChimeraData`, which only decodes the\
+            points sliced from it, instead of decoding the whole file into memory.
+        """
+        self.lazy = lazy
+        super(ChimeraReader, self).__init__(filename, dtype)
+
+    cdef np.ndarray _decode(self, np.ndarray raw_values):
+        """
+        :returns: The current, in nA, of the raw values read from the file.
+        """
+        cdef np.ndarray log_data = -self.adc_v_ref + (2 * self.adc_v_ref) * (raw_values & self.bit_mask) / (2 ** 16)
+
+        # Extra scaling for the log data.
+        log_data /= (self.pre_adc_gain * self.tia_gain)
+        log_data += self.current_offset
+        log_data *= 1.e9
+
+        return log_data.astype(self.dtype, copy=False)
 
     cdef object get_next_blocks_c(self, long n_blocks=1):
         """
@@ -23,17 +105,16 @@ cdef class ChimeraReader(AbstractReader):
         :returns: List of numpy arrays, one for each channel. Chimera data only has one channel,\
             so this returns [np array].
         """
+        cdef long start = self.next_to_send
+        self.next_to_send = min(start + n_blocks * self.block_size, self.points_per_channel_total)
+        return [self._decode(self.datafile[start:self.next_to_send])]
 
-        cdef np.ndarray raw_values = np.fromfile(self.datafile, CHIMERA_DATA_TYPE, n_blocks * self.block_size)
-        raw_values &= self.bit_mask
-        cdef np.ndarray[DTYPE_t] log_data = -self.adc_v_ref + (2 * self.adc_v_ref) * raw_values / (2 ** 16)
-
-        # Extra scaling for the log data.
-        log_data /= (self.pre_adc_gain * self.tia_gain)
-        log_data += self.current_offset
-        log_data *= 1.e9
+    cdef object seek_c(self, long point):
+        self.next_to_send = point
 
-        return [log_data]
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        data = self._decode(self.datafile[start:stop])
+        return [data for _ in self._get_channel_list(channels, 1)]
 
     cpdef _prepare_file(self, filename):
         """
@@ -48,11 +129,14 @@ cdef class ChimeraReader(AbstractReader):
             raise IOError(
                 "Error opening " + filename + ", Chimera .mat specs file of same name must be located in same folder.")
 
-        self.datafile = open(filename, 'rb')
-
         # Calculate number of points per channel
-        cdef int filesize = os.path.getsize(filename)
-        self.points_per_channel_total = filesize / CHIMERA_DATA_TYPE.itemsize
+        if os.path.getsize(filename) < CHIMERA_DATA_TYPE.itemsize:
+            # An empty file can't be mapped.
+            self.datafile = np.zeros(0, dtype=CHIMERA_DATA_TYPE)
+        else:
+            self.datafile = np.memmap(filename, dtype=CHIMERA_DATA_TYPE, mode='r')
+        self.points_per_channel_total = self.datafile.size
+        self.next_to_send = 0
 
         self.adc_bits = self.specs_file['SETUP_ADCBITS'][0][0]
         self.adc_v_ref = self.specs_file['SETUP_ADCVREF'][0][0]
@@ -67,7 +151,15 @@ cdef class ChimeraReader(AbstractReader):
         self.decimate_sample_rate = self.sample_rate * 2.0 / self.block_size
 
     cdef void close_c(self):
-        self.datafile.close()
+        # The mapping is closed once nothing, eg. a ChimeraData, uses it anymore.
+        self.datafile = None
+
+    cdef object get_code_scaling_c(self):
+        """
+        The 16 bit raw values less 2 ** 15 are the codes, so that they fit in signed 16 bit integers.
+        """
+        cdef double scale = (2 * self.adc_v_ref) / (2 ** 16) / (self.pre_adc_gain * self.tia_gain) * 1.e9
+        return scale, self.current_offset * 1.e9
 
     cdef object get_all_data_c(self, bool decimate=False):
         """
@@ -75,38 +167,32 @@ cdef class ChimeraReader(AbstractReader):
         filename.log file with the data, and a filename.mat file containing the
         parameters of the run.
 
-        :returns: List of numpy arrays, one for each channel of data.
+        :returns: List of numpy arrays, one for each channel of data. If the reader is lazy and not decimating,\
+            the list holds a :py:class:`ChimeraData` instead.
         """
-        self.datafile.seek(0)
-        cdef long decimated_size = 0
-        cdef long i = 0
-        cdef np.ndarray[DTYPE_t] log_data, read_values
-        cdef np.ndarray raw_values
-        if decimate:
-            # use 5000 for plot decimation
-            decimated_size = 2 * int(self.points_per_channel_total / self.block_size)
-            # will there be a block at the end with < block_size datapoints?
-            if self.points_per_channel_total % self.block_size > 0:
-                decimated_size += 2
-            log_data = np.empty(decimated_size)
-            i = 0
-            while True:
-                raw_values = np.fromfile(self.datafile, CHIMERA_DATA_TYPE, self.block_size)
-                if raw_values.size < 1:
-                    break
-                read_values = -self.adc_v_ref + (2 * self.adc_v_ref) * (raw_values & self.bit_mask) / (2 ** 16)
-                log_data[i] = np.max(read_values)
-                log_data[i + 1] = np.min(read_values)
-                i += 2
-
-        else:
-            raw_values = np.fromfile(self.datafile, CHIMERA_DATA_TYPE)
-            raw_values &= self.bit_mask
-            log_data = -self.adc_v_ref + (2 * self.adc_v_ref) * raw_values / (2 ** 16)
-
-        # Extra scaling for the log data.
-        log_data /= (self.pre_adc_gain * self.tia_gain)
-        log_data += self.current_offset
-        log_data *= 1.e9
+        if not decimate:
+            if self.lazy:
+                return [ChimeraData(self, self.datafile)]
+            return [self._decode(self.datafile[:])]
+
+        # use 5000 for plot decimation
+        cdef long n_full_blocks = self.points_per_channel_total / self.block_size
+        cdef long decimated_size = 2 * n_full_blocks
+        # will there be a block at the end with < block_size datapoints?
+        if self.points_per_channel_total % self.block_size > 0:
+            decimated_size += 2
+        cdef np.ndarray log_data = np.empty(decimated_size, dtype=self.dtype)
+        cdef long i, stop
+        # Decode a few full blocks at a time, and take the maximum and minimum of each.
+        for i in xrange(0, n_full_blocks, DECIMATE_BLOCKS_PER_READ):
+            stop = min(i + DECIMATE_BLOCKS_PER_READ, n_full_blocks)
+            read_values = self._decode(self.datafile[i * self.block_size:stop * self.block_size]).reshape(
+                stop - i, self.block_size)
+            log_data[2 * i:2 * stop:2] = read_values.max(axis=1)
+            log_data[2 * i + 1:2 * stop:2] = read_values.min(axis=1)
+        if decimated_size > 2 * n_full_blocks:
+            read_values = self._decode(self.datafile[n_full_blocks * self.block_size:])
+            log_data[-2] = read_values.max()
+            log_data[-1] = read_values.min()
 
         return [log_data]
@@ -27,7 +27,9 @@ cdef class CNP2Reader(AbstractReader):
     # Other
     cdef public object raw_dtype
     cdef public int points_per_chunk
+    cdef public long next_to_send
 
     # Helper functions
     cdef np.ndarray _unpack_raw(self, np.ndarray raw)
-    cdef np.ndarray _get_next_n_values(self, long n)
+    cdef np.ndarray _read_points(self, long start, long stop)
+    cdef np.ndarray _scale(self, np.ndarray adc_data)
@@ -9,6 +9,12 @@ import json
 
 SAMPLE_RATE = 40.e6
 
+# Right shifts of the three 12 bit points packed in the 36 bits of a chunk, in the 64 bit column modes.
+ADC_SHIFTS = np.array([0, 12, 24], dtype=np.uint64)
+
+# Most blocks to unpack at a time when decimating the whole file.
+DECIMATE_BLOCKS_PER_READ = 1000
+
 
 cdef class CNP2Reader(AbstractReader):
 
@@ -35,53 +41,82 @@ cdef class CNP2Reader(AbstractReader):
 
         self.AAFILTERGAIN = (51+620)/620.0*1.8*.51
 
-        self.datafile = open(filename, 'rb')
-
         self.sample_rate = SAMPLE_RATE
 
-        cdef int filesize = os.path.getsize(filename)
+        cdef long filesize = os.path.getsize(filename)
 
         if self.column_select in [0, 1]:
-            self.raw_dtype = np.dtype('uint32')
+            # One point in the low (column 0) or high (column 1) 12 bits of each 4 byte word.
+            self.raw_dtype = np.dtype('<u4')
             self.points_per_chunk = 1
-            self.points_per_channel_total = filesize / 4 # 4 byte chunks
+            chunk_shape = (filesize / 4,)
         elif self.column_select in [2, 3, 4]:
-            self.raw_dtype = np.dtype('uint64')
+            # Three points packed in each 16 byte chunk of two 8 byte words. A partial chunk at the end is ignored.
+            self.raw_dtype = np.dtype('<u8')
             self.points_per_chunk = 3
-            self.points_per_channel_total = filesize / 16 # 16 byte chunks
+            chunk_shape = (filesize / 16, 2)
+        else:
+            raise ValueError("Unknown columnSelect {0} in {1}.".format(self.column_select, config_filename))
 
+        if chunk_shape[0] < 1:
+            # An empty file can't be mapped.
+            self.datafile = np.zeros(chunk_shape, dtype=self.raw_dtype)
+        else:
+            self.datafile = np.memmap(filename, dtype=self.raw_dtype, mode='r', shape=chunk_shape)
+        self.points_per_channel_total = chunk_shape[0] * self.points_per_chunk
+        self.next_to_send = 0
 
     cdef void close_c(self):
-        self.datafile.close()
+        self.datafile = None
+
+    cdef object get_code_scaling_c(self):
+        """
+        The codes are the ADC values as signed, two's complement, integers.
+        """
+        cdef double scale = 1.e9 / (2 ** (self.ADCBITS - 1) * self.rdcfb * self.AAFILTERGAIN)
+        return scale, -self.idc_offset * 1.e9
 
     cdef np.ndarray _unpack_raw(self, np.ndarray raw):
-        cdef np.ndarray ADCData
-        cdef np.ndarray ADCDataCompressed
-        # Implement the Master FPGAType
+        """
+        Unpacks the 12 bit ADC values of the column from the raw chunks of the file.
+
+        :param raw: The chunks, 4 byte words for columns 0 and 1, or rows of two 8 byte words for columns 2 to 4.
+        :returns: Array of the unsigned ADC values.
+        """
+        cdef np.ndarray compressed
         if self.column_select == 0:
-            ADCData = np.bitwise_and(raw, 0xfff)
+            return np.bitwise_and(raw, 0xfff)
         elif self.column_select == 1:
-            ADCData = np.bitwise_and(raw, 0xfff000) >> 12
-        elif self.column_select == 2: # TODO implement Slave FPGAType
-            ADCDataCompressed = np.bitwise_and(raw[0::2], 0xfffffffff)
-            ADCData = np.zeros((3*np.size(ADCDataCompressed),))
-            ADCData[0::3] = np.bitwise_and(ADCDataCompressed, 0xfff)
-            ADCData[1::3] = np.bitwise_and(ADCDataCompressed, 0xfff000) >> 12
-            ADCData[2::3] = np.bitwise_and(ADCDataCompressed, 0xfff000000) >> 24
-
-
-        return ADCData
-
+            return np.bitwise_and(np.right_shift(raw, 12), 0xfff)
+
+        # Gather the 36 bits holding the three points of each chunk, then split them out in order.
+        if self.column_select == 2:
+            compressed = np.bitwise_and(raw[:, 0], 0xfffffffff)
+        elif self.column_select == 3:
+            # The top 28 bits of the first word, with the 8 most significant bits from the bottom of the second.
+            compressed = np.right_shift(raw[:, 0], 36)
+            compressed |= np.left_shift(np.bitwise_and(raw[:, 1], 0xff), 28)
+        else:
+            compressed = np.bitwise_and(np.right_shift(raw[:, 1], 8), 0xfffffffff)
+        compressed = np.right_shift(compressed[:, np.newaxis], ADC_SHIFTS)
+        compressed &= 0xfff
+        return compressed.ravel()
 
-    cdef np.ndarray _get_next_n_values(self, long n):
+    cdef np.ndarray _read_points(self, long start, long stop):
         """
-        Returns the next n values in the file.
+        :returns: The current, in nA, of the points [start, stop), unpacked from the chunks holding them.
         """
-        cdef np.ndarray raw_values = np.fromfile(self.datafile, self.raw_dtype, n)
-
-        cdef np.ndarray adc_data = self._unpack_raw(raw_values)
+        cdef long first_chunk = start / self.points_per_chunk
+        cdef long last_chunk = (stop + self.points_per_chunk - 1) / self.points_per_chunk
+        cdef long offset = first_chunk * self.points_per_chunk
+        cdef np.ndarray adc_data = self._unpack_raw(self.datafile[first_chunk:last_chunk])
+        return self._scale(adc_data[start - offset:stop - offset])
 
-        cdef np.ndarray fnal = 1.0*adc_data
+    cdef np.ndarray _scale(self, np.ndarray adc_data):
+        """
+        :returns: The current, in nA, of the unpacked ADC values.
+        """
+        cdef np.ndarray fnal = adc_data.astype(self.dtype)
 
         # Scale the data correctly
         fnal[fnal >= 2**(self.ADCBITS-1)] -= 2**(self.ADCBITS)
@@ -98,41 +133,42 @@ cdef class CNP2Reader(AbstractReader):
         Get the next n blocks of data.
 
         :param int n_blocks: Number of blocks to grab.
-        :returns: List of numpy arrays, one for each channel. Chimera data only has one channel,\
+        :returns: List of numpy arrays, one for each channel. CNP2 data only has one channel,\
             so this returns [np array].
         """
-        cdef np.ndarray adc_data = self._get_next_n_values(n_blocks * self.block_size)
+        cdef long start = self.next_to_send
+        self.next_to_send = min(start + n_blocks * self.block_size, self.points_per_channel_total)
+        return [self._read_points(start, self.next_to_send)]
 
-        return [adc_data]
+    cdef object seek_c(self, long point):
+        self.next_to_send = point
 
-    cdef object get_all_data_c(self, bool decimate=False):
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        data = self._read_points(start, stop)
+        return [data for _ in self._get_channel_list(channels, 1)]
 
-        # Go to the beginning of the file
-        self.datafile.seek(0)
-
-        cdef np.ndarray adc_data
-        cdef np.ndarray values
-
-        cdef long decimated_size
-
-        cdef i
-
-        if decimate:
-            # use 5000 for plot decimation
-            decimated_size = 2 * int(self.points_per_channel_total / self.block_size)
-            # will there be a block at the end with < block_size datapoints?
-            if self.points_per_channel_total % self.block_size > 0:
-                decimated_size += 2
-            adc_data = np.zeros(decimated_size)
-            i = 0
-            while True:
-                values = self._get_next_n_values(self.block_size)
-                if values.size < 1:
-                    break
-                adc_data[i] = np.max(values)
-                adc_data[i + 1] = np.min(values)
-                i += 2
-        else:
-            adc_data = self._get_next_n_values(self.points_per_channel_total)
+    cdef object get_all_data_c(self, bool decimate=False):
+        if not decimate:
+            return [self._read_points(0, self.points_per_channel_total)]
+
+        # use 5000 for plot decimation
+        cdef long n_full_blocks = self.points_per_channel_total / self.block_size
+        cdef long decimated_size = 2 * n_full_blocks
+        # will there be a block at the end with < block_size datapoints?
+        if self.points_per_channel_total % self.block_size > 0:
+            decimated_size += 2
+        cdef np.ndarray adc_data = np.empty(decimated_size, dtype=self.dtype)
+        cdef long i, stop
+        # Unpack a few full blocks at a time, and take the maximum and minimum of each.
+        for i in xrange(0, n_full_blocks, DECIMATE_BLOCKS_PER_READ):
+            stop = min(i + DECIMATE_BLOCKS_PER_READ, n_full_blocks)
+            values = self._read_points(i * self.block_size, stop * self.block_size).reshape(stop - i,
+                                                                                              self.block_size)
+            adc_data[2 * i:2 * stop:2] = values.max(axis=1)
+            adc_data[2 * i + 1:2 * stop:2] = values.min(axis=1)
+        if decimated_size > 2 * n_full_blocks:
+            values = self._read_points(n_full_blocks * self.block_size, self.points_per_channel_total)
+            adc_data[-2] = values.max()
+            adc_data[-1] = values.min()
 
         return [adc_data]
@@ -29,12 +29,16 @@ cdef class DataFileReader(AbstractReader):
         self.next_to_send = 0
 
     cdef object get_next_blocks_c(self, long n_blocks=1):
+        cdef long start = self.next_to_send
+        self.next_to_send = min(start + n_blocks * self.block_size, self.points_per_channel_total)
+        return [self.datafile.root.data[start:self.next_to_send].astype(self.dtype)]
 
-        self.next_to_send += self.block_size
-        if self.next_to_send > self.points_per_channel_total:
-            return [self.datafile.root.data[self.next_to_send - self.block_size:].astype(DTYPE)]
-        else:
-            return [self.datafile.root.data[self.next_to_send - self.block_size : self.next_to_send].astype(DTYPE)]
+    cdef object seek_c(self, long point):
+        self.next_to_send = point
+
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        data = self.datafile.root.data[start:stop].astype(self.dtype)
+        return [data for _ in self._get_channel_list(channels, 1)]
 
     cdef object get_all_data_c(self, bool decimate=False):
 
@@ -45,7 +49,7 @@ cdef class DataFileReader(AbstractReader):
             decimated_size = 2 * int(self.points_per_channel_total / self.block_size)
             if self.points_per_channel_total % self.block_size > 0:
                 decimated_size += 2
-            log_data = np.empty(decimated_size)
+            log_data = np.empty(decimated_size, dtype=self.dtype)
             # loop through each block and get its max an min value
             i = 0
             while True:
@@ -61,7 +65,7 @@ cdef class DataFileReader(AbstractReader):
                 self.next_to_send += self.block_size
 
             return [log_data]
-        return [self.datafile.root.data[:].astype(DTYPE)]
+        return [self.datafile.root.data[:].astype(self.dtype)]
 
     cdef void close_c(self):
         self.datafile.close()
@@ -29,6 +29,14 @@ cdef long _get_param_list_byte_length(param_list):
     return size
 
 cdef class HekaReader(AbstractReader):
+    """
+    Reader for Heka ".hkd" files.
+
+    After the file header, the file is a sequence of blocks of the same size, each holding the block's header
+    parameters, each channel's header parameters, and block_size big-endian 16 bit samples of each channel. The
+    blocks are memory-mapped as an array of a structured dtype describing one block, see :py:func:`get_block_dtype`,
+    so any range of blocks is decoded in a few vectorized operations, scaling each block by its channels' 'Scale'.
+    """
     # Note that these need to be public in order for the calling of
     # _prepare_file from AbstractReader to work.
 
@@ -55,6 +63,10 @@ cdef class HekaReader(AbstractReader):
     cdef long num_blocks_in_file
     cdef long remainder
 
+    # Memory-mapped blocks of the file, and the index of the next block to return from get_next_blocks.
+    cdef object blocks
+    cdef long next_block
+
     cpdef _prepare_file(self, filename):
         """
         Implementation of :py:func:`prepare_data_file` for Heka ".hkd" files.
@@ -84,6 +96,8 @@ cdef class HekaReader(AbstractReader):
 
         # # Calculate sizes of blocks, channels, etc
         self.per_file_header_length = self.heka_file.tell()
+        # The blocks are read through the memory map from now on.
+        self.heka_file.close()
 
         # Calculate the block lengths
         self.per_channel_per_block_length = _get_param_list_byte_length(self.per_channel_param_list)
@@ -100,15 +114,43 @@ cdef class HekaReader(AbstractReader):
         self.num_blocks_in_file = int((self.file_size - self.per_file_header_length) / self.total_bytes_per_block)
         cdef long remainder = (self.file_size - self.per_file_header_length) % self.total_bytes_per_block
         if not remainder == 0:
-            self.heka_file.close()
             raise IOError('Heka file ends with incomplete block')
         self.block_size = self.per_file_params['Points per block']
         self.points_per_channel_total = self.block_size * self.num_blocks_in_file
 
         self.sample_rate = 1.0 / self.per_file_params['Sampling interval']
 
+        block_dtype = self.get_block_dtype()
+        if self.num_blocks_in_file > 0:
+            self.blocks = np.memmap(filename, dtype=block_dtype, mode='r', offset=self.per_file_header_length,
+                                    shape=(self.num_blocks_in_file,))
+        else:
+            # An empty array can't be mapped.
+            self.blocks = np.zeros(0, dtype=block_dtype)
+        self.next_block = 0
+
+    def get_block_dtype(self):
+        """
+        :returns: Numpy structured dtype of one block of the file, with the fields 'block', holding the block's\
+            header parameters, 'channels', holding the header parameters of each channel, and 'data', holding the\
+            samples of each channel.
+        """
+        return np.dtype([('block', [(name, dtype) for name, dtype in self.per_block_param_list]),
+                         ('channels', [(name, dtype) for name, dtype in self.per_channel_param_list],
+                          (self.channel_list_number,)),
+                         ('data', np.dtype('>i2'), (self.channel_list_number, self.block_size))])
+
     cdef void close_c(self):
-        self.heka_file.close()
+        # The mapping is closed once nothing uses it anymore.
+        self.blocks = None
+
+    cdef np.ndarray _decode_blocks(self, long first, long last, long channel):
+        """
+        :returns: The samples of the channel in blocks [first, last), scaled by each block's 'Scale'.
+        """
+        blocks = self.blocks[first:last]
+        cdef np.ndarray scale = blocks['channels']['Scale'][:, channel]
+        return (blocks['data'][:, channel, :] * scale[:, np.newaxis]).reshape(-1).astype(self.dtype, copy=False)
 
     cdef get_all_data_c(self, bool decimate=False):
         """
@@ -116,52 +158,24 @@ cdef class HekaReader(AbstractReader):
 
         :returns: List of numpy arrays, one for each channel of data.
         """
-        # return to the start of the file
-        self.heka_file.seek(self.per_file_header_length)
-
         data = []
-        for _ in self.channel_list:
+        for c in xrange(self.channel_list_number):
+            values = self._decode_blocks(0, self.num_blocks_in_file, c)
             if decimate:  # If decimating, just keep max and min value from each block
-                data.append(np.empty(self.num_blocks_in_file * 2))
-            else:
-                data.append(np.empty(self.points_per_channel_total))  # initialize_c array
-
-        for i in xrange(0, self.num_blocks_in_file):
-            block = self._read_heka_next_block()
-            for j in xrange(len(block)):
-                if decimate:  # if decimating data, only keep max and min of each block
-                    data[j][2 * i] = np.max(block[j])
-                    data[j][2 * i + 1] = np.min(block[j])
-                else:
-                    data[j][i * self.block_size:(i + 1) * self.block_size] = block[
-                        j]
-
-        # if decimate:
-        #     self.decimate_sample_rate = self.sample_rate * 2 / self.points_per_channel_per_block  # we are downsampling
-
+                values = values.reshape(self.num_blocks_in_file, self.block_size)
+                decimated = np.empty(self.num_blocks_in_file * 2, dtype=self.dtype)
+                decimated[0::2] = values.max(axis=1)
+                decimated[1::2] = values.min(axis=1)
+                values = decimated
+            data.append(values)
         return data
 
     def get_all_voltages(self):
         """
         Returns a time series of the voltage
         """
-        # return to the start of the file
-        self.heka_file.seek(self.per_file_header_length)
-
-        data = []
-        for _ in self.channel_list:
-            data.append(np.empty(self.points_per_channel_total))  # initialize_c array
-
-        for i in xrange(0, self.num_blocks_in_file):
-            block = self._read_heka_next_block_voltages()
-            for j in xrange(len(block)):
-                data[j][i * self.block_size:(i + 1) * self.block_size] = block[
-                        j]
-
-        # if decimate:
-        #     self.decimate_sample_rate = self.sample_rate * 2 / self.points_per_channel_per_block  # we are downsampling
-
-        return data
+        return [np.repeat(1.0 * self.blocks['channels']['Voltage'][:, c], self.block_size)
+                for c in xrange(self.channel_list_number)]
 
     cdef object get_next_blocks_c(self, long n_blocks=1):
         """
@@ -170,96 +184,30 @@ cdef class HekaReader(AbstractReader):
         :param int n_blocks: Number of blocks to grab.
         :returns: List of numpy arrays, one for each channel.
         """
-        blocks = []
-        cdef long totalsize = 0
-        cdef long size = 0
-        cdef bool done = False
-        for i in xrange(0, n_blocks):
-            block = self._read_heka_next_block()
-            if block[0].size == 0:
-                return block
-            blocks.append(block)
-            size = block[0].size
-            totalsize = totalsize + size
-            if size < self.block_size:  # did we reach the end?
-                break
-
-        # stitch the data together
-        data = []
-        index = []
-        for _ in xrange(0, len(self.channel_list)):
-            data.append(np.empty(totalsize))
-            index.append(0)
-        for block in blocks:
-            for i in xrange(0, len(self.channel_list)):
-                data[i][index[i]:index[i] + block[i].size] = block[i]
-                index[i] = index[i] + block[i].size
-
-        return data
+        cdef long first = self.next_block
+        self.next_block = min(first + n_blocks, self.num_blocks_in_file)
+        return [self._decode_blocks(first, self.next_block, c) for c in xrange(self.channel_list_number)]
 
-    cdef _read_heka_next_block_voltages(self):
+    cdef object seek_c(self, long point):
         """
-        Reads the next block of heka voltages.
-        Returns a dictionary with 'data', 'per_block_params', and 'per_channel_params'.
-        """  # Read block header
-        per_block_params = self._read_heka_header_params(self.per_block_param_list)
-        if per_block_params is None:
-            return [np.empty(0)]
-
-        # Read per channel header
-        per_channel_block_params = []
-        for _ in self.channel_list:  # underscore used for discarded parameters
-            channel_params = {}
-            # i[0] = name, i[1] = datatype
-            for i in self.per_channel_param_list:
-                channel_params[i[0]] = np.fromfile(self.heka_file, i[1], 1)[0]
-            per_channel_block_params.append(channel_params)
-
-        # Read data
-        data = []
-        dt = np.dtype('>i2')  # int16
-        cdef np.ndarray values
-        cdef np.ndarray tmp
-        for i in xrange(0, len(self.channel_list)):
-            values = 1.0 * np.ones(self.block_size) * per_channel_block_params[i]['Voltage']
-            # get rid of nan's
-            #         values[np.isnan(values)] = 0
-            tmp = np.fromfile(self.heka_file, dt, count=self.block_size)
-            data.append(values)
-
-        return data
-
-    cdef _read_heka_next_block(self):
+        Heka files are read a whole block at a time, so point must be the start of a block, or the end of the file.
         """
-        Reads the next block of heka data.
-        Returns a dictionary with 'data', 'per_block_params', and 'per_channel_params'.
-        """  # Read block header
-        per_block_params = self._read_heka_header_params(self.per_block_param_list)
-        if per_block_params is None:
-            return [np.empty(0)]
-
-        # Read per channel header
-        per_channel_block_params = []
-        for _ in self.channel_list:  # underscore used for discarded parameters
-            channel_params = {}
-            # i[0] = name, i[1] = datatype
-            for i in self.per_channel_param_list:
-                channel_params[i[0]] = np.fromfile(self.heka_file, i[1], 1)[0]
-            per_channel_block_params.append(channel_params)
-
-        # Read data
-        data = []
-        dt = np.dtype('>i2')  # int16
-        cdef np.ndarray values
-        for i in xrange(0, len(self.channel_list)):
-            values = np.fromfile(self.heka_file, dt, count=self.block_size) * \
-                     per_channel_block_params[i][
-                         'Scale']
-            # get rid of nan's
-            #         values[np.isnan(values)] = 0
-            data.append(values)
+        if point % self.block_size != 0 and point != self.points_per_channel_total:
+            raise ValueError('Can only seek to the start of a block of {0} points, not to point {1}.'.format(
+                self.block_size, point))
+        self.next_block = (point + self.block_size - 1) / self.block_size
 
-        return data
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        """
+        Decodes the blocks holding the points [start, stop).
+        """
+        channels = self._get_channel_list(channels, self.channel_list_number)
+        if stop <= start:
+            return [np.empty(0, dtype=self.dtype) for _ in channels]
+        cdef long first_block = start / self.block_size
+        cdef long last_block = (stop - 1) / self.block_size + 1
+        cdef long offset = first_block * self.block_size
+        return [self._decode_blocks(first_block, last_block, c)[start - offset:stop - offset] for c in channels]
 
     cdef _read_heka_header_params(self, param_list):
         params = {}
@@ -0,0 +1,177 @@
+import Queue
+import threading
+
+import numpy as np
+
+from cpython cimport bool
+from pypore.i_o.abstract_reader cimport AbstractReader
+
+# Default number of reads decoded ahead of the caller, eg. 2 for double buffering.
+DEFAULT_PREFETCH_READS = 2
+
+# Seconds between checks of whether the reader was closed, while waiting for room on the queue.
+_PUT_TIMEOUT = 0.1
+
+
+def _read_ahead(PrefetchReader prefetch_reader):
+    """
+    Thread target. Puts the wrapped reader's blocks on the queue, until the end of the file, whose empty blocks are
+    put last, or until the reader is closed. An exception raised by the wrapped reader is put on the queue instead
+    of the blocks.
+    """
+    cdef AbstractReader reader = prefetch_reader.reader
+    queue = prefetch_reader.queue
+    stop_event = prefetch_reader.stop_event
+    while not stop_event.is_set():
+        try:
+            with prefetch_reader.lock:
+                blocks = reader.get_next_blocks_c(prefetch_reader.blocks_per_read)
+        except Exception as e:
+            blocks = e
+        while not stop_event.is_set():
+            try:
+                queue.put(blocks, timeout=_PUT_TIMEOUT)
+                break
+            except Queue.Full:
+                pass
+        if isinstance(blocks, Exception) or blocks[0].size < 1:
+            return
+
+
+cdef class PrefetchReader(AbstractReader):
+    """
+    Wraps another reader, and reads its next blocks in a background thread while the caller works on the blocks
+    already read, so that reading and decoding the file overlap with, eg., the event search. Up to n_reads reads
+    are kept ahead of the caller, on a bounded queue.
+
+    :py:func:`get_next_blocks` returns the same data as the wrapped reader's. Each read of the thread is as many
+    blocks as the last call asked for, so a caller asking for the same number of blocks every time gets the
+    thread's reads without copies. The other methods are passed on to the wrapped reader.
+
+    The wrapped reader should not be used directly once wrapped, and is closed by :py:func:`close`.
+
+    >>> reader = PrefetchReader(ChimeraReader('test.log'))
+    >>> event_databases = find_events([reader])
+    >>> reader.close()
+    """
+    cdef public AbstractReader reader
+    cdef public long blocks_per_read
+    cdef public object queue
+    cdef public object lock
+    cdef public object stop_event
+    cdef long n_reads
+    cdef object thread
+    cdef object pending
+    cdef object end_blocks
+    cdef object error
+
+    def __init__(self, AbstractReader reader, long n_reads=DEFAULT_PREFETCH_READS, long blocks_per_read=1):
+        """
+        :param AbstractReader reader: The reader to read ahead of the caller.
+        :param int n_reads: Most reads to keep ahead of the caller. Default is :py:data:`DEFAULT_PREFETCH_READS`.
+        :param int blocks_per_read: Number of blocks of the thread's reads until the first call to\
+            :py:func:`get_next_blocks`. Default is 1.
+        :raises: ValueError if n_reads or blocks_per_read is less than 1.
+        """
+        if n_reads < 1:
+            raise ValueError('n_reads must be at least 1, not {0}.'.format(n_reads))
+        if blocks_per_read < 1:
+            raise ValueError('blocks_per_read must be at least 1, not {0}.'.format(blocks_per_read))
+        self.reader = reader
+        self.n_reads = n_reads
+        self.blocks_per_read = blocks_per_read
+        self.lock = threading.Lock()
+        super(PrefetchReader, self).__init__(reader.get_filename(), reader.dtype)
+
+    cpdef _prepare_file(self, filename):
+        """
+        Takes the parameters of the wrapped reader, and starts the thread.
+        """
+        self.block_size = self.reader.get_block_size_c()
+        self.sample_rate = self.reader.get_sample_rate_c()
+        self.points_per_channel_total = self.reader.get_points_per_channel_total_c()
+        self._start_thread()
+
+    cdef void _start_thread(self):
+        """
+        Starts a thread reading ahead from the wrapped reader's position, with an empty queue.
+        """
+        self.queue = Queue.Queue(maxsize=self.n_reads)
+        self.stop_event = threading.Event()
+        self.pending = None
+        self.end_blocks = None
+        self.error = None
+        self.thread = threading.Thread(target=_read_ahead, args=(self,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    cdef void _stop_thread(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    cdef object _take(self):
+        """
+        :returns: The next blocks read by the thread.
+        :raises: The exception raised by the wrapped reader, if it failed.
+        """
+        if self.error is None:
+            blocks = self.queue.get()
+            if not isinstance(blocks, Exception):
+                return blocks
+            self.error = blocks
+        raise self.error
+
+    cdef object get_next_blocks_c(self, long n_blocks=1):
+        cdef long n_points = n_blocks * self.block_size
+        cdef long n_read = 0
+        cdef long size
+        self.blocks_per_read = max(1, n_blocks)
+        pieces = []
+        while n_read < n_points:
+            if self.pending is not None:
+                blocks = self.pending
+                self.pending = None
+            elif self.end_blocks is not None:
+                break
+            else:
+                blocks = self._take()
+                if blocks[0].size < 1:
+                    self.end_blocks = blocks
+                    break
+            size = blocks[0].size
+            if n_read + size > n_points:
+                # Keep the rest for the next call.
+                size = n_points - n_read
+                self.pending = [channel[size:] for channel in blocks]
+                blocks = [channel[:size] for channel in blocks]
+            pieces.append(blocks)
+            n_read += size
+
+        if len(pieces) < 1:
+            return list(self.end_blocks)
+        if len(pieces) == 1:
+            return pieces[0]
+        return [np.concatenate(channel_pieces) for channel_pieces in zip(*pieces)]
+
+    cdef object seek_c(self, long point):
+        """
+        Drops the blocks read ahead, seeks the wrapped reader and starts reading ahead from the point.
+        """
+        self._stop_thread()
+        self.reader.seek_c(point)
+        self._start_thread()
+
+    cdef object read_range_c(self, long start, long stop, channels=None):
+        with self.lock:
+            return self.reader.read_range_c(start, stop, channels)
+
+    cdef object get_all_data_c(self, bool decimate=False):
+        with self.lock:
+            return self.reader.get_all_data_c(decimate)
+
+    cdef object get_code_scaling_c(self):
+        return self.reader.get_code_scaling_c()
+
+    cdef void close_c(self):
+        self._stop_thread()
+        self.reader.close_c()
@@ -54,6 +54,105 @@ class ReaderTests(object):
                                    "Original data: {0}, after gnb call: {1}.".format(orig_data, data3))
             reader.close()
 
+    def test_get_next_blocks_n_blocks(self):
+        """
+        Tests that reading several blocks at a time returns the same data as reading one block at a time.
+        """
+        for filename in self.help_get_all_data_returns_to_beginning():
+            data = []
+            for n_blocks in [1, 3]:
+                reader = self.reader_class(filename)
+                blocks = []
+                while True:
+                    block = reader.get_next_blocks(n_blocks)
+                    if block[0].size < 1:
+                        break
+                    self.assertLessEqual(block[0].size, n_blocks * reader.get_block_size())
+                    blocks.append(block)
+                reader.close()
+                data.append([np.concatenate([block[c] for block in blocks]) for c in xrange(len(blocks[0]))])
+            for one_block, n_blocks in zip(data[0], data[1]):
+                np.testing.assert_array_equal(one_block, n_blocks)
+
+    def test_single_precision(self):
+        """
+        Tests that a reader opened with dtype=np.float32 returns single precision data, equal to the double precision
+        data rounded.
+        """
+        for filename in self.help_get_all_data_returns_to_beginning():
+            reader = self.reader_class(filename)
+            block = reader.get_next_blocks(2)
+            data = reader.get_all_data()
+            reader.close()
+
+            reader = self.reader_class(filename, dtype=np.float32)
+            block_float32 = reader.get_next_blocks(2)
+            data_float32 = reader.get_all_data()
+            reader.close()
+
+            for channel, channel_float32 in zip(data + block, data_float32 + block_float32):
+                self.assertEqual(channel_float32.dtype, np.float32)
+                np.testing.assert_allclose(channel_float32, channel, rtol=1.e-6, atol=1.e-6 * np.abs(channel).max())
+
+    def test_read_range(self):
+        """
+        Tests that read_range returns the same points as get_all_data, and does not move get_next_blocks.
+        """
+        for filename in self.help_get_all_data_returns_to_beginning():
+            reader = self.reader_class(filename)
+            data = reader.get_all_data()
+            n = reader.get_points_per_channel_total()
+            block_size = reader.get_block_size()
+            first_block = reader.get_next_blocks()
+            for start, stop in [(0, 10), (block_size - 3, block_size + 7), (n / 2, n / 2 + 2 * block_size + 1),
+                                (n - 5, n + 10), (-5, 3), (20, 10), (0, n)]:
+                points = reader.read_range(start, stop)
+                self.assertEqual(len(points), len(data))
+                for channel, channel_points in zip(data, points):
+                    np.testing.assert_array_equal(channel_points, channel[max(0, start):max(0, stop)])
+            second_block = reader.get_next_blocks()
+            for channel, channel_block in zip(data, second_block):
+                np.testing.assert_array_equal(channel_block, channel[first_block[0].size:
+                                                                     first_block[0].size + channel_block.size])
+
+            self.assertEqual(len(reader.read_range(0, 10, channels=[0])), 1)
+            self.assertRaises(IndexError, reader.read_range, 0, 10, channels=[len(data)])
+            reader.close()
+
+    def test_seek(self):
+        """
+        Tests that get_next_blocks continues from the point seeked to.
+        """
+        for filename in self.help_get_all_data_returns_to_beginning():
+            reader = self.reader_class(filename)
+            data = reader.get_all_data()
+            n = reader.get_points_per_channel_total()
+            block_size = reader.get_block_size()
+            reader.get_next_blocks()
+            for point in [2 * block_size, 0, block_size, n, n + 10]:
+                reader.seek(point)
+                blocks = reader.get_next_blocks()
+                for channel, channel_block in zip(data, blocks):
+                    np.testing.assert_array_equal(channel_block, channel[min(point, n):min(point, n) + block_size])
+            reader.close()
+
+    def test_code_scaling(self):
+        """
+        Tests that the data of readers with a code scaling is the scaling of 16 bit integer codes.
+        """
+        for filename in self.help_get_all_data_returns_to_beginning():
+            reader = self.reader_class(filename)
+            scaling = reader.get_code_scaling()
+            data = reader.get_all_data()
+            reader.close()
+            if scaling is None:
+                continue
+            for channel in data:
+                codes = (channel - scaling[1]) / scaling[0]
+                np.testing.assert_allclose(codes, np.rint(codes), atol=1.e-6)
+                self.assertGreaterEqual(codes.min(), np.iinfo(np.int16).min)
+                self.assertLessEqual(codes.max(), np.iinfo(np.int16).max)
+
     def help_get_all_data_returns_to_beginning(self):
         """
         If the subclass does **not** set self.default_test_data_files to a list of test files, then
@@ -3,7 +3,9 @@
 """
 import unittest
 
-from pypore.i_o.chimera_reader import ChimeraReader
+import numpy as np
+
+from pypore.i_o.chimera_reader import ChimeraReader, ChimeraData
 from pypore.i_o.tests.reader_tests import ReaderTests
 import pypore.sampledata.testing_files as tf
 
@@ -30,6 +32,44 @@ class TestChimeraReader(unittest.TestCase, ReaderTests):
         self._test_small_chimera_file_help(data)
         chimera_reader.close()
 
+    def test_lazy_get_all_data(self):
+        """
+        Tests that the lazy data of a reader opened with lazy=True decodes the same points as get_all_data.
+        """
+        filename = tf.get_abs_path('spheres_20140114_154938_beginning.log')
+        reader = ChimeraReader(filename)
+        data = reader.get_all_data()[0]
+        reader.close()
+
+        reader = ChimeraReader(filename, lazy=True)
+        lazy_data = reader.get_all_data()[0]
+        reader.close()
+
+        self.assertIsInstance(lazy_data, ChimeraData)
+        self.assertEqual(len(lazy_data), data.size)
+        self.assertEqual(lazy_data.shape, data.shape)
+        np.testing.assert_array_equal(lazy_data[1000:2000], data[1000:2000])
+        np.testing.assert_array_equal(lazy_data[::7], data[::7])
+        self.assertEqual(lazy_data[5], data[5])
+        self.assertEqual(lazy_data[-1], data[-1])
+        np.testing.assert_array_equal(np.asarray(lazy_data), data)
+
+    def test_decimated_blocks(self):
+        """
+        Tests that decimating gives the maximum and minimum of each block, including the last partial block.
+        """
+        filename = tf.get_abs_path('spheres_20140114_154938_beginning.log')
+        reader = ChimeraReader(filename)
+        data = reader.get_all_data()[0]
+        decimated = reader.get_all_data(decimate=True)[0]
+        block_size = reader.get_block_size()
+        reader.close()
+
+        for k in xrange(decimated.size / 2):
+            block = data[k * block_size:(k + 1) * block_size]
+            self.assertEqual(decimated[2 * k], block.max())
+            self.assertEqual(decimated[2 * k + 1], block.min())
+
     def _test_small_chimera_file_help(self, data_all):
         self.assertEqual(len(data_all), 1, 'Too many data channels returned.')
         data = data_all[0]
@@ -2,6 +2,9 @@ import unittest
 import numpy as np
 import os
 import csv
+import json
+import shutil
+import tempfile
 
 from pypore.i_o.cnp2_reader import CNP2Reader
 from pypore.i_o.tests.reader_tests import ReaderTests
@@ -57,5 +60,93 @@ class TestChimeraReader(unittest.TestCase, ReaderTests):
         return [filename]
 
 
+class TestCNP2ReaderColumns(unittest.TestCase):
+    """
+    Tests the unpacking of every column mode, from random raw chunks written to temporary .hex files.
+    """
+    n_chunks = 4001
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(tf.get_abs_path('cnp_test.cfg')) as config_file:
+            self.config = json.load(config_file)
+        np.random.seed(9)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_file(self, column_select, raw, extra_bytes=0):
+        filename = os.path.join(self.directory, 'column{0}.hex'.format(column_select))
+        self.config['columnSelect'] = column_select
+        with open(filename[:-4] + '.cfg', 'w') as config_file:
+            json.dump(self.config, config_file)
+        with open(filename, 'wb') as hex_file:
+            raw.tofile(hex_file)
+            hex_file.write('\xff' * extra_bytes)
+        return filename
+
+    def _random_raw(self, column_select):
+        if column_select < 2:
+            return np.random.randint(0, 2 ** 32, self.n_chunks).astype('<u4')
+        high = np.random.randint(0, 2 ** 32, 2 * self.n_chunks).astype('<u8')
+        low = np.random.randint(0, 2 ** 32, 2 * self.n_chunks).astype('<u8')
+        return (high << 32) | low
+
+    def _unpack_slow(self, column_select, raw):
+        """
+        Unpacks the raw values the way the acquisition software does.
+        """
+        if column_select == 0:
+            return raw & 0xfff
+        if column_select == 1:
+            return (raw & 0xfff000) >> 12
+        msb = np.zeros(raw.size / 2, dtype=raw.dtype)
+        if column_select == 2:
+            compressed = raw[0::2] & 0xfffffffff
+        elif column_select == 3:
+            compressed = (raw[0::2] & 0xfffffff000000000) >> 36
+            msb = raw[1::2] & 0xff
+        else:
+            compressed = (raw[1::2] & 0x00000fffffffff00) >> 8
+        adc_data = np.zeros(3 * compressed.size, dtype=raw.dtype)
+        adc_data[0::3] = compressed & 0xfff
+        adc_data[1::3] = (compressed & 0xfff000) >> 12
+        adc_data[2::3] = ((compressed & 0xfff000000) >> 24) + msb * 16
+        return adc_data
+
+    def _scale(self, adc_data):
+        data = adc_data.astype(np.float64)
+        data[data >= 2 ** 11] -= 2 ** 12
+        data /= (2 ** 11 * self.config['RDCFB'] * (51 + 620) / 620.0 * 1.8 * .51)
+        data -= self.config['IDCOffset']
+        return data * 1.e9
+
+    def test_column_modes(self):
+        for column_select in xrange(5):
+            raw = self._random_raw(column_select)
+            should_be = self._scale(self._unpack_slow(column_select, raw))
+            # A partial chunk at the end of the file is ignored.
+            reader = CNP2Reader(self._write_file(column_select, raw, extra_bytes=3))
+
+            self.assertEqual(reader.get_points_per_channel_total(), should_be.size)
+            np.testing.assert_allclose(reader.get_all_data()[0], should_be, rtol=1.e-12)
+
+            blocks = []
+            while True:
+                block = reader.get_next_blocks()[0]
+                if block.size < 1:
+                    break
+                blocks.append(block)
+            np.testing.assert_allclose(np.concatenate(blocks), should_be, rtol=1.e-12)
+
+            for start, stop in [(1, 2), (4, 11), (5999, 6004), (should_be.size - 2, should_be.size)]:
+                np.testing.assert_allclose(reader.read_range(start, stop)[0], should_be[start:stop], rtol=1.e-12)
+            reader.close()
+
+    def test_unknown_column_mode(self):
+        filename = self._write_file(5, self._random_raw(0))
+        self.assertRaises(ValueError, CNP2Reader, filename)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,4 @@
+import os
 import unittest
 
 from pypore.i_o.heka_reader import HekaReader
@@ -16,6 +17,22 @@ class TestHekaReader(unittest.TestCase, ReaderTests):
         std_dev = 2.76e-12
         return [filename], [mean], [std_dev]
 
+    def test_block_dtype(self):
+        """
+        Tests that the block dtype holds the block size of samples of each channel.
+        """
+        filename = tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd')
+        reader = HekaReader(filename)
+        block_dtype = reader.get_block_dtype()
+        n_channels = len(reader.get_all_data())
+        self.assertEqual(block_dtype['data'].shape, (n_channels, reader.get_block_size()))
+        self.assertEqual(reader.get_points_per_channel_total() % reader.get_block_size(), 0)
+        # The blocks take the end of the file, after the file header.
+        n_blocks = reader.get_points_per_channel_total() / reader.get_block_size()
+        self.assertGreater(os.path.getsize(filename), n_blocks * block_dtype.itemsize)
+        self.assertEqual(reader.get_all_voltages()[0].size, reader.get_points_per_channel_total())
+        reader.close()
+
     @unittest.skip("Test file is too short for decimated and un-decimated means to be equal enough.")
     def test_scaling_decimated(self):
         super(TestHekaReader, self).test_scaling_decimated()
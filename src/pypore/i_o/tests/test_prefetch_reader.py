@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from pypore.i_o import get_reader_from_filename
+from pypore.i_o.chimera_reader import ChimeraReader
+from pypore.i_o.prefetch_reader import PrefetchReader
+from pypore.i_o.tests.reader_tests import ReaderTests
+import pypore.sampledata.testing_files as tf
+
+
+def _open_prefetch_reader(filename, dtype=np.float64):
+    return get_reader_from_filename(filename, dtype=dtype, prefetch=2)
+
+
+class TestPrefetchReader(unittest.TestCase, ReaderTests):
+    reader_class = staticmethod(_open_prefetch_reader)
+
+    default_test_data_files = [tf.get_abs_path('chimera_small.log'),
+                               tf.get_abs_path('heka_1.5s_mean5.32p_std2.76p.hkd'),
+                               tf.get_abs_path('cnp_test.hex')]
+
+    def help_scaling(self):
+        means = []
+        std_devs = []
+        for filename in self.default_test_data_files:
+            reader = get_reader_from_filename(filename)
+            data = reader.get_all_data()[0]
+            reader.close()
+            means.append(np.mean(data))
+            std_devs.append(np.std(data))
+        return self.default_test_data_files, means, std_devs
+
+    def help_scaling_decimated(self):
+        # The Heka test file is too short for the decimated mean test, see test_heka_reader.
+        return [tf.get_abs_path('chimera_small.log'), tf.get_abs_path('cnp_test.hex')]
+
+    def test_same_blocks_as_wrapped_reader(self):
+        """
+        Tests that the blocks are the same as the wrapped reader's, whatever number of blocks is asked for.
+        """
+        filename = tf.get_abs_path('spheres_20140114_154938_beginning.log')
+        reader = ChimeraReader(filename)
+        data = reader.get_all_data()[0]
+        reader.close()
+
+        for n_reads, blocks_per_read in [(1, 1), (2, 3), (5, 2)]:
+            reader = PrefetchReader(ChimeraReader(filename), n_reads=n_reads, blocks_per_read=blocks_per_read)
+            self.assertEqual(reader.get_points_per_channel_total(), data.size)
+            n_read = 0
+            for n_blocks in [1, 4, 2, 2, 7, 1, 3]:
+                block = reader.get_next_blocks(n_blocks)[0]
+                self.assertEqual(block.size, min(n_blocks * reader.get_block_size(), data.size - n_read))
+                np.testing.assert_array_equal(block, data[n_read:n_read + block.size])
+                n_read += block.size
+            reader.close()
+
+    def test_reader_error(self):
+        """
+        Tests that an exception raised by the wrapped reader in the thread is raised by get_next_blocks.
+        """
+        reader = ChimeraReader(tf.get_abs_path('chimera_small.log'))
+        reader.close()
+        reader = PrefetchReader(reader)
+        self.assertRaises(TypeError, reader.get_next_blocks)
+        self.assertRaises(TypeError, reader.get_next_blocks)
+        reader.close()
+
+    def test_bad_parameters(self):
+        for kwargs in [{'n_reads': 0}, {'blocks_per_read': 0}]:
+            reader = ChimeraReader(tf.get_abs_path('chimera_small.log'))
+            self.assertRaises(ValueError, PrefetchReader, reader, **kwargs)
+            reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
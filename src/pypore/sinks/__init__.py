@@ -0,0 +1,3 @@
+"""
+Sinks that :py:func:`pypore.event_finder.find_events` can save the events it finds to.
+"""
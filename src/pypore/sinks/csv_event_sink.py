@@ -0,0 +1,81 @@
+import csv
+import os
+
+from pypore.sinks.event_sink import EventSink
+
+
+class CSVEventSink(EventSink):
+    """
+    Streams the events to a CSV file, one row per event, as they are found.
+
+    The columns are channel, event_start, event_length, n_levels, baseline, current_blockage and area, followed by
+    levels and level_lengths, which hold the event's levels separated by spaces. The raw data is left out, unless
+    include_raw_data is True, in which case it is added as a last column in the same format.
+
+    Debug data is not saved. If no events are found, the file is deleted. Supports resuming a stopped search, see
+    :py:func:`checkpoint`.
+    """
+
+    SCALAR_COLUMNS = ['channel', 'event_start', 'event_length', 'n_levels', 'baseline', 'current_blockage', 'area']
+
+    def __init__(self, save_file_name, include_raw_data=False):
+        """
+        :param save_file_name: File name of the CSV file to save.
+        :param bool include_raw_data: If True, the raw data of each event is saved as well.
+        """
+        super(CSVEventSink, self).__init__()
+        self.save_file_name = save_file_name
+        self.include_raw_data = include_raw_data
+        self.file = None
+        self.writer = None
+
+    def open(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug=False):
+        super(CSVEventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        self.file = open(self.save_file_name, 'wb')
+        self.writer = csv.writer(self.file)
+        header = self.SCALAR_COLUMNS + ['levels', 'level_lengths']
+        if self.include_raw_data:
+            header.append('raw_data')
+        self.writer.writerow(header)
+
+    def write_events(self, batch):
+        for event in batch:
+            row = [getattr(event, name) for name in self.SCALAR_COLUMNS]
+            row.append(' '.join(repr(float(level)) for level in event.levels))
+            row.append(' '.join(str(int(length)) for length in event.level_lengths))
+            if self.include_raw_data:
+                row.append(' '.join(repr(float(point)) for point in event.raw_data))
+            self.writer.writerow(row)
+        self.file.flush()
+        self.event_count += len(batch)
+
+    def checkpoint(self):
+        """
+        Flushes the CSV file to disk.
+
+        :returns: The number of events, and the length of the file.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'event_count': self.event_count, 'offset': self.file.tell()}
+
+    def resume(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug, state):
+        """
+        Reopens the CSV file, and truncates it to its length at the checkpoint.
+        """
+        super(CSVEventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        self.file = open(self.save_file_name, 'r+b')
+        self.file.truncate(state['offset'])
+        self.file.seek(state['offset'])
+        self.writer = csv.writer(self.file)
+        self.event_count = state['event_count']
+
+    def close(self):
+        """
+        :returns: The file name of the CSV file, or None if it was deleted because no events were found.
+        """
+        self.file.close()
+        if self.event_count == 0:
+            os.remove(self.save_file_name)
+            return None
+        return self.save_file_name
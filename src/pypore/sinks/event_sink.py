@@ -0,0 +1,106 @@
+class EventSink(object):
+    """
+    This is an abstract class defining where :py:func:`pypore.event_finder.find_events` saves the events it finds.
+
+    Example implementations--
+
+    * :py:class:`pypore.sinks.hdf5_event_sink.HDF5EventSink` -- saves the events to an\
+        :py:class:`pypore.filetypes.event_database.EventDatabase`.
+    * :py:class:`pypore.sinks.memory_event_sink.MemoryEventSink` -- keeps the events in memory.
+    * :py:class:`pypore.sinks.npz_event_sink.NPZEventSink` -- saves the events column by column to a numpy .npz\
+        file.
+    * :py:class:`pypore.sinks.csv_event_sink.CSVEventSink` -- streams the events to a CSV file.
+
+    When a :py:class:`EventSink` is passed to :py:func:`pypore.event_finder.find_events`, it calls
+    :py:func:`open` once, then :py:func:`write_events` with batches of events as they are found, then
+    :py:func:`write_debug` if debugging, and finally :py:func:`close`. Subclasses must override
+    :py:func:`write_events`.
+
+    Sinks that save to a file can also support resuming a search that was stopped, by overriding
+    :py:func:`checkpoint` and :py:func:`resume`.
+    """
+
+    def __init__(self):
+        self.event_count = 0
+
+    def open(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug=False):
+        """
+        Called once, after the first block of data is read and before any events are written.
+
+        :param reader: The :py:class:`pypore.i_o.abstract_reader.AbstractReader` being searched.
+        :param parameters: The :py:class:`pypore.event_finder.Parameters` used for event finding.
+        :param int n_channels: Number of channels in the data.
+        :param int max_points: Maximum number of raw data points in an event, including the raw points on each side.
+        :param int raw_points_per_side: Number of extra points on each side of an event's raw_data.
+        :param bool debug: True if :py:func:`write_debug` will be called. The debug data has n_debug_points per\
+            channel, which is fewer than the points in the data if parameters.debug_decimation > 1.
+        """
+        self.sample_rate = reader.get_sample_rate()
+        self.filename = reader.get_filename()
+        self.n_points = reader.get_points_per_channel_total()
+        self.n_channels = n_channels
+        self.max_points = max_points
+        self.raw_points_per_side = raw_points_per_side
+        self.debug = debug
+        self.debug_decimation = max(1, parameters.debug_decimation)
+        self.n_debug_points = self.n_points
+        if self.debug_decimation > 1:
+            # A (minimum, maximum) pair for each group of debug_decimation points
+            self.n_debug_points = 2 * ((self.n_points + self.debug_decimation - 1) // self.debug_decimation)
+
+    def write_events(self, batch):
+        """
+        Saves a batch of events. Subclasses must override this, and add len(batch) to :py:attr:`event_count`.
+
+        :param batch: List of :py:class:`pypore.event_finder.Event`, in the order they were found.
+        """
+        raise NotImplementedError
+
+    def write_debug(self, debug_matrices, start=0):
+        """
+        Saves the debug data for the points [start, start + n) of every channel. Does nothing by default. Called
+        with consecutive stretches of the debug data, in order.
+
+        :param debug_matrices: List of 2D numpy arrays of shape (n_channels, n), holding the data, baseline,\
+            positive threshold and negative threshold at every point. If decimated, each pair of points is the\
+            minimum and maximum of debug_decimation points.
+        :param int start: Index of the first point in debug_matrices, out of n_debug_points.
+        """
+        pass
+
+    def write_profile(self, profile):
+        """
+        Called before :py:func:`close` when profiling, see find_events(profile=True). Does nothing by default.
+
+        :param profile: The :py:class:`pypore.event_finder.Profile` of the search.
+        """
+        pass
+
+    def checkpoint(self):
+        """
+        Makes everything written so far durable, so the search can be resumed from here if it is stopped.
+
+        :returns: A picklable state to pass to :py:func:`resume`, or None if the sink cannot resume, which is the\
+            default.
+        """
+        return None
+
+    def resume(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug, state):
+        """
+        Called instead of :py:func:`open` when resuming a search. Reopens the sink as it was when state was\
+        returned by :py:func:`checkpoint`, dropping anything written after that.
+
+        :param state: The state returned by :py:func:`checkpoint`.
+
+        See :py:func:`open` for the other parameters.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Called once there are no more events.
+
+        :returns: The result of the search, which is returned by :py:func:`pypore.event_finder.find_events`.\
+            None if there is no result to return.
+        """
+        return None
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+
+import pypore.filetypes.event_database as ed
+from pypore.sinks.event_sink import EventSink
+
+
+class HDF5EventSink(EventSink):
+    """
+    Saves the events to an :py:class:`pypore.filetypes.event_database.EventDatabase`. This is the default sink of
+    :py:func:`pypore.event_finder.find_events`.
+
+    If no events are found, and not debugging, the database is deleted.
+
+    With ragged=True, the database stores each event's raw data and levels back to back without padding, which is
+    much smaller when most events are shorter than the maximum event length.
+
+    With raw_codes=True, the database stores the raw data as the reader's 16 bit integer ADC codes, with the
+    reader's scale and offset, see :py:func:`pypore.i_o.abstract_reader.AbstractReader.get_code_scaling`. This
+    takes a quarter of the space of double precision values before compression, and compresses much better.
+
+    Supports resuming a stopped search, see :py:func:`checkpoint`. If profiling, the profile is saved as attributes
+    of the event table, see :py:func:`write_profile`.
+    """
+
+    def __init__(self, save_file_name=None, h5file=None, ragged=False, raw_codes=False):
+        """
+        :param save_file_name: File name of the EventDatabase to create. Can be omitted if h5file is passed.
+        :param h5file: (Optional) An already opened :py:class:`pypore.filetypes.event_database.EventDatabase` to\
+            save the events to.
+        :param bool ragged: If True, a new EventDatabase is created with the ragged layout. An already opened\
+            h5file keeps its own layout.
+        :param bool raw_codes: If True, a new EventDatabase stores the raw data as ADC codes. The reader searched\
+            must decode its data from integer codes. An already opened h5file keeps its own raw data type.
+        """
+        super(HDF5EventSink, self).__init__()
+        if save_file_name is None and h5file is None:
+            raise ValueError('Either save_file_name or h5file must be passed.')
+        self.save_file_name = save_file_name
+        self.h5file = h5file
+        self.ragged = ragged
+        self.raw_codes = raw_codes
+
+    def open(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug=False):
+        super(HDF5EventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        if self.h5file is None:
+            raw_scaling = None
+            if self.raw_codes:
+                raw_scaling = reader.get_code_scaling()
+                if raw_scaling is None:
+                    raise ValueError('Cannot save ADC codes, the data of {0} is not decoded from integer '
+                                     'codes.'.format(reader.get_filename()))
+            self.h5file = ed.open_file(self.save_file_name, maxEventLength=max_points, mode='w', debug=debug,
+                                       n_points=self.n_debug_points, n_channels=n_channels,
+                                       threshold_positive=parameters.detect_positive_events,
+                                       threshold_negative=parameters.detect_negative_events,
+                                       ragged=self.ragged, dtype=parameters.dtype, raw_scaling=raw_scaling)
+        elif self.save_file_name is None:
+            self.save_file_name = self.h5file.filename
+        if debug:
+            self.h5file.root.debug._v_attrs.debug_decimation = self.debug_decimation
+        self._init_layout()
+
+    def _init_layout(self):
+        self.ragged = self.h5file.is_ragged()
+        if not self.ragged:
+            # The raw data matrix might be wider than max_points, if the h5file was already opened.
+            self.row_length = self.h5file.root.events.raw_data.shape[1]
+
+    def write_events(self, batch):
+        n_events = len(batch)
+        if n_events == 0:
+            return
+        if self.ragged:
+            self._write_ragged_events(batch)
+            return
+        raw_data = np.zeros((n_events, self.row_length), dtype=self.h5file.root.events.raw_data.dtype)
+        levels = np.zeros((n_events, self.row_length), dtype=self.h5file.root.events.levels.dtype)
+        level_lengths = np.zeros((n_events, self.row_length), dtype=np.uint32)
+        for k, event in enumerate(batch):
+            self.h5file.append_event(self.event_count + k, event.event_start, event.event_length, event.n_levels,
+                                     self.raw_points_per_side, event.baseline, event.current_blockage, event.area,
+                                     channel=event.channel)
+            raw_data[k, :event.raw_data.size] = self.h5file.encode_raw_data(event.raw_data)
+            levels[k, :event.n_levels] = event.levels
+            level_lengths[k, :event.n_levels] = event.level_lengths
+        self.h5file.append_raw_data(raw_data)
+        self.h5file.append_levels(levels)
+        self.h5file.append_level_lengths(level_lengths)
+        self.h5file.get_event_table().flush()
+        self.event_count += n_events
+
+    def _write_ragged_events(self, batch):
+        raw_data_offset = self.h5file.root.events.raw_data.nrows
+        level_offset = self.h5file.root.events.levels.nrows
+        for k, event in enumerate(batch):
+            self.h5file.append_event(self.event_count + k, event.event_start, event.event_length, event.n_levels,
+                                     self.raw_points_per_side, event.baseline, event.current_blockage, event.area,
+                                     channel=event.channel, raw_data_offset=raw_data_offset,
+                                     level_offset=level_offset)
+            raw_data_offset += event.raw_data.size
+            level_offset += event.n_levels
+        self.h5file.append_raw_data(self.h5file.encode_raw_data(np.concatenate([event.raw_data for event in batch])))
+        self.h5file.append_levels(np.concatenate([event.levels[:event.n_levels] for event in batch])
+                                  .astype(self.h5file.root.events.levels.dtype))
+        self.h5file.append_level_lengths(np.concatenate([event.level_lengths[:event.n_levels] for event in batch])
+                                         .astype(np.int32))
+        self.h5file.get_event_table().flush()
+        self.event_count += len(batch)
+
+    def write_profile(self, profile):
+        """
+        Saves each field of the :py:class:`pypore.event_finder.Profile` as an attribute of the event table, named
+        'profile_' + the field name.
+        """
+        attrs = self.h5file.get_event_table().attrs
+        for name, value in profile.as_dict().iteritems():
+            attrs['profile_' + name] = value
+
+    def checkpoint(self):
+        """
+        Flushes the EventDatabase to disk.
+
+        :returns: The number of events, and of rows in the event table and arrays.
+        """
+        events = self.h5file.root.events
+        events.eventTable.flush()
+        self.h5file.flush()
+        return {'event_count': self.event_count, 'table_rows': events.eventTable.nrows,
+                'raw_data_rows': events.raw_data.nrows, 'levels_rows': events.levels.nrows,
+                'level_lengths_rows': events.level_lengths.nrows}
+
+    def resume(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug, state):
+        """
+        Reopens the EventDatabase, and truncates the event table and arrays to their lengths at the checkpoint.
+        """
+        super(HDF5EventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        if self.h5file is None:
+            self.h5file = ed.open_file(self.save_file_name, mode='a')
+        elif self.save_file_name is None:
+            self.save_file_name = self.h5file.filename
+        events = self.h5file.root.events
+        events.eventTable.truncate(state['table_rows'])
+        events.raw_data.truncate(state['raw_data_rows'])
+        events.levels.truncate(state['levels_rows'])
+        events.level_lengths.truncate(state['level_lengths_rows'])
+        self.event_count = state['event_count']
+        self._init_layout()
+
+    def write_debug(self, debug_matrices, start=0):
+        end = start + debug_matrices[0].shape[1]
+        for name, matrix in zip(['data', 'baseline', 'threshold_positive', 'threshold_negative'], debug_matrices):
+            self.h5file.get_node(self.h5file.root.debug, name)[:, start:end] = matrix
+
+    def close(self):
+        """
+        :returns: The file name of the EventDatabase, or None if it was deleted because no events were found.
+        """
+        if self.event_count > 0 or self.debug:
+            # Save the file
+            # add attributes
+            self.h5file.root.events.eventTable.flush()  # if you don't flush before adding attributes,
+            # PyTables might print a warning
+            self.h5file.root.events.eventTable.attrs.sample_rate = self.sample_rate
+            self.h5file.root.events.eventTable.attrs.eventCount = self.event_count
+            self.h5file.root.events.eventTable.attrs.dataFilename = self.filename
+            self.h5file.flush()
+            self.h5file.close()
+            return self.save_file_name
+        else:
+            # if no events, just delete the file, if we're not debugging.
+            self.h5file.flush()
+            self.h5file.close()
+            os.remove(self.save_file_name)
+        return None
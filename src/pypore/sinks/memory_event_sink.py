@@ -0,0 +1,46 @@
+import numpy as np
+
+from pypore.sinks.event_sink import EventSink
+
+
+class MemoryEventSink(EventSink):
+    """
+    Keeps the events in memory, in :py:attr:`events`. Useful for tests, and for pipelines that work on the events
+    straight away.
+
+    If debugging, the debug data is kept in :py:attr:`debug_matrices`, and if profiling, the
+    :py:class:`pypore.event_finder.Profile` in :py:attr:`profile`.
+
+    >>> sink = MemoryEventSink()
+    >>> find_events(['testDataFiles/chimera_1event.log'], sinks=[sink])
+    >>> sink.events[0].current_blockage
+    """
+
+    def __init__(self):
+        super(MemoryEventSink, self).__init__()
+        self.events = []
+        self.debug_matrices = None
+        self.profile = None
+
+    def open(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug=False):
+        super(MemoryEventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        if debug:
+            self.debug_matrices = [np.zeros((n_channels, self.n_debug_points)) for _ in xrange(4)]
+
+    def write_events(self, batch):
+        self.events.extend(batch)
+        self.event_count += len(batch)
+
+    def write_debug(self, debug_matrices, start=0):
+        end = start + debug_matrices[0].shape[1]
+        for matrix, debug_matrix in zip(self.debug_matrices, debug_matrices):
+            matrix[:, start:end] = debug_matrix
+
+    def write_profile(self, profile):
+        self.profile = profile
+
+    def close(self):
+        """
+        :returns: This sink.
+        """
+        return self
@@ -0,0 +1,91 @@
+import numpy as np
+
+from pypore.sinks.event_sink import EventSink
+
+
+class NPZEventSink(EventSink):
+    """
+    Saves the events column by column to a numpy .npz file, which can be loaded with :py:func:`numpy.load`.
+
+    The file has one array for each of the scalar fields of :py:class:`pypore.event_finder.Event`: channel,
+    event_start, event_length, n_levels, baseline, current_blockage and area. The raw data, levels and level
+    lengths of the events are concatenated into the arrays raw_data, levels and level_lengths, without any padding.
+    Event i's raw data is raw_data[raw_data_offsets[i]:raw_data_offsets[i + 1]], and its levels and level lengths
+    are levels[level_offsets[i]:level_offsets[i + 1]].
+
+    The arrays sample_rate and raw_points_per_side hold those values, and if debugging, the debug data is saved in
+    debug_data, debug_baseline, debug_threshold_positive and debug_threshold_negative, with the decimation factor in
+    debug_decimation.
+
+    The events are kept in memory, in compact arrays, until :py:func:`close` saves the file. If no events are
+    found, and not debugging, no file is saved.
+    """
+
+    SCALAR_COLUMNS = [('channel', np.uint32), ('event_start', np.uint64), ('event_length', np.uint32),
+                      ('n_levels', np.uint32), ('baseline', np.float), ('current_blockage', np.float),
+                      ('area', np.float)]
+
+    def __init__(self, save_file_name):
+        """
+        :param save_file_name: File name of the .npz file to save. The .npz extension is added if it is missing.
+        """
+        super(NPZEventSink, self).__init__()
+        if not save_file_name.endswith('.npz'):
+            save_file_name += '.npz'
+        self.save_file_name = save_file_name
+        self.columns = dict((name, []) for name, _ in self.SCALAR_COLUMNS)
+        self.raw_data = []
+        self.levels = []
+        self.level_lengths = []
+        self.debug_matrices = None
+
+    def open(self, reader, parameters, n_channels, max_points, raw_points_per_side, debug=False):
+        super(NPZEventSink, self).open(reader, parameters, n_channels, max_points, raw_points_per_side, debug)
+        if debug:
+            self.debug_matrices = [np.zeros((n_channels, self.n_debug_points)) for _ in xrange(4)]
+
+    def write_events(self, batch):
+        if len(batch) == 0:
+            return
+        for name, dtype in self.SCALAR_COLUMNS:
+            self.columns[name].append(np.array([getattr(event, name) for event in batch], dtype=dtype))
+        self.raw_data.append(np.concatenate([event.raw_data for event in batch]))
+        self.levels.append(np.concatenate([event.levels for event in batch]))
+        self.level_lengths.append(np.concatenate([event.level_lengths for event in batch]).astype(np.uint32))
+        self.event_count += len(batch)
+
+    def write_debug(self, debug_matrices, start=0):
+        end = start + debug_matrices[0].shape[1]
+        for matrix, debug_matrix in zip(self.debug_matrices, debug_matrices):
+            matrix[:, start:end] = debug_matrix
+
+    def _concatenate(self, arrays, dtype):
+        if len(arrays) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(arrays)
+
+    def close(self):
+        """
+        :returns: The file name of the .npz file, or None if no file was saved.
+        """
+        if self.event_count == 0 and not self.debug:
+            return None
+
+        arrays = {}
+        for name, dtype in self.SCALAR_COLUMNS:
+            arrays[name] = self._concatenate(self.columns[name], dtype)
+        arrays['raw_data'] = self._concatenate(self.raw_data, np.float)
+        arrays['levels'] = self._concatenate(self.levels, np.float)
+        arrays['level_lengths'] = self._concatenate(self.level_lengths, np.uint32)
+        arrays['raw_data_offsets'] = np.concatenate(([0], np.cumsum(arrays['event_length'] +
+                                                                    2 * self.raw_points_per_side))).astype(np.uint64)
+        arrays['level_offsets'] = np.concatenate(([0], np.cumsum(arrays['n_levels']))).astype(np.uint64)
+        arrays['sample_rate'] = np.array(self.sample_rate)
+        arrays['raw_points_per_side'] = np.array(self.raw_points_per_side)
+        if self.debug:
+            for name, matrix in zip(['data', 'baseline', 'threshold_positive', 'threshold_negative'],
+                                    self.debug_matrices):
+                arrays['debug_' + name] = matrix
+            arrays['debug_decimation'] = np.array(self.debug_decimation)
+        np.savez(self.save_file_name, **arrays)
+        return self.save_file_name
@@ -0,0 +1,257 @@
+import csv
+import os
+import unittest
+
+import numpy as np
+
+from pypore.event_finder import find_events, Parameters, _SegmentReader
+import pypore.filetypes.event_database as ed
+from pypore.sinks.csv_event_sink import CSVEventSink
+from pypore.sinks.event_sink import EventSink
+from pypore.sinks.hdf5_event_sink import HDF5EventSink
+from pypore.sinks.memory_event_sink import MemoryEventSink
+from pypore.sinks.npz_event_sink import NPZEventSink
+from pypore.strategies.absolute_change_threshold_strategy import AbsoluteChangeThresholdStrategy
+import pypore.sampledata.testing_files as tf
+from pypore.tests.util import _test_file_manager
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+DATA_FILES = [tf.get_abs_path('chimera_1event_2levels.log'), tf.get_abs_path('chimera_nonoise_2events_1levels.log')]
+
+
+def _find_memory_events(data_file, **kwargs):
+    sink = MemoryEventSink()
+    result = find_events([data_file], sinks=[sink], **kwargs)
+    return result[0].events
+
+
+class TestEventSink(unittest.TestCase):
+    def test_write_events_not_implemented(self):
+        self.assertRaises(NotImplementedError, EventSink().write_events, [])
+
+
+class TestMemoryEventSink(unittest.TestCase):
+    @_test_file_manager(DIRECTORY)
+    def test_same_as_event_database(self, filename):
+        """
+        Tests that the events kept in memory are the same as the events saved to an EventDatabase.
+        """
+        for data_file in DATA_FILES:
+            events = _find_memory_events(data_file)
+            find_events([data_file], save_file_names=[filename])
+
+            h5file = ed.open_file(filename, mode='r')
+            self.assertEqual(len(events), h5file.get_event_count())
+            for i, event in enumerate(events):
+                row = h5file.get_event_row(i)
+                for name in ['channel', 'event_start', 'event_length', 'n_levels']:
+                    self.assertEqual(getattr(event, name), row[name])
+                for name in ['baseline', 'current_blockage', 'area']:
+                    self.assertAlmostEqual(getattr(event, name), row[name])
+                np.testing.assert_array_equal(event.raw_data, h5file.get_raw_data_at(i))
+                np.testing.assert_array_almost_equal(event.levels, h5file.get_levels_at(i))
+                np.testing.assert_array_equal(event.level_lengths, h5file.get_level_lengths_at(i))
+            h5file.close()
+            os.remove(filename)
+
+    def test_debug(self):
+        sink = MemoryEventSink()
+        find_events([DATA_FILES[1]], sinks=[sink], debug=True)
+
+        self.assertEqual(len(sink.debug_matrices), 4)
+        self.assertEqual(sink.debug_matrices[0].shape, (1, sink.n_points))
+        self.assertTrue(np.any(sink.debug_matrices[0] != 0))
+
+    def test_segment_workers(self):
+        """
+        Tests that the events of a file searched in segments are written to the sink.
+        """
+        parameters = Parameters(max_event_length=500.)
+        one_pass = _find_memory_events(DATA_FILES[0], parameters=parameters)
+        segments = _find_memory_events(DATA_FILES[0], parameters=parameters, segment_workers=2,
+                                       segment_length=2500, segment_overlap=1000)
+
+        self.assertEqual(len(one_pass), len(segments))
+        for event_one_pass, event_segments in zip(one_pass, segments):
+            self.assertEqual(event_one_pass.event_start, event_segments.event_start)
+            np.testing.assert_array_equal(event_one_pass.raw_data, event_segments.raw_data)
+
+    def test_n_workers(self):
+        """
+        Tests that the sinks are returned from the worker processes with their events.
+        """
+        sinks = [MemoryEventSink() for _ in DATA_FILES]
+        results = find_events(DATA_FILES, sinks=sinks, n_workers=2)
+
+        self.assertEqual(len(results), len(DATA_FILES))
+        for data_file, result in zip(DATA_FILES, results):
+            self.assertEqual([event.event_start for event in result.events],
+                             [event.event_start for event in _find_memory_events(data_file)])
+
+
+class TestHDF5EventSink(unittest.TestCase):
+    @_test_file_manager(DIRECTORY)
+    def test_same_as_default(self, filename):
+        """
+        Tests that passing an HDF5EventSink gives the same EventDatabase as the default.
+        """
+        events = _find_memory_events(DATA_FILES[0])
+        result = find_events([DATA_FILES[0]], sinks=[HDF5EventSink(filename)])
+
+        self.assertEqual(result, [filename])
+        h5file = ed.open_file(filename, mode='r')
+        self.assertEqual(h5file.get_event_count(), len(events))
+        self.assertEqual(h5file.root.events.eventTable.attrs.eventCount, len(events))
+        for i, event in enumerate(events):
+            np.testing.assert_array_equal(h5file.get_raw_data_at(i), event.raw_data)
+        h5file.close()
+
+    def test_ragged(self):
+        """
+        Tests that a ragged EventDatabase holds the same events as the default one, in a smaller file.
+        """
+        filename = os.path.join(DIRECTORY, 'TestHDF5EventSink_test_ragged.h5')
+        ragged_filename = os.path.join(DIRECTORY, 'TestHDF5EventSink_test_ragged_ragged.h5')
+        # Long max event length, so most of the default rows are padding.
+        parameters = Parameters(max_event_length=5000.)
+        find_events([DATA_FILES[0]], parameters=parameters, save_file_names=[filename])
+        find_events([DATA_FILES[0]], parameters=parameters, sinks=[HDF5EventSink(ragged_filename, ragged=True)])
+
+        h5file = ed.open_file(filename, mode='r')
+        ragged = ed.open_file(ragged_filename, mode='r')
+        self.assertFalse(h5file.is_ragged())
+        self.assertTrue(ragged.is_ragged())
+        self.assertEqual(ragged.get_event_count(), h5file.get_event_count())
+        for i in xrange(h5file.get_event_count()):
+            self.assertEqual(ragged.get_event_row(i)['event_start'], h5file.get_event_row(i)['event_start'])
+            np.testing.assert_array_equal(ragged.get_event_data_at(i), h5file.get_event_data_at(i))
+            np.testing.assert_array_equal(ragged.get_levels_at(i), h5file.get_levels_at(i))
+            np.testing.assert_array_equal(ragged.get_level_lengths_at(i), h5file.get_level_lengths_at(i))
+        h5file.close()
+        ragged.close()
+
+        self.assertLess(os.path.getsize(ragged_filename), os.path.getsize(filename))
+        os.remove(filename)
+        os.remove(ragged_filename)
+
+    def test_no_file_name(self):
+        self.assertRaises(ValueError, HDF5EventSink)
+
+
+class TestNPZEventSink(unittest.TestCase):
+    def test_columns(self):
+        """
+        Tests that the columns and the concatenated arrays in the .npz file hold the events.
+        """
+        filename = os.path.join(DIRECTORY, 'TestNPZEventSink_test_columns.npz')
+        for data_file in DATA_FILES:
+            events = _find_memory_events(data_file)
+            result = find_events([data_file], sinks=[NPZEventSink(filename)])
+
+            self.assertEqual(result, [filename])
+            npz = np.load(filename)
+            for name in ['channel', 'event_start', 'event_length', 'n_levels']:
+                np.testing.assert_array_equal(npz[name], [getattr(event, name) for event in events])
+            for name in ['baseline', 'current_blockage', 'area']:
+                np.testing.assert_array_almost_equal(npz[name], [getattr(event, name) for event in events])
+            raw_data_offsets = npz['raw_data_offsets']
+            level_offsets = npz['level_offsets']
+            for i, event in enumerate(events):
+                np.testing.assert_array_equal(npz['raw_data'][raw_data_offsets[i]:raw_data_offsets[i + 1]],
+                                              event.raw_data)
+                np.testing.assert_array_almost_equal(npz['levels'][level_offsets[i]:level_offsets[i + 1]],
+                                                     event.levels)
+                np.testing.assert_array_equal(npz['level_lengths'][level_offsets[i]:level_offsets[i + 1]],
+                                              event.level_lengths)
+            npz.close()
+            os.remove(filename)
+
+    def test_adds_extension(self):
+        sink = NPZEventSink(os.path.join(DIRECTORY, 'test_adds_extension'))
+        self.assertEqual(sink.save_file_name, os.path.join(DIRECTORY, 'test_adds_extension.npz'))
+
+
+class TestCSVEventSink(unittest.TestCase):
+    def _read_rows(self, filename):
+        with open(filename, 'rb') as f:
+            rows = list(csv.reader(f))
+        os.remove(filename)
+        return rows
+
+    def test_rows(self):
+        """
+        Tests that there is a row for each event in the CSV file.
+        """
+        filename = os.path.join(DIRECTORY, 'TestCSVEventSink_test_rows.csv')
+        events = _find_memory_events(DATA_FILES[0])
+        result = find_events([DATA_FILES[0]], sinks=[CSVEventSink(filename)])
+
+        self.assertEqual(result, [filename])
+        rows = self._read_rows(filename)
+        self.assertEqual(rows[0], CSVEventSink.SCALAR_COLUMNS + ['levels', 'level_lengths'])
+        self.assertEqual(len(rows), len(events) + 1)
+        for row, event in zip(rows[1:], events):
+            self.assertEqual(int(row[1]), event.event_start)
+            self.assertEqual(int(row[2]), event.event_length)
+            self.assertAlmostEqual(float(row[5]), event.current_blockage)
+            np.testing.assert_array_almost_equal([float(level) for level in row[7].split()], event.levels)
+            np.testing.assert_array_equal([int(length) for length in row[8].split()], event.level_lengths)
+
+    def test_include_raw_data(self):
+        filename = os.path.join(DIRECTORY, 'TestCSVEventSink_test_include_raw_data.csv')
+        events = _find_memory_events(DATA_FILES[0])
+        find_events([DATA_FILES[0]], sinks=[CSVEventSink(filename, include_raw_data=True)])
+
+        rows = self._read_rows(filename)
+        self.assertEqual(rows[0][-1], 'raw_data')
+        for row, event in zip(rows[1:], events):
+            np.testing.assert_array_almost_equal([float(point) for point in row[-1].split()], event.raw_data)
+
+    def test_no_events(self):
+        """
+        Tests that the CSV file is deleted if there are no events.
+        """
+        filename = os.path.join(DIRECTORY, 'TestCSVEventSink_test_no_events.csv')
+        parameters = Parameters(threshold_strategy=AbsoluteChangeThresholdStrategy(1.e9, 1.e9))
+        result = find_events([DATA_FILES[0]], parameters=parameters, sinks=[CSVEventSink(filename)])
+
+        self.assertEqual(result, [])
+        self.assertFalse(os.path.exists(filename))
+
+    def test_resume(self):
+        """
+        Tests that resuming a stopped search gives the same rows as an uninterrupted search.
+        """
+        filename = os.path.join(DIRECTORY, 'TestCSVEventSink_test_resume.csv')
+        random_state = np.random.RandomState(5)
+        data = 10. + random_state.normal(scale=.1, size=(1, 100000))
+        for event_start in xrange(5000, 95000, 9000):
+            data[0, event_start:event_start + 300] -= 3.
+        parameters = Parameters(read_size=5000)
+
+        def reader():
+            return _SegmentReader(data, 1.e6, 'resume', 1000)
+
+        find_events([reader()], parameters=parameters, sinks=[CSVEventSink(filename)])
+        one_run = self._read_rows(filename)
+
+        class Stop(Exception):
+            pass
+
+        class StoppingSink(CSVEventSink):
+            def write_events(self, batch):
+                if self.event_count >= 4:
+                    # Write a partial row that resuming should drop.
+                    self.file.write('partial')
+                    self.file.close()
+                    raise Stop()
+                super(StoppingSink, self).write_events(batch)
+
+        self.assertRaises(Stop, find_events, [reader()], parameters=parameters, sinks=[StoppingSink(filename)],
+                          checkpoint_interval=1.e-9)
+        find_events([reader()], parameters=parameters, sinks=[CSVEventSink(filename)], resume=True)
+
+        self.assertEqual(len(one_run), 11)
+        self.assertEqual(self._read_rows(filename), one_run)
+        self.assertFalse(os.path.exists(filename + '.checkpoint'))
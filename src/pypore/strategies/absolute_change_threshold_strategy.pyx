@@ -1,5 +1,7 @@
 
-from pypore.strategies.threshold_strategy cimport ThresholdStrategy
+cimport numpy as np
+
+from pypore.strategies.threshold_strategy cimport ThresholdStrategy, DTYPE_t
 
 cdef class AbsoluteChangeThresholdStrategy(ThresholdStrategy):
     cdef public double change_start
@@ -15,6 +17,11 @@ cdef class AbsoluteChangeThresholdStrategy(ThresholdStrategy):
         """
         return self.change_start
 
+    cdef void compute_starting_threshold_block_c(self, np.ndarray[DTYPE_t] baselines,
+                                                 np.ndarray[DTYPE_t] variances,
+                                                 np.ndarray[DTYPE_t] out_threshold) except *:
+        out_threshold[:baselines.shape[0]] = self.change_start
+
     cdef double compute_ending_threshold_c(self, double baseline, double variance):
         """
         :returns: change_end from strategy initialization. 'baseline' and 'variance' parameters have no effect.
@@ -1,6 +1,7 @@
 import numpy as np
 
 cimport numpy as np
+cimport cython
 
 from libc.math cimport pow
 from pypore.strategies.baseline_strategy cimport BaselineStrategy
@@ -34,6 +35,29 @@ cdef class AdaptiveBaselineStrategy(BaselineStrategy):
             data_point - self.variance_baseline, 2)
         return self.variance
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void compute_baseline_block_c(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                       np.ndarray[DTYPE_t] out_variance) except *:
+        # The same recursion as compute_baseline_c and compute_variance_c, in a tight loop.
+        cdef double p = self.baseline_filter_parameter
+        cdef double q = self.variance_filter_parameter
+        cdef double baseline = self.baseline
+        cdef double variance = self.variance
+        cdef double variance_baseline = self.variance_baseline
+        cdef double data_point
+        cdef long k
+        for k in xrange(data.shape[0]):
+            data_point = data[k]
+            baseline = p * baseline + (1 - p) * data_point
+            variance_baseline = q * variance_baseline + (1 - q) * data_point
+            variance = q * variance + (1 - q) * pow(data_point - variance_baseline, 2)
+            out_baseline[k] = baseline
+            out_variance[k] = variance
+        self.baseline = baseline
+        self.variance = variance
+        self.variance_baseline = variance_baseline
+
     cdef double get_baseline_c(self):
         return BaselineStrategy.get_baseline_c(self)
 
@@ -16,6 +16,11 @@ cdef class BaselineStrategy:
     cpdef double compute_variance(self, double data_point)
     cdef double compute_variance_c(self, double data_point)
 
+    cpdef compute_baseline_block(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                 np.ndarray[DTYPE_t] out_variance)
+    cdef void compute_baseline_block_c(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                       np.ndarray[DTYPE_t] out_variance) except *
+
     cpdef initialize(self, np.ndarray[DTYPE_t] initialization_points)
     cdef void initialize_c(self, np.ndarray[DTYPE_t] initialization_points)
 
@@ -10,6 +10,8 @@ cdef class BaselineStrategy:
     * :py:class:`FixedBaselineStrategy` -- baseline is fixed.
     * :py:class:`AdaptiveBaselineStrategy` -- applies a first-order recursive filter to adapt the\
         baseline as the data changes.
+    * :py:class:`RunningMedianBaselineStrategy` -- baseline is a running median, or other quantile, of a window\
+        of recent data, so it is not dragged along by long events.
 
     When a :py:class:`BaselineStrategy` is passed to :py:func:`find_events`,
     :py:func:`find_events` will call the following methods, so Subclasses must override
@@ -79,6 +81,39 @@ cdef class BaselineStrategy:
         """
         raise NotImplementedError
 
+    cpdef compute_baseline_block(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                 np.ndarray[DTYPE_t] out_variance):
+        """compute_baseline_block(np.ndarray data, np.ndarray out_baseline, np.ndarray out_variance)
+
+        (Note: this is a cpdef wrapper around the cdef function :py:func:`compute_baseline_block_c`.
+        This function can be called directly from Python. If calling from Cython,
+        you can call the cdef version :py:func:`compute_baseline_block_c`)
+
+        Block version of :py:func:`compute_baseline` and :py:func:`compute_variance`. :py:func:`find_events` \
+        calls this with whole stretches of quiet baseline at a time.
+
+        Gives the same results, and leaves the strategy in the same state, as calling :py:func:`compute_baseline` \
+        and then :py:func:`compute_variance` with each point of data in turn, which is what the default \
+        implementation does. Subclasses can override this with a tight loop, or a closed form.
+
+        :param numpy.ndarray[numpy.float] data: The next data points.
+        :param numpy.ndarray[numpy.float] out_baseline: Array at least as long as data, to set to the baseline \
+            after each point.
+        :param numpy.ndarray[numpy.float] out_variance: Array at least as long as data, to set to the variance \
+            after each point.
+        """
+        self.compute_baseline_block_c(data, out_baseline, out_variance)
+
+    cdef void compute_baseline_block_c(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                       np.ndarray[DTYPE_t] out_variance) except *:
+        """
+        See docs for :py:func:`compute_baseline_block`.
+        """
+        cdef long k
+        for k in xrange(data.shape[0]):
+            out_baseline[k] = self.compute_baseline_c(data[k])
+            out_variance[k] = self.compute_variance_c(data[k])
+
     cpdef initialize(self, np.ndarray[DTYPE_t] initialization_points):
         """initialize(double baseline)
 
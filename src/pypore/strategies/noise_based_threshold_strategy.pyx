@@ -1,5 +1,8 @@
+cimport numpy as np
+cimport cython
+
 from libc.math cimport sqrt
-from pypore.strategies.threshold_strategy cimport ThresholdStrategy
+from pypore.strategies.threshold_strategy cimport ThresholdStrategy, DTYPE_t
 
 cdef class NoiseBasedThresholdStrategy(ThresholdStrategy):
     cdef public double start_std_dev
@@ -14,4 +17,14 @@ cdef class NoiseBasedThresholdStrategy(ThresholdStrategy):
         return self.end_std_dev * sqrt(variance)
 
     cdef double compute_starting_threshold_c(self, double baseline, double variance):
-        return self.start_std_dev * sqrt(variance)
\ No newline at end of file
+        return self.start_std_dev * sqrt(variance)
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void compute_starting_threshold_block_c(self, np.ndarray[DTYPE_t] baselines,
+                                                 np.ndarray[DTYPE_t] variances,
+                                                 np.ndarray[DTYPE_t] out_threshold) except *:
+        cdef double start_std_dev = self.start_std_dev
+        cdef long k
+        for k in xrange(baselines.shape[0]):
+            out_threshold[k] = start_std_dev * sqrt(variances[k])
\ No newline at end of file
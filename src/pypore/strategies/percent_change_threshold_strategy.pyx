@@ -1,5 +1,7 @@
 
-from pypore.strategies.threshold_strategy cimport ThresholdStrategy
+cimport numpy as np
+
+from pypore.strategies.threshold_strategy cimport ThresholdStrategy, DTYPE_t
 
 cdef class PercentChangeThresholdStrategy(ThresholdStrategy):
     cdef public double percent_change_start
@@ -12,5 +14,10 @@ cdef class PercentChangeThresholdStrategy(ThresholdStrategy):
     cdef double compute_starting_threshold_c(self, double baseline, double variance):
         return baseline * self.percent_change_start / 100.0
 
+    cdef void compute_starting_threshold_block_c(self, np.ndarray[DTYPE_t] baselines,
+                                                 np.ndarray[DTYPE_t] variances,
+                                                 np.ndarray[DTYPE_t] out_threshold) except *:
+        out_threshold[:baselines.shape[0]] = baselines * self.percent_change_start / 100.0
+
     cdef double compute_ending_threshold_c(self, double baseline, double variance):
         return baseline * self.percent_change_end / 100.0
\ No newline at end of file
@@ -0,0 +1,749 @@
+import numpy as np
+
+cimport numpy as np
+cimport cython
+
+from libc.math cimport INFINITY, sqrt
+from libc.stdlib cimport malloc, realloc, free
+from libc.string cimport memcpy, memmove
+from pypore.strategies.baseline_strategy cimport BaselineStrategy
+
+DTYPE = np.float
+ctypedef np.float_t DTYPE_t
+
+# Each band keeps its part of the window sorted in chunks of between CHUNK_LOAD / 4 and 2 * CHUNK_LOAD values, so
+# inserting or removing a value only moves part of one chunk, and finding its chunk is a binary search over the
+# chunk maxima.
+cdef long CHUNK_LOAD = 64
+cdef long CHUNK_SPLIT = 2 * CHUNK_LOAD
+cdef long CHUNK_MERGE = CHUNK_LOAD // 4
+# A merge can overshoot CHUNK_SPLIT by less than CHUNK_MERGE before the chunk is split again.
+cdef long CHUNK_CAPACITY = 3 * CHUNK_LOAD
+
+# Number of window lengths of points the whole window is kept sorted for, before trying the bands again.
+cdef long SHARED_WINDOWS = 2
+
+# Scales the median absolute deviation of normal noise to its standard deviation.
+cdef double MAD_TO_STANDARD_DEVIATION = 1.482602218505602
+
+cdef inline long _lower_bound(double *values, long n, double x) nogil:
+    """
+    :returns: The index of the first value >= x in the sorted values, or n.
+    """
+    # Branch free, the comparisons of random data points are not predictable.
+    cdef long base = 0
+    cdef long half
+    if n == 0:
+        return 0
+    while n > 1:
+        half = n >> 1
+        base = base + half if values[base + half - 1] < x else base
+        n -= half
+    return base + (values[base] < x)
+
+
+cdef inline long _upper_bound(double *values, long n, double x) nogil:
+    """
+    :returns: The index of the first value > x in the sorted values, or n.
+    """
+    cdef long base = 0
+    cdef long half
+    if n == 0:
+        return 0
+    while n > 1:
+        half = n >> 1
+        base = base + half if values[base + half - 1] <= x else base
+        n -= half
+    return base + (values[base] <= x)
+
+
+cdef struct _Band:
+    # The values v of the window with lo <= v <= hi, in sorted order, and the number of values below lo.
+    double lo
+    double hi
+    long below
+    long size
+    # With lo == hi the values are all the same, and only counted.
+    bint flat
+    # The band is built again once it holds more than size_limit values.
+    long size_limit
+    # Number of points added to the window when the band was built.
+    long built_at
+
+    # The sorted values, split into chunks. The chunks are slots of CHUNK_CAPACITY values in one pool, so copying
+    # the band doesn't allocate every chunk separately. chunks_allocated is the number of slots.
+    double *pool
+    long *chunk_slots
+    long *chunk_sizes
+    double *chunk_maxes
+    long n_chunks
+    long chunks_allocated
+    # Slots below pool_used that are not in use.
+    long *free_slots
+    long n_free_slots
+    long pool_used
+
+    # Cursors into the sorted values, one per quantile the band is used for. For each cursor: its chunk, position
+    # in the chunk, and rank in the band.
+    int n_cursors
+    long cursor_chunk[3]
+    long cursor_position[3]
+    long cursor_rank[3]
+
+
+cdef void _band_free(_Band *band):
+    free(band.pool)
+    free(band.chunk_slots)
+    free(band.chunk_sizes)
+    free(band.chunk_maxes)
+    free(band.free_slots)
+    band.pool = NULL
+    band.chunk_slots = NULL
+    band.chunk_sizes = NULL
+    band.chunk_maxes = NULL
+    band.free_slots = NULL
+    band.n_chunks = 0
+    band.chunks_allocated = 0
+    band.n_free_slots = 0
+    band.pool_used = 0
+    band.size = 0
+
+
+cdef int _band_allocate(_Band *band, long n_chunks) except -1:
+    """
+    Frees the band's values and allocates room for n_chunks empty chunks in the first slots of the pool, with the
+    cursors at the start.
+    """
+    cdef long c
+    cdef int j
+    _band_free(band)
+    band.chunks_allocated = max(n_chunks, 16)
+    band.pool = <double *> malloc(band.chunks_allocated * CHUNK_CAPACITY * sizeof(double))
+    band.chunk_slots = <long *> malloc(band.chunks_allocated * sizeof(long))
+    band.chunk_sizes = <long *> malloc(band.chunks_allocated * sizeof(long))
+    band.chunk_maxes = <double *> malloc(band.chunks_allocated * sizeof(double))
+    band.free_slots = <long *> malloc(band.chunks_allocated * sizeof(long))
+    if band.pool == NULL or band.chunk_slots == NULL or band.chunk_sizes == NULL or band.chunk_maxes == NULL or \
+            band.free_slots == NULL:
+        _band_free(band)
+        raise MemoryError()
+    for c in xrange(n_chunks):
+        band.chunk_slots[c] = c
+        band.chunk_sizes[c] = 0
+        band.chunk_maxes[c] = 0.
+    band.n_chunks = n_chunks
+    band.pool_used = n_chunks
+    for j in range(3):
+        band.cursor_chunk[j] = 0
+        band.cursor_position[j] = 0
+        band.cursor_rank[j] = 0
+    return 0
+
+
+cdef int _band_load(_Band *band, double *values, long n) except -1:
+    """
+    Replaces the band's values with the n sorted values, with the cursors on the first.
+    """
+    cdef long c, start, size
+    _band_allocate(band, max(1, (n + CHUNK_LOAD - 1) // CHUNK_LOAD))
+    for c in xrange(band.n_chunks):
+        start = c * CHUNK_LOAD
+        size = min(CHUNK_LOAD, n - start)
+        if size > 0:
+            memcpy(_band_chunk(band, c), values + start, size * sizeof(double))
+            band.chunk_maxes[c] = values[start + size - 1]
+        band.chunk_sizes[c] = size
+    band.size = n
+    return 0
+
+
+cdef int _band_copy(_Band *band, _Band *other) except -1:
+    """
+    Makes band a copy of other.
+    """
+    cdef long c
+    _band_allocate(band, other.n_chunks)
+    # The copy's chunks are packed into its first slots.
+    for c in xrange(other.n_chunks):
+        memcpy(_band_chunk(band, c), _band_chunk(other, c), other.chunk_sizes[c] * sizeof(double))
+    memcpy(band.chunk_sizes, other.chunk_sizes, other.n_chunks * sizeof(long))
+    memcpy(band.chunk_maxes, other.chunk_maxes, other.n_chunks * sizeof(double))
+    band.lo = other.lo
+    band.hi = other.hi
+    band.below = other.below
+    band.size = other.size
+    band.flat = other.flat
+    band.size_limit = other.size_limit
+    band.built_at = other.built_at
+    band.n_cursors = other.n_cursors
+    band.cursor_chunk = other.cursor_chunk
+    band.cursor_position = other.cursor_position
+    band.cursor_rank = other.cursor_rank
+    return 0
+
+
+cdef inline double *_band_chunk(_Band *band, long c):
+    return band.pool + band.chunk_slots[c] * CHUNK_CAPACITY
+
+
+cdef inline long _band_find_chunk(_Band *band, double x):
+    """
+    :returns: The first chunk whose maximum is >= x, or the last chunk.
+    """
+    return _lower_bound(band.chunk_maxes, band.n_chunks - 1, x)
+
+
+cdef int _band_grow_chunks(_Band *band) except -1:
+    """
+    Doubles the number of slots in the pool.
+    """
+    cdef long allocated = 2 * band.chunks_allocated
+    cdef double *pool = <double *> realloc(band.pool, allocated * CHUNK_CAPACITY * sizeof(double))
+    if pool == NULL:
+        raise MemoryError()
+    band.pool = pool
+    cdef long *chunk_slots = <long *> realloc(band.chunk_slots, allocated * sizeof(long))
+    if chunk_slots == NULL:
+        raise MemoryError()
+    band.chunk_slots = chunk_slots
+    cdef long *chunk_sizes = <long *> realloc(band.chunk_sizes, allocated * sizeof(long))
+    if chunk_sizes == NULL:
+        raise MemoryError()
+    band.chunk_sizes = chunk_sizes
+    cdef double *chunk_maxes = <double *> realloc(band.chunk_maxes, allocated * sizeof(double))
+    if chunk_maxes == NULL:
+        raise MemoryError()
+    band.chunk_maxes = chunk_maxes
+    cdef long *free_slots = <long *> realloc(band.free_slots, allocated * sizeof(long))
+    if free_slots == NULL:
+        raise MemoryError()
+    band.free_slots = free_slots
+    band.chunks_allocated = allocated
+    return 0
+
+
+cdef int _band_insert_chunk(_Band *band, long c) except -1:
+    """
+    Inserts an empty chunk at index c.
+    """
+    cdef long n = band.n_chunks
+    cdef long slot
+    if n == band.chunks_allocated:
+        _band_grow_chunks(band)
+    if band.n_free_slots > 0:
+        band.n_free_slots -= 1
+        slot = band.free_slots[band.n_free_slots]
+    else:
+        slot = band.pool_used
+        band.pool_used += 1
+    memmove(band.chunk_slots + c + 1, band.chunk_slots + c, (n - c) * sizeof(long))
+    memmove(band.chunk_sizes + c + 1, band.chunk_sizes + c, (n - c) * sizeof(long))
+    memmove(band.chunk_maxes + c + 1, band.chunk_maxes + c, (n - c) * sizeof(double))
+    band.chunk_slots[c] = slot
+    band.chunk_sizes[c] = 0
+    band.n_chunks = n + 1
+    return 0
+
+
+cdef int _band_split_chunk(_Band *band, long c) except -1:
+    """
+    Moves the upper half of chunk c to a new chunk after it.
+    """
+    cdef long size = band.chunk_sizes[c]
+    cdef long half = size // 2
+    cdef int j
+    _band_insert_chunk(band, c + 1)
+    memcpy(_band_chunk(band, c + 1), _band_chunk(band, c) + half, (size - half) * sizeof(double))
+    band.chunk_sizes[c + 1] = size - half
+    band.chunk_maxes[c + 1] = band.chunk_maxes[c]
+    band.chunk_sizes[c] = half
+    band.chunk_maxes[c] = _band_chunk(band, c)[half - 1]
+    for j in range(band.n_cursors):
+        if band.cursor_chunk[j] > c:
+            band.cursor_chunk[j] += 1
+        elif band.cursor_chunk[j] == c and band.cursor_position[j] >= half:
+            band.cursor_chunk[j] += 1
+            band.cursor_position[j] -= half
+    return 0
+
+
+cdef int _band_merge_chunks(_Band *band, long c) except -1:
+    """
+    Moves chunk c + 1 onto the end of chunk c, splitting the result if it is too big.
+    """
+    cdef long size = band.chunk_sizes[c]
+    cdef long n = band.n_chunks
+    cdef int j
+    memcpy(_band_chunk(band, c) + size, _band_chunk(band, c + 1), band.chunk_sizes[c + 1] * sizeof(double))
+    band.chunk_sizes[c] = size + band.chunk_sizes[c + 1]
+    band.chunk_maxes[c] = band.chunk_maxes[c + 1]
+    band.free_slots[band.n_free_slots] = band.chunk_slots[c + 1]
+    band.n_free_slots += 1
+    memmove(band.chunk_slots + c + 1, band.chunk_slots + c + 2, (n - c - 2) * sizeof(long))
+    memmove(band.chunk_sizes + c + 1, band.chunk_sizes + c + 2, (n - c - 2) * sizeof(long))
+    memmove(band.chunk_maxes + c + 1, band.chunk_maxes + c + 2, (n - c - 2) * sizeof(double))
+    band.n_chunks = n - 1
+    for j in range(band.n_cursors):
+        if band.cursor_chunk[j] == c + 1:
+            band.cursor_chunk[j] = c
+            band.cursor_position[j] += size
+        elif band.cursor_chunk[j] > c + 1:
+            band.cursor_chunk[j] -= 1
+    if band.chunk_sizes[c] >= CHUNK_SPLIT:
+        _band_split_chunk(band, c)
+    return 0
+
+
+cdef int _band_insert(_Band *band, double x) except -1:
+    """
+    Adds x to the band's sorted values.
+    """
+    cdef long c = _band_find_chunk(band, x)
+    cdef double *chunk = _band_chunk(band, c)
+    cdef long size = band.chunk_sizes[c]
+    cdef long p = _upper_bound(chunk, size, x)
+    cdef int j, same_chunk, shift
+    memmove(chunk + p + 1, chunk + p, (size - p) * sizeof(double))
+    chunk[p] = x
+    band.chunk_sizes[c] = size + 1
+    if p == size:
+        band.chunk_maxes[c] = x
+    # Without branches, whether x went before a cursor is as good as random.
+    for j in range(band.n_cursors):
+        same_chunk = c == band.cursor_chunk[j]
+        shift = (c < band.cursor_chunk[j]) | (same_chunk & (p <= band.cursor_position[j]))
+        band.cursor_rank[j] += shift
+        band.cursor_position[j] += shift & same_chunk
+    band.size += 1
+    if size + 1 >= CHUNK_SPLIT:
+        _band_split_chunk(band, c)
+    return 0
+
+
+cdef int _band_remove(_Band *band, double x) except -1:
+    """
+    Removes a value equal to x from the band's sorted values.
+    """
+    cdef long c = _band_find_chunk(band, x)
+    cdef double *chunk = _band_chunk(band, c)
+    cdef long size = band.chunk_sizes[c]
+    cdef long p = _lower_bound(chunk, size, x)
+    cdef int j, same_chunk, shift
+    memmove(chunk + p, chunk + p + 1, (size - p - 1) * sizeof(double))
+    band.chunk_sizes[c] = size - 1
+    if size > 1:
+        band.chunk_maxes[c] = chunk[size - 2]
+    # A cursor on the removed value is left on the next value, which now has the same rank.
+    for j in range(band.n_cursors):
+        same_chunk = c == band.cursor_chunk[j]
+        shift = (c < band.cursor_chunk[j]) | (same_chunk & (p < band.cursor_position[j]))
+        band.cursor_rank[j] -= shift
+        band.cursor_position[j] -= shift & same_chunk
+        # Move a cursor left past the end of its chunk to the start of the next chunk.
+        while band.cursor_position[j] >= band.chunk_sizes[band.cursor_chunk[j]] and \
+                band.cursor_chunk[j] + 1 < band.n_chunks:
+            band.cursor_position[j] -= band.chunk_sizes[band.cursor_chunk[j]]
+            band.cursor_chunk[j] += 1
+    band.size -= 1
+    if size - 1 < CHUNK_MERGE and band.n_chunks > 1:
+        if c + 1 < band.n_chunks:
+            _band_merge_chunks(band, c)
+        else:
+            _band_merge_chunks(band, c - 1)
+    return 0
+
+
+cdef int _band_replace(_Band *band, double old, double new) except -1:
+    """
+    Replaces a value equal to old in the band's sorted values with new, which must also be in the band.
+    """
+    # Both places are found before either chunk is changed, so the two searches can run side by side.
+    cdef long c_old = _band_find_chunk(band, old)
+    cdef long c_new = _band_find_chunk(band, new)
+    cdef double *chunk_old = _band_chunk(band, c_old)
+    cdef double *chunk_new = _band_chunk(band, c_new)
+    cdef long p_old = _lower_bound(chunk_old, band.chunk_sizes[c_old], old)
+    cdef long p_new = _upper_bound(chunk_new, band.chunk_sizes[c_new], new)
+    cdef long size
+    cdef int j, same_chunk, shift
+
+    size = band.chunk_sizes[c_old]
+    memmove(chunk_old + p_old, chunk_old + p_old + 1, (size - p_old - 1) * sizeof(double))
+    band.chunk_sizes[c_old] = size - 1
+    if size > 1:
+        band.chunk_maxes[c_old] = chunk_old[size - 2]
+    for j in range(band.n_cursors):
+        same_chunk = c_old == band.cursor_chunk[j]
+        shift = (c_old < band.cursor_chunk[j]) | (same_chunk & (p_old < band.cursor_position[j]))
+        band.cursor_rank[j] -= shift
+        band.cursor_position[j] -= shift & same_chunk
+        while band.cursor_position[j] >= band.chunk_sizes[band.cursor_chunk[j]] and \
+                band.cursor_chunk[j] + 1 < band.n_chunks:
+            band.cursor_position[j] -= band.chunk_sizes[band.cursor_chunk[j]]
+            band.cursor_chunk[j] += 1
+
+    if c_new == c_old and p_new > p_old:
+        p_new -= 1
+    size = band.chunk_sizes[c_new]
+    memmove(chunk_new + p_new + 1, chunk_new + p_new, (size - p_new) * sizeof(double))
+    chunk_new[p_new] = new
+    band.chunk_sizes[c_new] = size + 1
+    if p_new == size:
+        band.chunk_maxes[c_new] = new
+    for j in range(band.n_cursors):
+        same_chunk = c_new == band.cursor_chunk[j]
+        shift = (c_new < band.cursor_chunk[j]) | (same_chunk & (p_new <= band.cursor_position[j]))
+        band.cursor_rank[j] += shift
+        band.cursor_position[j] += shift & same_chunk
+
+    if size + 1 >= CHUNK_SPLIT:
+        _band_split_chunk(band, c_new)
+        if c_old > c_new:
+            c_old += 1
+    if band.chunk_sizes[c_old] < CHUNK_MERGE and band.n_chunks > 1:
+        if c_old + 1 < band.n_chunks:
+            _band_merge_chunks(band, c_old)
+        else:
+            _band_merge_chunks(band, c_old - 1)
+    return 0
+
+
+cdef inline int _band_add(_Band *band, double x) except -1:
+    # Without branches for whether x is below the band, which is as good as random. Most points miss the band.
+    band.below += x < band.lo
+    if (x >= band.lo) & (x <= band.hi):
+        if band.flat:
+            band.size += 1
+        else:
+            _band_insert(band, x)
+    return 0
+
+
+cdef inline int _band_discard(_Band *band, double x) except -1:
+    band.below -= x < band.lo
+    if (x >= band.lo) & (x <= band.hi):
+        if band.flat:
+            band.size -= 1
+        else:
+            _band_remove(band, x)
+    return 0
+
+
+cdef inline void _band_move_cursor(_Band *band, int j, long rank):
+    """
+    Moves cursor j to the rank in the band, which must be between 0 and the band's size.
+    """
+    cdef long c = band.cursor_chunk[j]
+    cdef long p = band.cursor_position[j] + rank - band.cursor_rank[j]
+    if band.flat:
+        return
+    # Usually the cursor stays in its chunk.
+    while p < 0:
+        c -= 1
+        p += band.chunk_sizes[c]
+    while p >= band.chunk_sizes[c] and c + 1 < band.n_chunks:
+        p -= band.chunk_sizes[c]
+        c += 1
+    band.cursor_chunk[j] = c
+    band.cursor_position[j] = p
+    band.cursor_rank[j] = rank
+
+
+cdef inline double _band_value(_Band *band, int j):
+    if band.flat:
+        return band.lo
+    return _band_chunk(band, band.cursor_chunk[j])[band.cursor_position[j]]
+
+
+@cython.final
+cdef class RunningMedianBaselineStrategy(BaselineStrategy):
+    """
+    Baseline is a running quantile, by default the median, of the last window_length data points, so it is not
+    dragged along by events shorter than about half of the window.
+
+    The variance comes from the median absolute deviation (MAD) of the window, estimated as half of its
+    interquartile range, which equals the MAD for symmetric noise:
+    variance = (1.4826 * (q75 - q25) / 2) ** 2. For normal noise this is the noise variance.
+
+    The window is kept in a ring buffer in arrival order. For each of the baseline quantile and the two quartiles,
+    a band of the window's values around the quantile is kept sorted, in a list of short sorted chunks, together
+    with the number of values below the band. A new point outside the bands only changes those counts, while one
+    inside a band costs O(log band size) to find its place, plus moving part of one chunk. The quantiles are
+    tracked with cursors that move at most a step or two per point.
+
+    When a quantile drifts out of its band, the band is built again around it from the ring buffer, in
+    O(window_length), which is rare for a steady baseline. While the window fills up, and for a while after a band
+    is drifted out of within a window length, eg. when the baseline moves, the whole window is kept sorted in one
+    band instead, with a cursor for each quantile.
+
+    :py:func:`compute_baseline` adds the point to the window and updates both the baseline and the variance, and
+    :py:func:`compute_variance` returns the variance of the window it left.
+    """
+    cdef readonly long window_length
+    cdef readonly double quantile
+
+    # Ring buffer of the window in arrival order. window_start is the oldest point.
+    cdef np.ndarray window_values
+    cdef double *window
+    cdef long window_start
+    cdef long count
+    # Number of points added since the window was emptied.
+    cdef long n_added
+
+    # Bands of the window around the baseline quantile and the lower and upper quartiles for the MAD, or with
+    # shared, the whole window in the first band. For each quantile: the quantile, and its rank in the window.
+    cdef _Band bands[3]
+    cdef bint shared
+    cdef double band_quantile[3]
+    cdef long band_target[3]
+    # Number of ranks on each side of its quantile a band holds when it is built.
+    cdef long band_half_width
+
+    def __cinit__(self, *args, **kwargs):
+        cdef int k
+        for k in range(3):
+            self.bands[k].pool = NULL
+            self.bands[k].chunk_slots = NULL
+            self.bands[k].chunk_sizes = NULL
+            self.bands[k].chunk_maxes = NULL
+            self.bands[k].free_slots = NULL
+
+    def __init__(self, double baseline=0.0, double variance=0.0, long window_length=10000, double quantile=0.5):
+        """(double baseline=0.0, double variance=0.0, long window_length=10000, double quantile=0.5)
+
+        :param double baseline: baseline until the first point is added.
+        :param double variance: variance until the first point is added.
+        :param long window_length: Number of most recent points the baseline is computed from.
+        :param double quantile: Quantile of the window used as the baseline, 0.5 is the median.
+        """
+        if window_length < 1:
+            raise ValueError("window_length must be at least 1, got {0}.".format(window_length))
+        if not 0. <= quantile <= 1.:
+            raise ValueError("quantile must be between 0 and 1, got {0}.".format(quantile))
+        super(RunningMedianBaselineStrategy, self).__init__(baseline, variance)
+        self.window_length = window_length
+        self.quantile = quantile
+        # A point lands in a band with a chance of about 4 / sqrt(window_length), and the quantile of steady noise
+        # takes about 4 * window_length points to drift out of its band.
+        self.band_half_width = max(CHUNK_LOAD, <long> (2 * sqrt(window_length)))
+        self.window_values = np.zeros(window_length, dtype=DTYPE)
+        self.window = <double *> self.window_values.data
+        self._clear()
+
+    def __dealloc__(self):
+        cdef int k
+        for k in range(3):
+            _band_free(&self.bands[k])
+
+    cdef void _clear(self) except *:
+        """
+        Empties the window.
+        """
+        cdef int k
+        self.window_start = 0
+        self.count = 0
+        self.n_added = 0
+        self.band_quantile[0] = self.quantile
+        self.band_quantile[1] = 0.25
+        self.band_quantile[2] = 0.75
+        for k in range(3):
+            self.band_target[k] = 0
+        self._share()
+
+    cdef void _share(self) except *:
+        """
+        Keeps the whole window sorted in the first band, with a cursor on each quantile.
+        """
+        cdef _Band *band = &self.bands[0]
+        cdef np.ndarray[DTYPE_t] values = np.sort(self.window_values[:self.count])
+        cdef int k
+        _band_load(band, <double *> values.data, values.shape[0])
+        band.lo = -INFINITY
+        band.hi = INFINITY
+        band.below = 0
+        band.flat = False
+        band.built_at = self.n_added
+        band.n_cursors = 3
+        if self.count > 0:
+            for k in range(3):
+                _band_move_cursor(band, k, self.band_target[k])
+        for k in range(1, 3):
+            _band_allocate(&self.bands[k], 1)
+        self.shared = True
+
+    cdef void _build_band(self, int k) except *:
+        """
+        Builds band k from the window, with band_half_width ranks on each side of its quantile.
+        """
+        cdef _Band *band = &self.bands[k]
+        cdef long first = self.band_target[k] - self.band_half_width
+        cdef long last = self.band_target[k] + self.band_half_width
+        cdef np.ndarray[DTYPE_t] band_values
+        values = self.window_values[:self.count]
+        kth = [rank for rank in (first, last) if 0 < rank < self.count - 1]
+        partitioned = np.partition(values, kth) if len(kth) > 0 else values
+        band.lo = partitioned[first] if first > 0 else -INFINITY
+        band.hi = partitioned[last] if last < self.count - 1 else INFINITY
+        band.flat = band.lo == band.hi
+        if band.flat:
+            _band_allocate(band, 1)
+            band.size = np.count_nonzero(values == band.lo)
+        else:
+            band_values = np.sort(values[(values >= band.lo) & (values <= band.hi)])
+            _band_load(band, <double *> band_values.data, band_values.shape[0])
+        band.below = np.count_nonzero(values < band.lo)
+        band.built_at = self.n_added
+        # Repeated values can make a band much wider than its ranks, so the limit is relative to its size.
+        band.size_limit = 2 * max(band.size, 2 * self.band_half_width + 1)
+        band.n_cursors = 1
+        _band_move_cursor(band, 0, self.band_target[k] - band.below)
+
+    cdef void _split(self) except *:
+        """
+        Builds a band for each quantile from the whole window.
+        """
+        cdef int k
+        self.shared = False
+        for k in range(3):
+            self._build_band(k)
+
+    cdef int _add_point(self, double data_point) except -1:
+        """
+        Adds data_point to the window, dropping the oldest point if the window is full, and updates the baseline
+        and variance.
+        """
+        cdef long end, position
+        cdef double old, deviation
+        cdef int k
+        cdef _Band *band
+        if self.count == self.window_length:
+            old = self.window[self.window_start]
+            self.window[self.window_start] = data_point
+            self.window_start += 1
+            if self.window_start == self.window_length:
+                self.window_start = 0
+            if self.shared:
+                _band_replace(&self.bands[0], old, data_point)
+            else:
+                for k in range(3):
+                    _band_discard(&self.bands[k], old)
+                    _band_add(&self.bands[k], data_point)
+        else:
+            end = self.window_start + self.count
+            if end >= self.window_length:
+                end -= self.window_length
+            self.window[end] = data_point
+            self.count += 1
+            for k in range(1 if self.shared else 3):
+                _band_add(&self.bands[k], data_point)
+            for k in range(3):
+                self.band_target[k] = <long> (self.band_quantile[k] * (self.count - 1) + 0.5)
+        self.n_added += 1
+
+        if self.shared:
+            band = &self.bands[0]
+            for k in range(3):
+                _band_move_cursor(band, k, self.band_target[k])
+            if self.n_added - band.built_at > SHARED_WINDOWS * self.window_length:
+                self._split()
+        else:
+            for k in range(3):
+                band = &self.bands[k]
+                position = self.band_target[k] - band.below
+                if 0 <= position < band.size and band.size <= band.size_limit:
+                    _band_move_cursor(band, 0, position)
+                elif self.n_added - band.built_at < self.window_length and band.size <= band.size_limit:
+                    # The baseline is moving too fast for the bands.
+                    self._share()
+                    break
+                else:
+                    self._build_band(k)
+
+        if self.shared:
+            self.baseline = _band_value(&self.bands[0], 0)
+            deviation = _band_value(&self.bands[0], 2) - _band_value(&self.bands[0], 1)
+        else:
+            self.baseline = _band_value(&self.bands[0], 0)
+            deviation = _band_value(&self.bands[2], 0) - _band_value(&self.bands[1], 0)
+        deviation *= MAD_TO_STANDARD_DEVIATION * 0.5
+        self.variance = deviation * deviation
+        return 0
+
+    def get_window(self):
+        """
+        :returns: numpy array of the points in the window, oldest first.
+        """
+        cdef np.ndarray[DTYPE_t] points = np.zeros(self.count, dtype=DTYPE)
+        cdef long k, index
+        for k in xrange(self.count):
+            index = self.window_start + k
+            if index >= self.window_length:
+                index -= self.window_length
+            points[k] = self.window[index]
+        return points
+
+    def __copy__(self):
+        cdef RunningMedianBaselineStrategy other = RunningMedianBaselineStrategy.__new__(
+            RunningMedianBaselineStrategy)
+        cdef int k
+        other.baseline = self.baseline
+        other.variance = self.variance
+        other.window_length = self.window_length
+        other.quantile = self.quantile
+        other.band_half_width = self.band_half_width
+        other.window_values = self.window_values.copy()
+        other.window = <double *> other.window_values.data
+        other.window_start = self.window_start
+        other.count = self.count
+        other.n_added = self.n_added
+        for k in range(3):
+            _band_copy(&other.bands[k], &self.bands[k])
+        other.shared = self.shared
+        other.band_quantile = self.band_quantile
+        other.band_target = self.band_target
+        return other
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        return (RunningMedianBaselineStrategy, (self.baseline, self.variance, self.window_length, self.quantile),
+                (self.get_window(), self.baseline, self.variance))
+
+    def __setstate__(self, state):
+        window, baseline, variance = state
+        self._clear()
+        for point in window:
+            self._add_point(point)
+        self.baseline = baseline
+        self.variance = variance
+
+    cdef double compute_baseline_c(self, double data_point):
+        self._add_point(data_point)
+        return self.baseline
+
+    cdef double compute_variance_c(self, double data_point):
+        # The window was already updated with data_point by compute_baseline_c.
+        return self.variance
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void compute_baseline_block_c(self, np.ndarray[DTYPE_t] data, np.ndarray[DTYPE_t] out_baseline,
+                                       np.ndarray[DTYPE_t] out_variance) except *:
+        cdef long k
+        for k in xrange(data.shape[0]):
+            self._add_point(data[k])
+            out_baseline[k] = self.baseline
+            out_variance[k] = self.variance
+
+    cdef double get_baseline_c(self):
+        return BaselineStrategy.get_baseline_c(self)
+
+    cdef double get_variance_c(self):
+        return BaselineStrategy.get_variance_c(self)
+
+    cdef void initialize_c(self, np.ndarray[DTYPE_t] initialization_points):
+        cdef long k
+        self._clear()
+        for k in xrange(initialization_points.shape[0]):
+            self._add_point(initialization_points[k])
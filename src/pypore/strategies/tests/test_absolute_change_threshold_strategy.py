@@ -1,5 +1,7 @@
 import unittest
 
+import numpy as np
+
 from pypore.strategies.absolute_change_threshold_strategy import AbsoluteChangeThresholdStrategy
 
 
@@ -26,3 +28,8 @@ class TestAbsoluteChangeThresholdStrategy(unittest.TestCase):
                                  "Unexpected ending threshold. Should be {0}, was {1}.".format(end_changes[i],
                                                                                                end_thresh))
 
+    def test_compute_starting_threshold_block(self):
+        strategy = AbsoluteChangeThresholdStrategy(2., 1.)
+        thresholds = np.zeros(5)
+        strategy.compute_starting_threshold_block(np.arange(5.), np.arange(5.), thresholds)
+        np.testing.assert_array_equal(thresholds, 2.)
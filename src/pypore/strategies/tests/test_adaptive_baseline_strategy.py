@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+
+from pypore.strategies.adaptive_baseline_strategy import AdaptiveBaselineStrategy
+from pypore.strategies.fixed_baseline_strategy import FixedBaselineStrategy
+
+
+class TestAdaptiveBaselineStrategy(unittest.TestCase):
+    def _test_block_same_as_point_by_point(self, strategy_class):
+        data = 10. + np.random.RandomState(0).normal(size=1000)
+        point_by_point = strategy_class(10., 1.)
+        block = strategy_class(10., 1.)
+
+        baselines = np.array([(point_by_point.compute_baseline(point), point_by_point.compute_variance(point))
+                              for point in data])
+        out_baseline = np.zeros(data.size)
+        out_variance = np.zeros(data.size)
+        block.compute_baseline_block(data, out_baseline, out_variance)
+
+        np.testing.assert_array_equal(out_baseline, baselines[:, 0])
+        np.testing.assert_array_equal(out_variance, baselines[:, 1])
+        self.assertEqual(block.get_baseline(), point_by_point.get_baseline())
+        self.assertEqual(block.get_variance(), point_by_point.get_variance())
+
+    def test_compute_baseline_block(self):
+        """
+        Tests that the block method gives exactly the same baselines and variances as calling compute_baseline
+        and compute_variance point by point, and leaves the strategy in the same state.
+        """
+        self._test_block_same_as_point_by_point(AdaptiveBaselineStrategy)
+        # Uses the default block method, which calls compute_baseline and compute_variance point by point.
+        self._test_block_same_as_point_by_point(FixedBaselineStrategy)
@@ -0,0 +1,21 @@
+import unittest
+
+import numpy as np
+
+from pypore.strategies.noise_based_threshold_strategy import NoiseBasedThresholdStrategy
+from pypore.strategies.percent_change_threshold_strategy import PercentChangeThresholdStrategy
+
+
+class TestNoiseBasedThresholdStrategy(unittest.TestCase):
+    def test_compute_starting_threshold_block(self):
+        """
+        Tests that the block method gives exactly the same thresholds as compute_starting_threshold.
+        """
+        random_state = np.random.RandomState(0)
+        baselines = 10. + random_state.normal(size=100)
+        variances = random_state.uniform(size=100)
+        for strategy in [NoiseBasedThresholdStrategy(4.5, 1.), PercentChangeThresholdStrategy(15., 5.)]:
+            thresholds = np.zeros(100)
+            strategy.compute_starting_threshold_block(baselines, variances, thresholds)
+            np.testing.assert_array_equal(thresholds, [strategy.compute_starting_threshold(baseline, variance)
+                                                       for baseline, variance in zip(baselines, variances)])
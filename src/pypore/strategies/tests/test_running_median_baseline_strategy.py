@@ -0,0 +1,119 @@
+import bisect
+import copy
+import pickle
+import unittest
+
+import numpy as np
+
+from pypore.strategies.running_median_baseline_strategy import RunningMedianBaselineStrategy
+
+
+class TestRunningMedianBaselineStrategy(unittest.TestCase):
+    def _test_same_as_sorting(self, window_length, quantile):
+        # Rounded, so there are lots of repeated values.
+        data = np.round(np.random.RandomState(0).normal(size=3000), 1)
+        strategy = RunningMedianBaselineStrategy(window_length=window_length, quantile=quantile)
+        out_baseline = np.zeros(data.size)
+        out_variance = np.zeros(data.size)
+        strategy.compute_baseline_block(data, out_baseline, out_variance)
+
+        for k in xrange(data.size):
+            window = np.sort(data[max(0, k - window_length + 1):k + 1])
+            n = window.size
+            self.assertEqual(out_baseline[k], window[int(quantile * (n - 1) + 0.5)])
+            deviation = 1.482602218505602 * 0.5 * (window[int(0.75 * (n - 1) + 0.5)] -
+                                                    window[int(0.25 * (n - 1) + 0.5)])
+            self.assertAlmostEqual(out_variance[k], deviation ** 2)
+        np.testing.assert_array_equal(strategy.get_window(), data[-window_length:])
+
+    def test_compute_baseline_block(self):
+        """
+        Tests that the baseline and variance match sorting each window, for windows smaller and bigger than the
+        chunks the window is sorted in.
+        """
+        for window_length, quantile in ((1, 0.5), (7, 0.5), (50, 0.3), (301, 0.9), (1000, 0.5)):
+            self._test_same_as_sorting(window_length, quantile)
+
+    def test_moving_baseline(self):
+        """
+        Tests the baseline and variance of a steady, stepping, drifting, quantized and flat baseline against a
+        sorted window, so the quantiles leave their bands of the window.
+        """
+        random = np.random.RandomState(4)
+        data = random.normal(size=24000)
+        data[6000:9000] += 5.
+        data[9000:12000] += np.linspace(0., 20., 3000)
+        data[12000:18000] = np.round(data[12000:18000])
+        data[20000:] = 1.
+        window_length = 1000
+        strategy = RunningMedianBaselineStrategy(window_length=window_length)
+        out_baseline = np.zeros(data.size)
+        out_variance = np.zeros(data.size)
+        strategy.compute_baseline_block(data, out_baseline, out_variance)
+
+        window = []
+        for k in xrange(data.size):
+            bisect.insort(window, data[k])
+            if k >= window_length:
+                del window[bisect.bisect_left(window, data[k - window_length])]
+            n = len(window)
+            self.assertEqual(out_baseline[k], window[int(0.5 * (n - 1) + 0.5)])
+            deviation = 1.482602218505602 * 0.5 * (window[int(0.75 * (n - 1) + 0.5)] -
+                                                    window[int(0.25 * (n - 1) + 0.5)])
+            self.assertAlmostEqual(out_variance[k], deviation ** 2)
+
+    def test_block_same_as_point_by_point(self):
+        data = 10. + np.random.RandomState(1).normal(size=2000)
+        point_by_point = RunningMedianBaselineStrategy(window_length=500)
+        block = RunningMedianBaselineStrategy(window_length=500)
+
+        baselines = np.array([(point_by_point.compute_baseline(point), point_by_point.compute_variance(point))
+                              for point in data])
+        out_baseline = np.zeros(data.size)
+        out_variance = np.zeros(data.size)
+        block.compute_baseline_block(data, out_baseline, out_variance)
+
+        np.testing.assert_array_equal(out_baseline, baselines[:, 0])
+        np.testing.assert_array_equal(out_variance, baselines[:, 1])
+
+    def test_not_dragged_by_event(self):
+        """
+        Tests that an event shorter than half the window doesn't move the baseline.
+        """
+        data = np.ones(2000)
+        data[1000:1400] = 0.5
+        strategy = RunningMedianBaselineStrategy(window_length=1000)
+        out_baseline = np.zeros(data.size)
+        out_variance = np.zeros(data.size)
+        strategy.compute_baseline_block(data, out_baseline, out_variance)
+
+        np.testing.assert_array_equal(out_baseline[999:], 1.)
+
+    def test_copy_and_pickle(self):
+        """
+        Tests that copies and unpickled strategies carry on the same as the original.
+        """
+        random = np.random.RandomState(2)
+        # Copied while the whole window is sorted, and once it is split into bands.
+        for n_points in [100, 2000]:
+            strategy = RunningMedianBaselineStrategy(window_length=300, quantile=0.4)
+            for point in random.normal(size=n_points):
+                strategy.compute_baseline(point)
+            copies = [copy.copy(strategy), copy.deepcopy(strategy), pickle.loads(pickle.dumps(strategy))]
+
+            for point in random.normal(size=2000):
+                baseline = strategy.compute_baseline(point)
+                for other in copies:
+                    self.assertEqual(other.compute_baseline(point), baseline)
+                    self.assertEqual(other.get_variance(), strategy.get_variance())
+
+    def test_initialize(self):
+        data = np.random.RandomState(3).normal(size=100)
+        strategy = RunningMedianBaselineStrategy(window_length=50)
+        strategy.initialize(data)
+
+        self.assertEqual(strategy.get_baseline(), np.sort(data[-50:])[int(0.5 * 49 + 0.5)])
+
+    def test_bad_parameters(self):
+        self.assertRaises(ValueError, RunningMedianBaselineStrategy, window_length=0)
+        self.assertRaises(ValueError, RunningMedianBaselineStrategy, quantile=1.5)
@@ -1,9 +1,21 @@
 
+import numpy as np
+cimport numpy as np
+
+DTYPE = np.float
+ctypedef np.float_t DTYPE_t
+
 cdef class ThresholdStrategy:
 
 
     cpdef double compute_starting_threshold(self, double baseline, double variance)
     cdef double compute_starting_threshold_c(self, double baseline, double variance)
 
+    cpdef compute_starting_threshold_block(self, np.ndarray[DTYPE_t] baselines, np.ndarray[DTYPE_t] variances,
+                                           np.ndarray[DTYPE_t] out_threshold)
+    cdef void compute_starting_threshold_block_c(self, np.ndarray[DTYPE_t] baselines,
+                                                 np.ndarray[DTYPE_t] variances,
+                                                 np.ndarray[DTYPE_t] out_threshold) except *
+
     cpdef double compute_ending_threshold(self, double baseline, double variance)
     cdef double compute_ending_threshold_c(self, double baseline, double variance)
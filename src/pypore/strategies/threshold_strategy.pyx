@@ -1,4 +1,7 @@
 
+import numpy as np
+cimport numpy as np
+
 cdef class ThresholdStrategy:
     """
     Abstract base class defining the behavior that a `ThresholdStrategy` should implement. These methods
@@ -37,6 +40,35 @@ cdef class ThresholdStrategy:
         """
         raise NotImplementedError
 
+    cpdef compute_starting_threshold_block(self, np.ndarray[DTYPE_t] baselines, np.ndarray[DTYPE_t] variances,
+                                           np.ndarray[DTYPE_t] out_threshold):
+        """compute_starting_threshold_block(np.ndarray baselines, np.ndarray variances, np.ndarray out_threshold)
+
+        (Note: this is a cpdef wrapper for the cdef method :py:func:`compute_starting_threshold_block_c`.
+        This method is accessible from Python, while :py:func:`compute_starting_threshold_block_c` is
+        only accessible from Cython.)
+
+        Block version of :py:func:`compute_starting_threshold`, called by :py:func:`find_events` with whole \
+        stretches of quiet baseline at a time. The default implementation calls \
+        :py:func:`compute_starting_threshold_c` for each point, subclasses can override this with a tight loop.
+
+        :param numpy.ndarray[numpy.float] baselines: The baseline at each point.
+        :param numpy.ndarray[numpy.float] variances: The variance of the baseline at each point.
+        :param numpy.ndarray[numpy.float] out_threshold: Array at least as long as baselines, to set to the \
+            starting threshold at each point.
+        """
+        self.compute_starting_threshold_block_c(baselines, variances, out_threshold)
+
+    cdef void compute_starting_threshold_block_c(self, np.ndarray[DTYPE_t] baselines,
+                                                 np.ndarray[DTYPE_t] variances,
+                                                 np.ndarray[DTYPE_t] out_threshold) except *:
+        """
+        See docs for :py:func:`compute_starting_threshold_block`.
+        """
+        cdef long k
+        for k in xrange(baselines.shape[0]):
+            out_threshold[k] = self.compute_starting_threshold_c(baselines[k], variances[k])
+
     cpdef double compute_ending_threshold(self, double baseline, double variance):
         """compute_ending_threshold(double baseline, double variance)
 
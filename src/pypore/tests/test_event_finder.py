@@ -4,11 +4,13 @@ Tests for eventFinder.pyx
 @author: `@parkin`_
 """
 import unittest
-from pypore.event_finder import find_events, get_reader_from_filename
-from pypore.event_finder import _get_data_range_test_wrapper
+from multiprocessing import Pipe
+from pypore.event_finder import find_events, iter_events, get_reader_from_filename
 import numpy as np
 import os
 import pypore.filetypes.event_database as ed
+from pypore.sinks.hdf5_event_sink import HDF5EventSink
+from pypore.sinks.memory_event_sink import MemoryEventSink
 
 import pypore.sampledata.testing_files as tf
 from pypore.tests.util import _test_file_manager
@@ -21,72 +23,6 @@ class TestEventFinder(unittest.TestCase):
     def tearDown(self):
         pass
 
-    def test_get_data_range_test_wrapper_at_new(self):
-        n = 100
-        first = np.zeros(n)
-        first[n - 1] += 1.
-        first[0] += 1.
-        data_cache = [first, np.zeros(n) + 100., np.zeros(n) + 100. + 60., np.zeros(n) + 200.]
-
-        res = _get_data_range_test_wrapper(data_cache, 0, n)
-        self.assertEqual(res.size, n)
-        np.testing.assert_array_equal(res, np.zeros(n) + 100.)
-
-        # Test negative i to 0
-        x = np.zeros(10)
-        x[9] += 1.
-        res = _get_data_range_test_wrapper(data_cache, -10, 0)
-        np.testing.assert_array_equal(res, x)
-
-        # Test negative i,n
-        x = np.zeros(10)
-        x[0] += 1.
-        res = _get_data_range_test_wrapper(data_cache, -100, -90)
-        np.testing.assert_array_equal(res, x)
-
-        # Test negative i, pos n in first spot
-        x = np.zeros(10)
-        x[4] += 1.
-        x[5:10] += 100.
-        res = _get_data_range_test_wrapper(data_cache, -5, 5)
-        np.testing.assert_array_equal(res, x)
-
-        # Test pos i,n both in first spot
-        x = np.zeros(10) + 100.
-        res = _get_data_range_test_wrapper(data_cache, 60, 70)
-        np.testing.assert_array_equal(res, x)
-
-        # Test first and second cache overlap
-        x = np.zeros(10) + 100.
-        x[5:] += 60.
-        res = _get_data_range_test_wrapper(data_cache, 95, 105)
-        np.testing.assert_array_equal(res, x)
-
-        # Test fist cache bumping up on second
-        x = np.zeros(10) + 100.
-        res = _get_data_range_test_wrapper(data_cache, 90, 100)
-        np.testing.assert_array_equal(res, x)
-
-        # Test second cache
-        x = np.zeros(10) + 160.
-        res = _get_data_range_test_wrapper(data_cache, 155, 165)
-        np.testing.assert_array_equal(res, x)
-
-        # Test neg overlap with 2 pos caches
-        x = np.zeros(120)
-        x[9] += 1.
-        x[10:] += 100.
-        x[110:] += 60.
-        res = _get_data_range_test_wrapper(data_cache, -10, 110)
-
-        # Test neg overlap with 3 pos caches
-        x = np.zeros(220)
-        x[9] += 1.
-        x[10:] += 100.
-        x[110:] += 60.
-        x[210:] += 40.
-        res = _get_data_range_test_wrapper(data_cache, -10, 210)
-
     def test_saving_files(self):
         filename = tf.get_abs_path('chimera_1event.log')
 
@@ -252,6 +188,86 @@ class TestEventFinder(unittest.TestCase):
         h5file.close()
         os.remove(event_databases[1])
 
+    def test_multiple_files_n_workers(self):
+        """
+        Tests that searching the files in a pool of workers returns the databases in the same order as the files.
+        """
+        filename1 = tf.get_abs_path('chimera_nonoise_2events_1levels.log')
+        filename2 = tf.get_abs_path('chimera_nonoise_1event_2levels.log')
+        reader = get_reader_from_filename(filename1)
+        data = [reader, filename2, filename1]
+        save_file_names = ['_testMultipleFilesNWorkers_1_9238.h5', '_testMultipleFilesNWorkers_2_9238.h5',
+                           '_testMultipleFilesNWorkers_3_9238.h5']
+        parent_pipe, child_pipe = Pipe()
+        event_databases = find_events(data, save_file_names=save_file_names, pipe=child_pipe, n_workers=2)
+        reader.close()
+
+        self.assertEqual(event_databases, save_file_names)
+
+        for i, helper in enumerate([self._test_chimera_no_noise_2events_1levels_wrapper,
+                                    self._test_chimera_no_noise_1event_2levels_helper,
+                                    self._test_chimera_no_noise_2events_1levels_wrapper]):
+            h5file = ed.open_file(event_databases[i], mode='r')
+            helper(h5file)
+            h5file.close()
+            os.remove(event_databases[i])
+
+        status_texts = []
+        while parent_pipe.poll():
+            status_texts.append(parent_pipe.recv()['status_text'])
+        self.assertEqual(status_texts[-1], 'Files Done: 3/3')
+
+    def test_n_workers_with_h5file(self):
+        """
+        Tests that passing an already opened h5file with more than 1 worker raises an error.
+        """
+        filename = tf.get_abs_path('chimera_nonoise_2events_1levels.log')
+        self.assertRaises(ValueError, find_events, [filename, filename], h5file=object(), n_workers=2)
+
+    def test_iter_events(self):
+        """
+        Tests that iter_events yields the same events that find_events saves.
+        """
+        filename = tf.get_abs_path('chimera_1event_2levels.log')
+
+        events = list(iter_events(filename))
+
+        event_database = find_events([filename], save_file_names=['_test_iter_events.h5'])[0]
+        h5file = ed.open_file(event_database, mode='r')
+        self.assertEqual(len(events), h5file.get_event_count())
+        for i, event in enumerate(events):
+            row = h5file.get_event_row(i)
+            self.assertEqual(event.channel, row['channel'])
+            self.assertEqual(event.event_start, row['event_start'])
+            self.assertEqual(event.event_length, row['event_length'])
+            self.assertEqual(event.n_levels, row['n_levels'])
+            self.assertAlmostEqual(event.baseline, row['baseline'])
+            self.assertAlmostEqual(event.current_blockage, row['current_blockage'])
+            self.assertAlmostEqual(event.area, row['area'])
+            np.testing.assert_array_equal(event.raw_data, h5file.get_raw_data_at(i))
+            np.testing.assert_array_almost_equal(event.levels, h5file.get_levels_at(i))
+            np.testing.assert_array_equal(event.level_lengths, h5file.get_level_lengths_at(i))
+        h5file.close()
+        os.remove(event_database)
+
+    def test_iter_events_passing_reader(self):
+        """
+        Tests that iter_events searches an already opened reader, and leaves it open.
+        """
+        filename = tf.get_abs_path('chimera_nonoise_2events_1levels.log')
+        reader = get_reader_from_filename(filename)
+
+        events = list(iter_events(reader))
+
+        self.assertEqual(len(events), 2)
+        for event in events:
+            self.assertEqual(event.event_length, 1000)
+            self.assertEqual(event.n_levels, 1)
+            self.assertAlmostEqual(event.levels[0], 15.1395, 2)
+        # The reader should still be open
+        reader.get_sample_rate()
+        reader.close()
+
     def test_passing_reader(self):
         """
         Tests that passing an open subtype of :py:class:`pypore.i_o.abstract_reader.AbstractReader` works.
@@ -305,8 +321,709 @@ class TestEventFinder(unittest.TestCase):
 
 DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 
-from pypore.event_finder import Parameters
+from pypore.event_finder import Parameters, _RingBuffer, _SegmentReader, _get_blocks_per_read, READ_SIZE_AUTO, \
+    AUTO_READ_SIZE_MIN, AUTO_READ_SIZE_MAX, refit_levels, sweep_find_events, OnlineEventDetector, \
+    RAW_POINTS_PER_SIDE
 from pypore.strategies.absolute_change_threshold_strategy import AbsoluteChangeThresholdStrategy
+from pypore.strategies.adaptive_baseline_strategy import AdaptiveBaselineStrategy
+from pypore.strategies.fixed_baseline_strategy import FixedBaselineStrategy
+from pypore.strategies.noise_based_threshold_strategy import NoiseBasedThresholdStrategy
+from pypore.strategies.percent_change_threshold_strategy import PercentChangeThresholdStrategy
+from pypore.strategies.running_median_baseline_strategy import RunningMedianBaselineStrategy
+
+
+def _synthetic_events(n_channels, n_points, spacing, seed, first_event=5000, alternate_channels=False,
+                      event_length=300, depth=3., length_step=0, depth_step=0.):
+    """
+    Makes a noisy baseline of 10 with events every spacing points, from first_event until first_event points before
+    the end. The k-th event is event_length + k * length_step points long and depth + k * depth_step deep.
+
+    :param bool alternate_channels: If True, the events are in each channel in turn, otherwise in all of them.
+    :returns: (data, event_starts), where data is a 2D array with one row per channel.
+    """
+    random_state = np.random.RandomState(seed)
+    data = 10. + random_state.normal(scale=.1, size=(n_channels, n_points))
+    event_starts = range(first_event, n_points - first_event, spacing)
+    for k, event_start in enumerate(event_starts):
+        channels = k % n_channels if alternate_channels else slice(None)
+        data[channels, event_start:event_start + event_length + k * length_step] -= depth + k * depth_step
+    return data, event_starts
+
+
+class TestEventFinderPrescan(unittest.TestCase):
+    def _find_events_debug(self, data_file, filename, prescan, parameters):
+        parameters.prescan = prescan
+        find_events([data_file], parameters=parameters, save_file_names=[filename], debug=True)
+
+        h5file = ed.open_file(filename, mode='r')
+        event_table = h5file.get_event_table()[:]
+        raw_data = h5file.root.events.raw_data[:]
+        levels = h5file.root.events.levels[:]
+        debug = [h5file.root.debug.data[:], h5file.root.debug.baseline[:],
+                 h5file.root.debug.threshold_positive[:], h5file.root.debug.threshold_negative[:]]
+        h5file.close()
+        os.remove(filename)
+        return event_table, raw_data, levels, debug
+
+    def _test_prescan_same_as_point_by_point(self, data_file, filename, threshold_strategy_class,
+                                             baseline_strategy_class=AdaptiveBaselineStrategy, **kwargs):
+        def parameters():
+            return Parameters(baseline_strategy=baseline_strategy_class(),
+                              threshold_strategy=threshold_strategy_class(), **kwargs)
+
+        without = self._find_events_debug(data_file, filename, False, parameters())
+        with_prescan = self._find_events_debug(data_file, filename, True, parameters())
+
+        np.testing.assert_array_equal(without[0], with_prescan[0])
+        np.testing.assert_array_equal(without[1], with_prescan[1])
+        np.testing.assert_array_equal(without[2], with_prescan[2])
+        for debug_without, debug_with_prescan in zip(without[3], with_prescan[3]):
+            np.testing.assert_array_equal(debug_without, debug_with_prescan)
+
+    @_test_file_manager(DIRECTORY)
+    def test_prescan_same_as_point_by_point(self, filename):
+        """
+        Tests that pre-scanning for event candidates finds exactly the same events, baseline and thresholds as
+        walking every point through the event loop.
+        """
+        for data_file in ['chimera_1event.log', 'chimera_1event_2levels.log', 'chimera_nonoise_2events_1levels.log',
+                          'spheres_20140114_154938_beginning.log']:
+            self._test_prescan_same_as_point_by_point(tf.get_abs_path(data_file), filename,
+                                                      NoiseBasedThresholdStrategy)
+
+    @_test_file_manager(DIRECTORY)
+    def test_prescan_same_as_point_by_point_other_threshold(self, filename):
+        """
+        Tests the pre-scan with other strategies' block methods.
+        """
+        self._test_prescan_same_as_point_by_point(tf.get_abs_path('chimera_1event.log'), filename,
+                                                  lambda: AbsoluteChangeThresholdStrategy(2., 1.))
+        self._test_prescan_same_as_point_by_point(tf.get_abs_path('chimera_1event_2levels.log'), filename,
+                                                  lambda: PercentChangeThresholdStrategy(10., 5.),
+                                                  FixedBaselineStrategy)
+
+    @_test_file_manager(DIRECTORY)
+    def test_prescan_margin_over_threshold(self, filename):
+        """
+        Tests the pre-scan when its candidates are further from the baseline than the threshold, so the threshold
+        is crossed before the first candidate.
+        """
+        for data_file in ['chimera_1event.log', 'spheres_20140114_154938_beginning.log']:
+            self._test_prescan_same_as_point_by_point(tf.get_abs_path(data_file), filename,
+                                                      NoiseBasedThresholdStrategy, prescan_margin=1.5)
+        # The strategy is given the quiet points again after a point outside its threshold.
+        self._test_prescan_same_as_point_by_point(tf.get_abs_path('spheres_20140114_154938_beginning.log'),
+                                                  filename, NoiseBasedThresholdStrategy,
+                                                  lambda: RunningMedianBaselineStrategy(window_length=1000),
+                                                  prescan_margin=1.5)
+
+
+class TestEventFinderSegments(unittest.TestCase):
+    def _find_events(self, data_file, filename, debug, **kwargs):
+        parameters = Parameters(max_event_length=500.)
+        find_events([data_file], parameters=parameters, save_file_names=[filename], debug=debug, **kwargs)
+
+        h5file = ed.open_file(filename, mode='r')
+        event_count = h5file.get_event_count()
+        event_table = h5file.get_event_table()[:]
+        raw_data = [h5file.get_raw_data_at(i) for i in xrange(event_count)]
+        levels = [h5file.get_levels_at(i) for i in xrange(event_count)]
+        debug_data = None
+        if debug:
+            debug_data = [h5file.root.debug.data[:], h5file.root.debug.baseline[:],
+                          h5file.root.debug.threshold_positive[:], h5file.root.debug.threshold_negative[:]]
+        h5file.close()
+        os.remove(filename)
+        return event_table, raw_data, levels, debug_data
+
+    def _test_segments_same_as_one_pass(self, data_file, filename, debug):
+        one_pass = self._find_events(data_file, filename, debug)
+        segments = self._find_events(data_file, filename, debug, segment_workers=2, segment_length=2500,
+                                     segment_overlap=1000)
+
+        self.assertEqual(one_pass[0].size, segments[0].size)
+        for name in ['array_row', 'event_start', 'event_length', 'n_levels', 'raw_points_per_side']:
+            np.testing.assert_array_equal(one_pass[0][name], segments[0][name])
+        for name in ['baseline', 'current_blockage', 'area']:
+            np.testing.assert_array_almost_equal(one_pass[0][name], segments[0][name])
+        for i in xrange(one_pass[0].size):
+            np.testing.assert_array_equal(one_pass[1][i], segments[1][i])
+            np.testing.assert_array_almost_equal(one_pass[2][i], segments[2][i])
+        if debug:
+            np.testing.assert_array_equal(one_pass[3][0], segments[3][0])
+            for debug_one_pass, debug_segments in zip(one_pass[3][1:], segments[3][1:]):
+                np.testing.assert_array_almost_equal(debug_one_pass, debug_segments)
+
+    @_test_file_manager(DIRECTORY)
+    def test_segments_same_as_one_pass(self, filename):
+        """
+        Tests that splitting the files into segments searched by a pool of workers finds the same events as
+        searching each file in one pass.
+        """
+        for data_file in ['chimera_1event.log', 'chimera_1event_2levels.log']:
+            self._test_segments_same_as_one_pass(tf.get_abs_path(data_file), filename, False)
+
+    @_test_file_manager(DIRECTORY)
+    def test_segments_same_as_one_pass_debug(self, filename):
+        """
+        Tests that the debug data of the segments is stitched back together.
+        """
+        self._test_segments_same_as_one_pass(tf.get_abs_path('chimera_1event_2levels.log'), filename, True)
+
+    @_test_file_manager(DIRECTORY)
+    def test_segments_reader_without_file(self, filename):
+        """
+        Tests that the segments of a reader whose file can't be opened again are read and sent to the workers.
+        """
+        reader = get_reader_from_filename(tf.get_abs_path('chimera_1event_2levels.log'))
+        data = np.vstack(reader.get_all_data())
+        sample_rate = reader.get_sample_rate()
+        reader.close()
+        one_pass = self._find_events(_SegmentReader(data, sample_rate, 'no_file', 1000), filename, False)
+        segments = self._find_events(_SegmentReader(data, sample_rate, 'no_file', 1000), filename, False,
+                                     segment_workers=2, segment_length=2500, segment_overlap=1000)
+
+        self.assertGreater(one_pass[0].size, 0)
+        np.testing.assert_array_equal(one_pass[0]['event_start'], segments[0]['event_start'])
+        for i in xrange(one_pass[0].size):
+            np.testing.assert_array_equal(one_pass[1][i], segments[1][i])
+
+
+class TestEventFinderDebugDecimation(unittest.TestCase):
+    def _find_debug(self, filename, debug_decimation, **kwargs):
+        parameters = Parameters(max_event_length=500., debug_decimation=debug_decimation)
+        find_events([tf.get_abs_path('chimera_1event_2levels.log')], parameters=parameters,
+                    save_file_names=[filename], debug=True, **kwargs)
+
+        h5file = ed.open_file(filename, mode='r')
+        self.assertEqual(h5file.get_debug_decimation(), debug_decimation)
+        debug_data = [h5file.root.debug.data[:], h5file.root.debug.baseline[:],
+                      h5file.root.debug.threshold_positive[:], h5file.root.debug.threshold_negative[:]]
+        h5file.close()
+        os.remove(filename)
+        return debug_data
+
+    @_test_file_manager(DIRECTORY)
+    def test_min_max(self, filename):
+        """
+        Tests that the decimated debug data holds the minimum and maximum of each group of points.
+        """
+        decimation = 7
+        full = self._find_debug(filename, 1)
+        decimated = self._find_debug(filename, decimation)
+
+        n_points = full[0].shape[1]
+        for full_matrix, decimated_matrix in zip(full, decimated):
+            self.assertEqual(decimated_matrix.shape, (1, 2 * ((n_points + decimation - 1) // decimation)))
+            for k, start in enumerate(xrange(0, n_points, decimation)):
+                group = full_matrix[0, start:start + decimation]
+                self.assertEqual(decimated_matrix[0, 2 * k], group.min())
+                self.assertEqual(decimated_matrix[0, 2 * k + 1], group.max())
+
+    @_test_file_manager(DIRECTORY)
+    def test_segments(self, filename):
+        """
+        Tests that the debug data of the segments is decimated the same as in one pass.
+        """
+        one_pass = self._find_debug(filename, 7)
+        segments = self._find_debug(filename, 7, segment_workers=2, segment_length=2500, segment_overlap=1000)
+
+        np.testing.assert_array_equal(one_pass[0], segments[0])
+        for debug_one_pass, debug_segments in zip(one_pass[1:], segments[1:]):
+            np.testing.assert_array_almost_equal(debug_one_pass, debug_segments)
+
+
+class TestRingBuffer(unittest.TestCase):
+    def _test_windows(self, buffer, data, keep):
+        """
+        Checks that every window of the last keep points held in buffer matches data, where data[k] is the point
+        at index k + data[0].
+        """
+        offset = int(data[0])
+        for a in xrange(max(buffer.start, buffer.end - keep), buffer.end):
+            for b in [a, a + 1, buffer.end]:
+                np.testing.assert_array_equal(buffer.window(a, b), data[a - offset:b - offset])
+
+    def test_windows(self):
+        """
+        Tests that the windows are right as the points wrap around the storage.
+        """
+        data = np.arange(1000, dtype=np.float)
+        buffer = _RingBuffer(40)
+        end = 0
+        for n in [7, 13, 1, 20, 9, 17, 11]:
+            buffer.discard_before(end - 20)
+            buffer.append(data[end:end + n])
+            end += n
+            self.assertEqual(buffer.end, end)
+            self._test_windows(buffer, data, 20)
+
+    def test_grow(self):
+        """
+        Tests that the buffer grows, keeping the points it holds, when a block does not fit.
+        """
+        data = np.arange(-5, 995, dtype=np.float)
+        buffer = _RingBuffer(10, start=-5)
+        buffer.append(data[:8])
+        buffer.append(data[8:50])
+        buffer.append(data[50:113])
+        self.assertEqual(buffer.start, -5)
+        self.assertEqual(buffer.end, 108)
+        self._test_windows(buffer, data, 113)
+        buffer.discard_before(100)
+        buffer.append(data[113:300])
+        self.assertEqual(buffer.start, 100)
+        self._test_windows(buffer, data, 200)
+
+
+class TestEventFinderChannels(unittest.TestCase):
+    def _find_events(self, data, filename, **kwargs):
+        reader = _SegmentReader(data, 4166666.66667, 'channels', 1000)
+        find_events([reader], parameters=Parameters(max_event_length=500.), save_file_names=[filename], **kwargs)
+
+        h5file = ed.open_file(filename, mode='r')
+        event_count = h5file.get_event_count()
+        event_table = h5file.get_event_table()[:]
+        raw_data = [h5file.get_raw_data_at(i) for i in xrange(event_count)]
+        levels = [h5file.get_levels_at(i) for i in xrange(event_count)]
+        h5file.close()
+        os.remove(filename)
+        return event_table, raw_data, levels
+
+    def _test_channels_same_as_one_channel(self, filename, **kwargs):
+        data = []
+        for data_file in ['chimera_1event.log', 'chimera_1event_2levels.log']:
+            reader = get_reader_from_filename(tf.get_abs_path(data_file))
+            data.append(reader.get_all_data()[0])
+            reader.close()
+        data = np.vstack(data)
+
+        channels = self._find_events(data, filename, **kwargs)
+        for channel in xrange(data.shape[0]):
+            one_channel = self._find_events(data[channel:channel + 1], filename, **kwargs)
+            in_channel = np.nonzero(channels[0]['channel'] == channel)[0]
+
+            self.assertEqual(in_channel.size, one_channel[0].size)
+            self.assertTrue(np.all(one_channel[0]['channel'] == 0))
+            for name in ['event_start', 'event_length', 'n_levels', 'raw_points_per_side']:
+                np.testing.assert_array_equal(channels[0][in_channel][name], one_channel[0][name])
+            for name in ['baseline', 'current_blockage', 'area']:
+                np.testing.assert_array_almost_equal(channels[0][in_channel][name], one_channel[0][name])
+            for i, j in enumerate(in_channel):
+                np.testing.assert_array_equal(channels[1][j], one_channel[1][i])
+                np.testing.assert_array_almost_equal(channels[2][j], one_channel[2][i])
+
+    @_test_file_manager(DIRECTORY)
+    def test_channels_same_as_one_channel(self, filename):
+        """
+        Tests that searching all of the channels in one pass finds the same events as searching each channel on
+        its own, and that the events are labelled with their channel.
+        """
+        self._test_channels_same_as_one_channel(filename)
+
+    @_test_file_manager(DIRECTORY)
+    def test_channels_same_as_one_channel_segments(self, filename):
+        """
+        Tests that the segments of a multi-channel file are stitched back together by channel.
+        """
+        self._test_channels_same_as_one_channel(filename, segment_workers=2, segment_length=2500,
+                                                segment_overlap=1000)
+
+
+class TestEventFinderReadSize(unittest.TestCase):
+    def test_events_same_for_read_sizes(self):
+        """
+        Tests that the events found do not depend on how many points are read at a time.
+        """
+        for data_file in ['chimera_1event_2levels.log', 'spheres_20140114_154938_beginning.log']:
+            events = []
+            for read_size in [1, 12345, READ_SIZE_AUTO]:
+                parameters = Parameters(max_event_length=500., read_size=read_size)
+                events.append(list(iter_events(tf.get_abs_path(data_file), parameters)))
+            for other in events[1:]:
+                self.assertEqual(len(events[0]), len(other))
+                for event, other_event in zip(events[0], other):
+                    self.assertEqual(event.event_start, other_event.event_start)
+                    self.assertEqual(event.event_length, other_event.event_length)
+                    np.testing.assert_array_equal(event.raw_data, other_event.raw_data)
+                    np.testing.assert_array_equal(event.levels, other_event.levels)
+
+    @_test_file_manager(DIRECTORY)
+    def test_debug_same_for_read_sizes(self, filename):
+        """
+        Tests that the debug data does not depend on how many points are read at a time, as the debug matrices are
+        reused from read to read.
+        """
+        data = _synthetic_events(2, 30000, 2000, 7, first_event=1000, alternate_channels=True, event_length=50,
+                                 length_step=40)[0]
+        debug_data = []
+        for read_size in [100, 1300, 30000]:
+            find_events([_SegmentReader(data, 1.e6, 'debug', 100)], parameters=Parameters(read_size=read_size),
+                        save_file_names=[filename], debug=True)
+            h5file = ed.open_file(filename, mode='r')
+            debug_data.append([h5file.root.debug.data[:], h5file.root.debug.baseline[:],
+                               h5file.root.debug.threshold_positive[:], h5file.root.debug.threshold_negative[:]])
+            h5file.close()
+            os.remove(filename)
+        np.testing.assert_array_equal(debug_data[0][0], data)
+        for other in debug_data[1:]:
+            for matrix, other_matrix in zip(debug_data[0], other):
+                np.testing.assert_array_equal(matrix, other_matrix)
+
+    def test_events_same_with_prefetch(self):
+        """
+        Tests that reading ahead in a background thread finds the same events.
+        """
+        data_file = tf.get_abs_path('chimera_1event_2levels.log')
+        events = list(iter_events(data_file, Parameters(max_event_length=500., read_size=12345)))
+        prefetch_events = list(iter_events(data_file, Parameters(max_event_length=500., read_size=12345,
+                                                                 prefetch_reads=2)))
+        self.assertGreater(len(events), 0)
+        self.assertEqual(len(events), len(prefetch_events))
+        for event, other_event in zip(events, prefetch_events):
+            self.assertEqual(event.event_start, other_event.event_start)
+            np.testing.assert_array_equal(event.raw_data, other_event.raw_data)
+            np.testing.assert_array_equal(event.levels, other_event.levels)
+
+    def test_blocks_per_read(self):
+        """
+        Tests that the read size is rounded up to whole blocks of the reader, and that the auto read size is
+        within its bounds.
+        """
+        reader = get_reader_from_filename(tf.get_abs_path('chimera_1event.log'))
+        block_size = reader.get_block_size()
+        self.assertEqual(_get_blocks_per_read(reader, Parameters(read_size=1)), 1)
+        self.assertEqual(_get_blocks_per_read(reader, Parameters(read_size=block_size)), 1)
+        self.assertEqual(_get_blocks_per_read(reader, Parameters(read_size=block_size + 1)), 2)
+
+        n_blocks = _get_blocks_per_read(reader, Parameters(read_size=READ_SIZE_AUTO))
+        self.assertGreaterEqual(n_blocks * block_size, AUTO_READ_SIZE_MIN)
+        self.assertLess((n_blocks - 1) * block_size, AUTO_READ_SIZE_MAX)
+        reader.close()
+
+
+class _Crash(Exception):
+    pass
+
+
+class _CrashingSink(HDF5EventSink):
+    """
+    Stops the search once crash_after events have been written, like a crash would.
+    """
+
+    def __init__(self, save_file_name, crash_after):
+        super(_CrashingSink, self).__init__(save_file_name)
+        self.crash_after = crash_after
+
+    def write_events(self, batch):
+        if self.event_count >= self.crash_after:
+            # Leave the file as a killed process would, without flushing what was written since the checkpoint.
+            self.h5file.close()
+            raise _Crash()
+        super(_CrashingSink, self).write_events(batch)
+
+
+class _CheckpointCountingSink(HDF5EventSink):
+    """
+    Counts the checkpoints of the search.
+    """
+
+    def __init__(self, save_file_name):
+        super(_CheckpointCountingSink, self).__init__(save_file_name)
+        self.n_checkpoints = 0
+
+    def checkpoint(self):
+        self.n_checkpoints += 1
+        return super(_CheckpointCountingSink, self).checkpoint()
+
+
+class _ExitingSink(MemoryEventSink):
+    """
+    Kills the worker process it is opened in.
+    """
+
+    def open(self, *args, **kwargs):
+        os._exit(1)
+
+
+class _UnseekableReader(_SegmentReader):
+    def seek(self, point):
+        raise NotImplementedError
+
+
+class TestEventFinderResume(unittest.TestCase):
+    def setUp(self):
+        # 30 events of 300 points in a noisy baseline.
+        self.data = _synthetic_events(1, 300000, 9700, 3)[0]
+        self.parameters = Parameters(read_size=5000)
+
+    def _reader(self):
+        return _SegmentReader(self.data, 1.e6, 'resume', 1000)
+
+    def _read_database(self, filename, debug):
+        h5file = ed.open_file(filename, mode='r')
+        event_count = h5file.get_event_count()
+        event_table = h5file.get_event_table()[:]
+        raw_data = [h5file.get_raw_data_at(i) for i in xrange(event_count)]
+        levels = [h5file.get_levels_at(i) for i in xrange(event_count)]
+        debug_data = None
+        if debug:
+            debug_data = [h5file.root.debug.data[:], h5file.root.debug.baseline[:],
+                          h5file.root.debug.threshold_positive[:], h5file.root.debug.threshold_negative[:]]
+        h5file.close()
+        os.remove(filename)
+        return event_table, raw_data, levels, debug_data
+
+    def _test_resume_same_as_one_run(self, filename, debug):
+        find_events([self._reader()], parameters=self.parameters, save_file_names=[filename], debug=debug)
+        one_run = self._read_database(filename, debug)
+
+        # Checkpoint after every block, and crash part way through.
+        self.assertRaises(_Crash, find_events, [self._reader()], parameters=self.parameters,
+                          sinks=[_CrashingSink(filename, 10)], debug=debug, checkpoint_interval=1.e-9)
+        self.assertTrue(os.path.exists(filename + '.checkpoint'))
+        find_events([self._reader()], parameters=self.parameters, save_file_names=[filename], debug=debug,
+                    resume=True)
+        self.assertFalse(os.path.exists(filename + '.checkpoint'))
+        resumed = self._read_database(filename, debug)
+
+        self.assertEqual(one_run[0].size, 30)
+        self.assertEqual(one_run[0].size, resumed[0].size)
+        for name in ['array_row', 'event_start', 'event_length', 'n_levels']:
+            np.testing.assert_array_equal(one_run[0][name], resumed[0][name])
+        for name in ['baseline', 'current_blockage', 'area']:
+            np.testing.assert_array_equal(one_run[0][name], resumed[0][name])
+        for i in xrange(one_run[0].size):
+            np.testing.assert_array_equal(one_run[1][i], resumed[1][i])
+            np.testing.assert_array_equal(one_run[2][i], resumed[2][i])
+        if debug:
+            for debug_one_run, debug_resumed in zip(one_run[3], resumed[3]):
+                np.testing.assert_array_equal(debug_one_run, debug_resumed)
+
+    @_test_file_manager(DIRECTORY)
+    def test_resume_same_as_one_run(self, filename):
+        """
+        Tests that resuming a search from a checkpoint finds the same events as an uninterrupted search.
+        """
+        self._test_resume_same_as_one_run(filename, False)
+
+    @_test_file_manager(DIRECTORY)
+    def test_resume_same_as_one_run_debug(self, filename):
+        self._test_resume_same_as_one_run(filename, True)
+
+    @_test_file_manager(DIRECTORY)
+    def test_resume_without_checkpoint(self, filename):
+        """
+        Tests that resuming a search without a checkpoint searches from the start.
+        """
+        find_events([self._reader()], parameters=self.parameters, save_file_names=[filename], resume=True)
+        self.assertEqual(self._read_database(filename, False)[0].size, 30)
+
+    @_test_file_manager(DIRECTORY)
+    def test_no_checkpoint_by_default(self, filename):
+        """
+        Tests that only searches with resume=True or a checkpoint_interval are checkpointed.
+        """
+        sink = _CheckpointCountingSink(filename)
+        find_events([self._reader()], parameters=self.parameters, sinks=[sink])
+        self.assertEqual(sink.n_checkpoints, 0)
+
+        import pypore.event_finder as event_finder
+        default_interval = event_finder.DEFAULT_CHECKPOINT_INTERVAL
+        event_finder.DEFAULT_CHECKPOINT_INTERVAL = 1.e-9
+        try:
+            sink = _CheckpointCountingSink(filename)
+            find_events([self._reader()], parameters=self.parameters, sinks=[sink], resume=True)
+        finally:
+            event_finder.DEFAULT_CHECKPOINT_INTERVAL = default_interval
+        self.assertGreater(sink.n_checkpoints, 0)
+        self.assertFalse(os.path.exists(filename + '.checkpoint'))
+
+    @_test_file_manager(DIRECTORY)
+    def test_resume_other_file(self, filename):
+        self.assertRaises(_Crash, find_events, [self._reader()], parameters=self.parameters,
+                          sinks=[_CrashingSink(filename, 10)], checkpoint_interval=1.e-9)
+        other_reader = _SegmentReader(self.data[:, :200000], 1.e6, 'resume', 1000)
+        self.assertRaises(ValueError, find_events, [other_reader], parameters=self.parameters,
+                          save_file_names=[filename], resume=True)
+        os.remove(filename + '.checkpoint')
+
+    def test_resume_default_save_file_name(self):
+        """
+        Tests that resuming a search without save file names continues the latest checkpointed search of the file.
+        """
+        reader_filename = os.path.join(DIRECTORY, 'resume_default.log')
+        earlier_name = os.path.join(DIRECTORY, 'resume_default_Events_20000101_000000.h5')
+        filename = os.path.join(DIRECTORY, 'resume_default_Events_20000102_000000.h5')
+        try:
+            for name in [earlier_name, filename]:
+                self.assertRaises(_Crash, find_events, [_SegmentReader(self.data, 1.e6, reader_filename, 1000)],
+                                  parameters=self.parameters, sinks=[_CrashingSink(name, 10)],
+                                  checkpoint_interval=1.e-9)
+            os.remove(earlier_name + '.checkpoint')
+
+            save_file_names = find_events([_SegmentReader(self.data, 1.e6, reader_filename, 1000)],
+                                          parameters=self.parameters, resume=True)
+            self.assertEqual(save_file_names, [filename])
+            self.assertFalse(os.path.exists(filename + '.checkpoint'))
+            self.assertEqual(self._read_database(filename, False)[0].size, 30)
+        finally:
+            for name in [earlier_name, filename, earlier_name + '.checkpoint', filename + '.checkpoint']:
+                if os.path.exists(name):
+                    os.remove(name)
+
+    @_test_file_manager(DIRECTORY)
+    def test_resume_reader_without_seek(self, filename):
+        """
+        Tests that resuming with a reader that can't seek reads up to the checkpoint instead.
+        """
+        self.assertRaises(_Crash, find_events, [self._reader()], parameters=self.parameters,
+                          sinks=[_CrashingSink(filename, 10)], checkpoint_interval=1.e-9)
+        find_events([_UnseekableReader(self.data, 1.e6, 'resume', 1000)], parameters=self.parameters,
+                    save_file_names=[filename], resume=True)
+        self.assertEqual(self._read_database(filename, False)[0].size, 30)
+
+
+class TestEventFinderProgress(unittest.TestCase):
+    def setUp(self):
+        self.data = _synthetic_events(2, 100000, 9000, 4)[0]
+        self.parameters = Parameters(read_size=5000)
+
+    def _find_progress(self, **kwargs):
+        progresses = []
+        reader = _SegmentReader(self.data, 1.e6, 'progress', 1000)
+        find_events([reader], parameters=self.parameters, sinks=[MemoryEventSink()],
+                    progress_callback=progresses.append, **kwargs)
+        return progresses
+
+    def test_progress_callback(self):
+        """
+        Tests that the progress callback gets the counts and timings of the search, and is called once the search
+        is done.
+        """
+        progresses = self._find_progress(progress_interval=0)
+
+        self.assertGreater(len(progresses), 2)
+        self.assertEqual([progress.done for progress in progresses], [False] * (len(progresses) - 1) + [True])
+        self.assertEqual(sorted(progress.points_read for progress in progresses),
+                         [progress.points_read for progress in progresses])
+        last = progresses[-1]
+        self.assertEqual(last.filename, 'progress')
+        self.assertEqual(last.points_read, 100000)
+        self.assertEqual(last.points_per_channel_total, 100000)
+        self.assertAlmostEqual(last.percent_done, 100.)
+        self.assertEqual(last.event_count, 20)
+        self.assertGreater(last.mean_rate, 0)
+        self.assertEqual(last.time_left, 0)
+        for name in ['read_time', 'scan_time', 'cusum_time', 'write_time']:
+            self.assertGreaterEqual(getattr(last, name), 0)
+        self.assertGreater(last.cusum_time, 0)
+        self.assertLessEqual(last.read_time + last.scan_time + last.cusum_time + last.write_time,
+                             last.elapsed_time + 1.e-3)
+        self.assertTrue(str(last).startswith('Event Count: 20 Percent Done: 100.00'))
+
+    def test_progress_interval(self):
+        """
+        Tests that a long progress interval only gives the final progress.
+        """
+        progresses = self._find_progress(progress_interval=1.e9)
+
+        self.assertEqual(len(progresses), 1)
+        self.assertTrue(progresses[0].done)
+
+    def test_pipe(self):
+        parent_pipe, child_pipe = Pipe()
+        reader = _SegmentReader(self.data, 1.e6, 'progress', 1000)
+        find_events([reader], parameters=self.parameters, sinks=[MemoryEventSink()], pipe=child_pipe)
+
+        updates = []
+        while parent_pipe.poll():
+            updates.append(parent_pipe.recv())
+        self.assertTrue(updates[-1]['progress'].done)
+        self.assertEqual(updates[-1]['status_text'], str(updates[-1]['progress']))
+
+    def test_n_workers(self):
+        """
+        Tests that the progress of the workers' files is passed to the callback.
+        """
+        filenames = [tf.get_abs_path('chimera_nonoise_2events_1levels.log'),
+                     tf.get_abs_path('chimera_nonoise_1event_2levels.log')]
+        progresses = []
+        find_events(filenames, sinks=[MemoryEventSink() for _ in filenames], n_workers=2,
+                    progress_callback=progresses.append)
+
+        done = dict((progress.filename, progress.event_count) for progress in progresses if progress.done)
+        self.assertEqual(done, {filenames[0]: 2, filenames[1]: 1})
+
+
+class TestEventFinderProfile(unittest.TestCase):
+    def setUp(self):
+        self.data = _synthetic_events(2, 100000, 9000, 6)[0]
+        self.parameters = Parameters(read_size=5000, prescan=True)
+
+    def _find_profile(self, **kwargs):
+        sink = MemoryEventSink()
+        find_events([_SegmentReader(self.data, 1.e6, 'profile', 1000)], parameters=self.parameters, sinks=[sink],
+                    **kwargs)
+        return sink.profile
+
+    def test_profile(self):
+        """
+        Tests that the profile counts the reads, points and events of the search.
+        """
+        profile = self._find_profile(profile=True)
+
+        # 20 reads of data, and one that finds the end of the file.
+        self.assertEqual(profile.n_reads, 21)
+        self.assertEqual(profile.read_points, 100000)
+        self.assertEqual(profile.n_events, 20)
+        self.assertGreaterEqual(profile.cusum_points, 20 * 300)
+        self.assertGreater(profile.prescan_points, profile.scan_points)
+        self.assertLessEqual(profile.prescan_points + profile.scan_points + profile.cusum_points, 2 * 100000)
+        self.assertGreater(profile.prescan_points + profile.scan_points + profile.cusum_points, 2 * 90000)
+        self.assertEqual(profile.n_writes, 1)
+        for name in ['read_time', 'prescan_time', 'scan_time', 'cusum_time', 'write_time']:
+            self.assertGreaterEqual(getattr(profile, name), 0)
+        self.assertGreater(profile.total_time, 0)
+        self.assertEqual(profile.event_sample, 0)
+        self.assertEqual(profile.event_time_counts.sum(), 0)
+
+    def test_event_sample(self):
+        """
+        Tests that every profile_event_sample-th event of each channel is added to the histogram.
+        """
+        profile = self._find_profile(profile=True, profile_event_sample=1)
+        self.assertEqual(profile.event_time_counts.sum(), 20)
+        self.assertEqual(profile.event_time_counts.size, profile.event_time_bin_edges.size + 1)
+
+        profile = self._find_profile(profile=True, profile_event_sample=3)
+        self.assertEqual(profile.event_sample, 3)
+        self.assertEqual(profile.event_time_counts.sum(), 2 * 3)
+
+    def test_no_profile(self):
+        self.assertIsNone(self._find_profile())
+
+    @_test_file_manager(DIRECTORY)
+    def test_event_table_attributes(self, filename):
+        """
+        Tests that the profile is saved as attributes of the EventDatabase's event table.
+        """
+        profile = self._find_profile(profile=True, profile_event_sample=1)
+        find_events([_SegmentReader(self.data, 1.e6, 'profile', 1000)], parameters=self.parameters,
+                    save_file_names=[filename], profile=True, profile_event_sample=1)
+
+        h5file = ed.open_file(filename, mode='r')
+        attrs = h5file.get_event_table().attrs
+        self.assertEqual(attrs.profile_n_reads, profile.n_reads)
+        self.assertEqual(attrs.profile_n_events, profile.n_events)
+        self.assertEqual(attrs.profile_cusum_points, profile.cusum_points)
+        self.assertEqual(attrs.profile_event_time_counts.sum(), 20)
+        np.testing.assert_array_equal(attrs.profile_event_time_bin_edges, profile.event_time_bin_edges)
+        h5file.close()
+
+    def test_segment_workers(self):
+        self.assertRaises(ValueError, find_events, [tf.get_abs_path('chimera_1event.log')], profile=True,
+                          segment_workers=2)
 
 
 class TestEventFinderAbsoluteChangeThresholdStrategy(unittest.TestCase):
@@ -378,6 +1095,344 @@ class TestEventFinderAbsoluteChangeThresholdStrategy(unittest.TestCase):
         h5file.close()
 
 
+class TestRefitLevels(unittest.TestCase):
+    def setUp(self):
+        # 20 events with 2 levels of 300 points each in a noisy baseline.
+        self.data, event_starts = _synthetic_events(1, 200000, 9500, 4)
+        for event_start in event_starts:
+            self.data[0, event_start + 300:event_start + 600] -= 5.
+            # Without noise on the first point back at the baseline, so each event ends right after its 2 levels.
+            self.data[0, event_start + 600] = 10.
+
+    def _find_events(self, filename, ragged=False):
+        find_events([_SegmentReader(self.data, 1.e6, 'refit', 1000)], sinks=[HDF5EventSink(filename, ragged=ragged)])
+
+    def _read_database(self, filename):
+        h5file = ed.open_file(filename, mode='r')
+        event_count = h5file.get_event_count()
+        event_table = h5file.get_event_table()[:]
+        levels = [h5file.get_levels_at(i) for i in xrange(event_count)]
+        level_lengths = [h5file.get_level_lengths_at(i) for i in xrange(event_count)]
+        h5file.close()
+        return event_table, levels, level_lengths
+
+    @_test_file_manager(DIRECTORY)
+    def test_refit_same_parameters(self, filename):
+        """
+        Tests that re-fitting with the parameters of the search finds the same levels.
+        """
+        self._find_events(filename)
+        refit_file_name = refit_levels(filename, save_file_name=filename[:-3] + '_refit.h5')
+        found = self._read_database(filename)
+        refit = self._read_database(refit_file_name)
+        os.remove(refit_file_name)
+
+        self.assertEqual(found[0].size, 20)
+        np.testing.assert_array_equal(found[0]['n_levels'], 2)
+        np.testing.assert_array_equal(found[0]['n_levels'], refit[0]['n_levels'])
+        np.testing.assert_array_almost_equal(found[0]['current_blockage'], refit[0]['current_blockage'])
+        for i in xrange(found[0].size):
+            np.testing.assert_array_almost_equal(found[1][i], refit[1][i])
+            np.testing.assert_array_equal(found[2][i], refit[2][i])
+
+    @_test_file_manager(DIRECTORY)
+    def test_refit_threshold(self, filename):
+        """
+        Tests that a large CUSUM threshold fits a single level to each event, and the original is not changed.
+        """
+        self._find_events(filename)
+        refit_file_name = refit_levels(filename, Parameters(cusum_threshold=1.e9),
+                                       save_file_name=filename[:-3] + '_refit.h5')
+        found = self._read_database(filename)
+        refit = self._read_database(refit_file_name)
+        os.remove(refit_file_name)
+
+        np.testing.assert_array_equal(found[0]['n_levels'], 2)
+        np.testing.assert_array_equal(refit[0]['n_levels'], 1)
+        np.testing.assert_array_almost_equal(found[0]['current_blockage'], refit[0]['current_blockage'])
+        for i in xrange(refit[0].size):
+            np.testing.assert_array_equal(refit[2][i], [found[0][i]['event_length']])
+
+    @_test_file_manager(DIRECTORY)
+    def test_refit_n_workers_ragged(self, filename):
+        """
+        Tests that re-fitting in chunks in a pool of workers, and of a ragged database, gives the same levels.
+        """
+        parameters = Parameters(cusum_threshold=0.5)
+        self._find_events(filename)
+        refit_file_name = refit_levels(filename, parameters, save_file_name=filename[:-3] + '_refit.h5')
+        one_worker = self._read_database(refit_file_name)
+        refit_levels(filename, parameters, save_file_name=refit_file_name, n_workers=2, chunk_size=3)
+        n_workers = self._read_database(refit_file_name)
+        self._find_events(filename, ragged=True)
+        refit_levels(filename, parameters, save_file_name=refit_file_name, n_workers=2, chunk_size=3)
+        ragged = self._read_database(refit_file_name)
+        os.remove(refit_file_name)
+
+        for other in [n_workers, ragged]:
+            for name in ['event_start', 'n_levels', 'current_blockage']:
+                np.testing.assert_array_equal(one_worker[0][name], other[0][name])
+            for i in xrange(one_worker[0].size):
+                np.testing.assert_array_equal(one_worker[1][i], other[1][i])
+                np.testing.assert_array_equal(one_worker[2][i], other[2][i])
+
+
+class TestSweepFindEvents(unittest.TestCase):
+    def setUp(self):
+        # Events of 20 to 400 points and depths of 0.3 to 1.5 in a noisy baseline.
+        self.data = _synthetic_events(2, 100000, 3000, 5, first_event=2000, alternate_channels=True,
+                                      event_length=20, depth=.3, length_step=12, depth_step=.04)[0]
+        self.parameter_sets = [Parameters(min_event_length=min_event_length,
+                                          threshold_strategy=NoiseBasedThresholdStrategy(start_std_dev=std_dev),
+                                          read_size=5000)
+                               for std_dev in [3., 5., 8.] for min_event_length in [10., 100.]]
+
+    def _reader(self):
+        return _SegmentReader(self.data, 1.e6, 'sweep', 1000)
+
+    def _test_sweep_same_as_find_events(self, n_workers):
+        sweep = sweep_find_events(self._reader(), self.parameter_sets,
+                                  sinks=[MemoryEventSink() for _ in self.parameter_sets], n_workers=n_workers)
+
+        self.assertEqual(len(sweep), len(self.parameter_sets))
+        self.assertNotEqual(len(sweep[0].events), len(sweep[-1].events))
+        for parameters, sweep_sink in zip(self.parameter_sets, sweep):
+            sink = MemoryEventSink()
+            find_events([self._reader()], parameters=parameters, sinks=[sink])
+            self.assertEqual(len(sink.events), len(sweep_sink.events))
+            for event, sweep_event in zip(sink.events, sweep_sink.events):
+                self.assertEqual(event.channel, sweep_event.channel)
+                self.assertEqual(event.event_start, sweep_event.event_start)
+                self.assertEqual(event.event_length, sweep_event.event_length)
+                np.testing.assert_array_equal(event.raw_data, sweep_event.raw_data)
+                np.testing.assert_array_equal(event.levels, sweep_event.levels)
+
+    def test_sweep_same_as_find_events(self):
+        """
+        Tests that a sweep finds the same events with each of the Parameters as find_events.
+        """
+        self._test_sweep_same_as_find_events(1)
+
+    def test_sweep_n_workers(self):
+        self._test_sweep_same_as_find_events(4)
+
+    @_test_file_manager(DIRECTORY)
+    def test_sweep_event_databases(self, filename):
+        save_file_names = [filename[:-3] + '_%d.h5' % k for k in xrange(2)]
+        event_databases = sweep_find_events(self._reader(), self.parameter_sets[:2], save_file_names=save_file_names)
+
+        self.assertEqual(event_databases, save_file_names)
+        for event_database in event_databases:
+            h5file = ed.open_file(event_database, mode='r')
+            self.assertGreater(h5file.get_event_count(), 0)
+            h5file.close()
+            os.remove(event_database)
+
+    def test_sweep_single_precision(self):
+        """
+        Tests that a sweep of a file name reads and searches the file in the dtype of the parameter_sets.
+        """
+        data_file = tf.get_abs_path('chimera_1event_2levels.log')
+        parameter_sets = [Parameters(threshold_strategy=NoiseBasedThresholdStrategy(start_std_dev=std_dev),
+                                     dtype=np.float32) for std_dev in [5., 6.]]
+        self._test_sweep_file(data_file, parameter_sets)
+
+    def test_sweep_prefetch(self):
+        """
+        Tests that a sweep of a file name read ahead in a background thread finds the same events.
+        """
+        data_file = tf.get_abs_path('chimera_1event_2levels.log')
+        parameter_sets = [Parameters(threshold_strategy=NoiseBasedThresholdStrategy(start_std_dev=std_dev),
+                                     read_size=12345, prefetch_reads=2) for std_dev in [5., 6.]]
+        self._test_sweep_file(data_file, parameter_sets)
+
+    def _test_sweep_file(self, data_file, parameter_sets):
+        for n_workers in [1, 2]:
+            sweep = sweep_find_events(data_file, parameter_sets, sinks=[MemoryEventSink() for _ in parameter_sets],
+                                      n_workers=n_workers)
+            for parameters, sweep_sink in zip(parameter_sets, sweep):
+                sink = MemoryEventSink()
+                find_events([data_file], parameters=parameters, sinks=[sink])
+                self.assertGreater(len(sweep_sink.events), 0)
+                self.assertEqual(len(sink.events), len(sweep_sink.events))
+                for event, sweep_event in zip(sink.events, sweep_sink.events):
+                    self.assertEqual(sweep_event.raw_data.dtype, parameters.dtype)
+                    np.testing.assert_array_equal(event.raw_data, sweep_event.raw_data)
+
+    def test_sweep_worker_exits(self):
+        """
+        Tests that a sweep raises, instead of waiting forever, when a worker process dies.
+        """
+        sinks = [MemoryEventSink() for _ in self.parameter_sets]
+        sinks[1] = _ExitingSink()
+        self.assertRaises(RuntimeError, sweep_find_events, self._reader(), self.parameter_sets, sinks=sinks,
+                          n_workers=2)
+
+    def test_sweep_different_dtypes(self):
+        parameter_sets = [Parameters(), Parameters(dtype=np.float32)]
+        self.assertRaises(ValueError, sweep_find_events, self._reader(), parameter_sets,
+                          sinks=[MemoryEventSink() for _ in parameter_sets])
+
+
+class TestOnlineEventDetector(unittest.TestCase):
+    def setUp(self):
+        # 10 events of 300 points in a noisy baseline.
+        self.data = _synthetic_events(2, 50000, 4700, 6, first_event=3000, alternate_channels=True)[0]
+
+    def test_same_as_find_events(self):
+        """
+        Tests that feeding the data in pieces of any size finds the same events as find_events.
+        """
+        sink = MemoryEventSink()
+        find_events([_SegmentReader(self.data, 1.e6, 'online', 1000)], sinks=[sink])
+
+        detector = OnlineEventDetector(1.e6, n_channels=2)
+        events = []
+        random_state = np.random.RandomState(7)
+        start = 0
+        while start < self.data.shape[1]:
+            stop = start + random_state.randint(1, 3000)
+            events.extend(detector.feed(self.data[:, start:stop]))
+            start = stop
+        events.extend(detector.close())
+
+        self.assertEqual(len(sink.events), 10)
+        self.assertEqual(len(events), len(sink.events))
+        # Events in different channels can come in a different order.
+        for event, online_event in zip(sorted(sink.events, key=lambda e: e.event_start),
+                                       sorted(events, key=lambda e: e.event_start)):
+            self.assertEqual(event.channel, online_event.channel)
+            self.assertEqual(event.event_start, online_event.event_start)
+            self.assertEqual(event.event_length, online_event.event_length)
+            np.testing.assert_array_equal(event.raw_data, online_event.raw_data)
+            np.testing.assert_array_equal(event.levels, online_event.levels)
+
+    def test_latency(self):
+        """
+        Tests that each event is returned as soon as the raw data points after it are fed.
+        """
+        detector = OnlineEventDetector(1.e6)
+        n_events = 0
+        for point in self.data[0, :15000]:
+            events = detector.feed([point])
+            for event in events:
+                self.assertEqual(detector.points_fed, event.event_start + event.event_length + RAW_POINTS_PER_SIDE)
+            n_events += len(events)
+        self.assertEqual(n_events, 2)
+
+
+class TestEventFinderSinglePrecision(unittest.TestCase):
+    def setUp(self):
+        # Events of 20 to 400 points and depths of 0.3 to 1.5 in a noisy baseline, in single precision.
+        self.data = _synthetic_events(2, 100000, 3000, 8, first_event=2000, alternate_channels=True,
+                                      event_length=20, depth=.3, length_step=12, depth_step=.04)[0].astype(np.float32)
+
+    def test_same_events_as_double_precision(self):
+        """
+        Tests that searching in single precision finds the same events as in double precision.
+        """
+        sink = MemoryEventSink()
+        find_events([_SegmentReader(self.data.astype(np.float64), 1.e6, 'double', 1000)], sinks=[sink])
+        sink_float32 = MemoryEventSink()
+        find_events([_SegmentReader(self.data, 1.e6, 'single', 1000)], parameters=Parameters(dtype=np.float32),
+                    sinks=[sink_float32])
+
+        self.assertGreater(len(sink.events), 0)
+        self.assertEqual(len(sink.events), len(sink_float32.events))
+        for event, event_float32 in zip(sink.events, sink_float32.events):
+            self.assertEqual(event.channel, event_float32.channel)
+            self.assertEqual(event.event_start, event_float32.event_start)
+            self.assertEqual(event.event_length, event_float32.event_length)
+            self.assertEqual(event_float32.raw_data.dtype, np.float32)
+            np.testing.assert_array_equal(event.raw_data, event_float32.raw_data)
+            np.testing.assert_allclose(event.levels, event_float32.levels, rtol=1.e-6)
+
+    def _test_event_database(self, filename, ragged):
+        parameters = Parameters(dtype=np.float32)
+        sink = MemoryEventSink()
+        find_events([_SegmentReader(self.data, 1.e6, 'single', 1000)], parameters=parameters, sinks=[sink])
+        find_events([_SegmentReader(self.data, 1.e6, 'single', 1000)], parameters=parameters,
+                    sinks=[HDF5EventSink(filename, ragged=ragged)])
+
+        h5file = ed.open_file(filename, mode='r')
+        self.assertEqual(h5file.root.events.raw_data.dtype, np.float32)
+        self.assertEqual(h5file.root.events.levels.dtype, np.float32)
+        self.assertEqual(h5file.get_event_count(), len(sink.events))
+        for k, event in enumerate(sink.events):
+            np.testing.assert_array_equal(h5file.get_raw_data_at(k), event.raw_data)
+        h5file.close()
+
+    @_test_file_manager(DIRECTORY)
+    def test_event_database(self, filename):
+        """
+        Tests that the EventDatabase of a single precision search stores the raw data and levels in single precision.
+        """
+        self._test_event_database(filename, False)
+
+    @_test_file_manager(DIRECTORY)
+    def test_event_database_ragged(self, filename):
+        self._test_event_database(filename, True)
+
+    @_test_file_manager(DIRECTORY)
+    def test_refit_ragged(self, filename):
+        """
+        Tests that re-fitting a ragged single precision EventDatabase keeps its levels in single precision.
+        """
+        find_events([_SegmentReader(self.data, 1.e6, 'single', 1000)], parameters=Parameters(dtype=np.float32),
+                    sinks=[HDF5EventSink(filename, ragged=True)])
+        refit_file_name = refit_levels(filename, save_file_name=filename[:-3] + '_refit.h5')
+
+        h5file = ed.open_file(refit_file_name, mode='r')
+        self.assertGreater(h5file.get_event_count(), 0)
+        self.assertEqual(h5file.root.events.levels.dtype, np.float32)
+        h5file.close()
+        os.remove(refit_file_name)
+
+    def test_dtype_not_float(self):
+        self.assertRaises(ValueError, Parameters, dtype=np.int16)
+
+
+class TestEventFinderRawCodes(unittest.TestCase):
+    def _test_raw_codes(self, filename, ragged):
+        data_file = tf.get_abs_path('chimera_1event_2levels.log')
+        values_file = filename[:-3] + '_values.h5'
+        find_events([data_file], sinks=[HDF5EventSink(values_file, ragged=ragged)])
+        find_events([data_file], sinks=[HDF5EventSink(filename, ragged=ragged, raw_codes=True)])
+
+        values = ed.open_file(values_file, mode='r')
+        codes = ed.open_file(filename, mode='r')
+        self.assertEqual(codes.root.events.raw_data.dtype, np.int16)
+        self.assertIsNotNone(codes.get_raw_scaling())
+        self.assertGreater(codes.get_event_count(), 0)
+        self.assertEqual(codes.get_event_count(), values.get_event_count())
+        for i in xrange(values.get_event_count()):
+            np.testing.assert_allclose(codes.get_raw_data_at(i), values.get_raw_data_at(i), rtol=1.e-9)
+            np.testing.assert_allclose(codes.get_event_data_at(i), values.get_event_data_at(i), rtol=1.e-9)
+        values.close()
+        codes.close()
+        os.remove(values_file)
+
+    @_test_file_manager(DIRECTORY)
+    def test_raw_codes(self, filename):
+        """
+        Tests that saving the raw data as ADC codes gives back the same raw data.
+        """
+        self._test_raw_codes(filename, False)
+
+    @_test_file_manager(DIRECTORY)
+    def test_raw_codes_ragged(self, filename):
+        self._test_raw_codes(filename, True)
+
+    @_test_file_manager(DIRECTORY)
+    def test_raw_codes_not_coded_data(self, filename):
+        """
+        Tests that asking for ADC codes of data that is not decoded from integer codes raises a ValueError.
+        """
+        data = np.zeros((1, 1000)) + 10.
+        self.assertRaises(ValueError, find_events, [_SegmentReader(data, 1.e6, 'values', 1000)],
+                          sinks=[HDF5EventSink(filename, raw_codes=True)])
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -63,6 +63,21 @@ class TestFileConverter(unittest.TestCase):
         orig_reader.close()
         out_reader.close()
 
+    @_test_file_manager(DIRECTORY)
+    def test_convert_file_prefetch(self, filename):
+        """
+        Tests that converting a file read ahead in a background thread gives the same data.
+        """
+        data_filename = tf.get_abs_path('spheres_20140114_154938_beginning.log')
+
+        output_filename = convert_file(data_filename, output_filename=filename, prefetch=2)
+
+        orig_reader = get_reader_from_filename(data_filename)
+        out_reader = DataFileReader(output_filename)
+        np.testing.assert_array_equal(orig_reader.get_all_data()[0], out_reader.get_all_data()[0])
+        orig_reader.close()
+        out_reader.close()
+
 
 from pypore.file_converter import concat_files
 from pypore.file_converter import SamplingRatesMismatchError
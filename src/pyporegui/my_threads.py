@@ -49,6 +49,9 @@ class PlotThread(QtCore.QThread):
 class AnalyzeDataThread(QtCore.QThread):
     """
     Class for searching for events in baseline_filter_parameter separate thread.
+
+    Emits dataReady with the latest 'status_text', and the latest :py:class:`pypore.event_finder.Progress` of the
+    search as 'progress'.
     """
     dataReady = QtCore.Signal(object)
 
@@ -75,6 +78,7 @@ class AnalyzeDataThread(QtCore.QThread):
 
         self.events = []
         self.status_text = ''
+        self.progress = None
 
         self.periodic_call()
 
@@ -103,6 +107,10 @@ class AnalyzeDataThread(QtCore.QThread):
             send['status_text'] = self.status_text
             self.status_text = ''
             do_send = True
+        if self.progress is not None:
+            send['progress'] = self.progress
+            self.progress = None
+            do_send = True
         if len(self.events) > 0:
             send['Events'] = self.events
             self.events = []
@@ -130,6 +138,8 @@ class AnalyzeDataThread(QtCore.QThread):
                     data = self._pipe.recv()
                     if 'status_text' in data:
                         self.status_text = data['status_text']
+                    if 'progress' in data:
+                        self.progress = data['progress']
                     if 'Events' in data:
                         self.events += data['Events']
                 except:
@@ -119,7 +119,10 @@ class EventViewingTab(_ThreadManager, QtGui.QSplitter):
         data = event_database.root.debug.data[0][::step_size]
 
         data_size = data.size
-        times = np.linspace(0, data_size *1.0/sample_rate, data_size)
+        # Decimated debug data keeps two points for every debug_decimation points of data.
+        decimation = event_database.get_debug_decimation()
+        time_step = step_size * (decimation / 2. if decimation > 1 else 1.) / sample_rate
+        times = np.linspace(0, data_size * time_step, data_size)
         item = PathItem(times, data)
         item.setPen(pg.mkPen('w'))
         self.eventview_plotwid.addItem(item)